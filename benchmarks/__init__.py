@@ -0,0 +1,7 @@
+""" Performance benchmarks for Envisage.
+
+Run them with::
+
+    python -m benchmarks --help
+
+"""
@@ -0,0 +1,13 @@
+""" Run the benchmarks from the command line. """
+
+
+# Standard library imports.
+import sys
+
+# Local imports.
+from benchmarks.runner import main
+
+
+sys.exit(main())
+
+#### EOF ######################################################################
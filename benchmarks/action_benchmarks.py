@@ -0,0 +1,58 @@
+""" Benchmarks for building menus and tool bars from action sets. """
+
+
+# Enthought library imports.
+from envisage.ui.action.api import AbstractActionManagerBuilder
+from pyface.action.api import Action, Group, MenuBarManager, MenuManager
+
+# Local imports.
+from benchmarks.runner import benchmark
+from benchmarks.workloads import make_action_sets
+
+
+class BenchmarkActionManagerBuilder(AbstractActionManagerBuilder):
+    """ An action manager builder that builds plain pyface actions. """
+
+    ###########################################################################
+    # Protected 'AbstractActionManagerBuilder' interface.
+    ###########################################################################
+
+    def _create_action(self, definition):
+        """ Create an action implementation from a definition. """
+
+        return Action(name=definition.class_name)
+
+    def _create_group(self, definition):
+        """ Create a group implementation from a definition. """
+
+        return Group(id=definition.id)
+
+    def _create_menu_manager(self, definition):
+        """ Create a menu manager implementation from a definition. """
+
+        menu_manager = MenuManager(id=definition.id)
+        for group in definition.groups:
+            menu_manager.insert(-1, Group(id=group.id))
+
+        return menu_manager
+
+    def _create_menu_bar_manager(self):
+        """ Create a menu bar manager implementation. """
+
+        return MenuBarManager(id='MenuBar')
+
+
+@benchmark(action_sets=[200], actions=[1000, 5000])
+def create_menu_bar_manager(action_sets, actions):
+    """ Build a menu bar from many action sets. """
+
+    builder = BenchmarkActionManagerBuilder(
+        action_sets=make_action_sets(action_sets, actions)
+    )
+
+    def run():
+        builder.create_menu_bar_manager('MenuBar')
+
+    return run
+
+#### EOF ######################################################################
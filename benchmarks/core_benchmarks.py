@@ -0,0 +1,192 @@
+""" Benchmarks for the core of Envisage.
+
+These cover the extension and service registries, the plugin lifecycle and
+extension point bindings.
+
+"""
+
+
+# Enthought library imports.
+from envisage.api import ExtensionPoint, ServiceRegistry
+from envisage.api import ExtensionPointBinding, bind_extension_point
+from envisage.tests.mutable_extension_registry import (
+    MutableExtensionRegistry
+)
+from traits.api import HasTraits, List
+
+# Local imports.
+from benchmarks.runner import benchmark
+from benchmarks.workloads import BenchmarkService, IBenchmarkService
+from benchmarks.workloads import extension_point_id, make_application
+from benchmarks.workloads import make_contributing_plugin
+
+
+#### Extension registry #######################################################
+
+@benchmark(plugins=[10, 100], extension_points=[10], contributions=[10])
+def get_extensions_cached(plugins, extension_points, contributions):
+    """ Get the (already accessed) extensions of every extension point. """
+
+    application = make_application(plugins, extension_points, contributions)
+    ids = [extension_point_id(i) for i in range(extension_points)]
+    for id in ids:
+        application.get_extensions(id)
+
+    def run():
+        for id in ids:
+            application.get_extensions(id)
+
+    return run
+
+
+@benchmark(plugins=[10, 100], extension_points=[10], contributions=[10])
+def get_extensions_cold(plugins, extension_points, contributions):
+    """ Get the extensions of every extension point for the first time. """
+
+    application = make_application(plugins, extension_points, contributions)
+    registry = application.extension_registry
+    ids = [extension_point_id(i) for i in range(extension_points)]
+
+    def run():
+        registry._extensions.clear()
+        for id in ids:
+            registry.get_extensions(id)
+
+    return run
+
+
+@benchmark(plugins=[10, 100], extension_points=[10], contributions=[10])
+def provider_churn(plugins, extension_points, contributions):
+    """ Add and remove a plugin once all extension points are accessed. """
+
+    application = make_application(plugins, extension_points, contributions)
+    for i in range(extension_points):
+        application.get_extensions(extension_point_id(i))
+
+    plugin = make_contributing_plugin(
+        plugins, extension_points, contributions
+    )
+
+    def run():
+        application.add_plugin(plugin)
+        application.remove_plugin(plugin)
+
+    return run
+
+
+#### Service registry #########################################################
+
+@benchmark(services=[10, 100, 1000])
+def get_services(services):
+    """ Look up all services offering a protocol. """
+
+    registry = ServiceRegistry()
+    for i in range(services):
+        registry.register_service(IBenchmarkService, BenchmarkService())
+
+    def run():
+        registry.get_services(IBenchmarkService)
+
+    return run
+
+
+@benchmark(services=[10, 100, 1000])
+def get_services_with_query(services):
+    """ Look up services offering a protocol that match a query. """
+
+    registry = ServiceRegistry()
+    for i in range(services):
+        registry.register_service(
+            IBenchmarkService, BenchmarkService(), {'index' : i}
+        )
+
+    def run():
+        registry.get_services(IBenchmarkService, 'index % 2 == 0')
+
+    return run
+
+
+#### Plugin lifecycle #########################################################
+
+@benchmark(plugins=[10, 100], extension_points=[10], contributions=[10],
+           services=[100])
+def start_and_stop(plugins, extension_points, contributions, services):
+    """ Start and stop an application. """
+
+    def run():
+        application = make_application(
+            plugins, extension_points, contributions, services
+        )
+        application.start()
+        application.stop()
+
+    return run
+
+
+@benchmark(plugins=[10, 100], extension_points=[10], contributions=[10])
+def plugin_manager_start_and_stop(plugins, extension_points, contributions):
+    """ Start and stop the plugins of an existing application. """
+
+    plugin_manager = make_application(
+        plugins, extension_points, contributions
+    ).plugin_manager
+
+    def run():
+        plugin_manager.start()
+        plugin_manager.stop()
+
+    return run
+
+
+#### Extension point bindings #################################################
+
+class Target(HasTraits):
+    """ An object to bind extension points to. """
+
+    x = List
+
+
+@benchmark(bindings=[10, 100, 1000])
+def bind_and_unbind(bindings):
+    """ Create and break bindings to a single extension point. """
+
+    registry = MutableExtensionRegistry()
+    registry.add_extension_point(ExtensionPoint(id='benchmark.ep'))
+    registry.add_extensions('benchmark.ep', range(10))
+
+    targets = [Target() for i in range(bindings)]
+
+    def run():
+        for target in targets:
+            bind_extension_point(target, 'x', 'benchmark.ep', registry)
+
+        for target in targets:
+            for binding in ExtensionPointBinding.get_bindings(target):
+                binding.unbind()
+
+    return run
+
+
+@benchmark(bindings=[10, 100, 1000])
+def binding_notification(bindings):
+    """ Add and remove an extension to an extension point with many bindings.
+
+    """
+
+    registry = MutableExtensionRegistry()
+    registry.add_extension_point(ExtensionPoint(id='benchmark.ep'))
+
+    targets = [Target() for i in range(bindings)]
+    for target in targets:
+        bind_extension_point(target, 'x', 'benchmark.ep', registry)
+
+    def run():
+        registry.add_extension('benchmark.ep', 42)
+        registry.remove_extension('benchmark.ep', 42)
+
+    # Keep the targets (and hence the bindings) alive.
+    run.targets = targets
+
+    return run
+
+#### EOF ######################################################################
@@ -0,0 +1,72 @@
+""" Benchmarks for saving and loading chunked projects.
+
+These use projects that are saved as zip files, with many small resources,
+so that any per-resource cost of reading the zip file shows up as the
+number of resources grows.
+
+"""
+
+
+# Standard library imports.
+import atexit, os, shutil, tempfile
+
+# Enthought library imports.
+from envisage.ui.single_project.chunked_project import ChunkedProject
+
+# Local imports.
+from benchmarks.runner import benchmark
+
+
+class ZipChunkedProject(ChunkedProject):
+    """ A chunked project that is saved as a zip file. """
+
+    PROJECTS_ARE_FILES = True
+
+
+def make_project_location(resources):
+    """ Save a zip project with the given number of resources, returning its
+    location.
+
+    """
+
+    path = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, path, True)
+
+    project = ZipChunkedProject()
+    for i in range(resources):
+        project.set_resource('resource_%d' % i, range(10))
+
+    location = os.path.join(path, 'project.zip')
+    project.save(location)
+
+    return location
+
+
+@benchmark(resources=[10, 100, 1000])
+def read_resources(resources):
+    """ Load a zip project and read every resource. """
+
+    location = make_project_location(resources)
+
+    def run():
+        project = ZipChunkedProject.load(location, None)
+        for name in project.resource_names:
+            project.get_resource(name)
+
+    return run
+
+
+@benchmark(resources=[10, 100, 1000])
+def save_as_copying_resources(resources):
+    """ Load a zip project and save it elsewhere, copying every resource. """
+
+    location = make_project_location(resources)
+    new_location = os.path.join(os.path.dirname(location), 'copy.zip')
+
+    def run():
+        project = ZipChunkedProject.load(location, None)
+        project.save(new_location, overwrite=True)
+
+    return run
+
+#### EOF ######################################################################
@@ -0,0 +1,381 @@
+""" Load and latency benchmarks for the remote editor communication.
+
+Each run starts a Server in this process and registers pairs of synthetic
+Clients with it over loopback. The first Client of each pair sends a mix of
+commands to the second, which records how long each took to arrive. The
+results are the throughput (commands per second) and the latency percentiles
+and histogram, e.g::
+
+    python -m benchmarks.remote_editor_benchmarks --pairs 1 10 100
+
+The 'remote_editor' benchmarks also plug into the normal benchmark runner, so
+that transport changes can be compared against a saved baseline.
+
+Note that the Clients find the Server through the usual lock file, so these
+benchmarks refuse to run while a remote editor Server is already running.
+
+"""
+
+
+# Standard library imports.
+import argparse, itertools, json, sys, threading, time
+from timeit import default_timer
+
+# Enthought library imports.
+from envisage.plugins.remote_editor.communication.client import Client
+from envisage.plugins.remote_editor.communication.event_loop_server import (
+    EventLoopServer
+)
+from envisage.plugins.remote_editor.communication.server import Server
+from envisage.plugins.remote_editor.communication.util import (
+    read_lock_file, server_is_alive
+)
+from traits.api import Any, Int
+
+# Local imports.
+from benchmarks.runner import benchmark
+
+
+# The Servers that can be benchmarked.
+SERVERS = {
+    'threaded'   : Server,
+    'event_loop' : EventLoopServer
+}
+
+# The default mix of commands: (argument size in bytes, weight).
+DEFAULT_MIX = [(64, 9), (16 * 1024, 1)]
+
+# The upper bounds (in seconds) of the latency histogram buckets.
+HISTOGRAM_BOUNDS = [
+    scale * 10 ** exponent
+    for exponent in range(-5, 1) for scale in (1, 2, 5)
+]
+
+
+class LoadClient(Client):
+    """ A Client that records the latency of the commands it receives. """
+
+    #### 'LoadClient' interface ###############################################
+
+    # The number of commands to wait for.
+    expected = Int
+
+    # The latency of each command received (in seconds).
+    latencies = Any
+
+    # Set once all of the expected commands have been received.
+    finished = Any
+
+    ###########################################################################
+    # 'Client' interface.
+    ###########################################################################
+
+    def handle_command(self, command, arguments):
+        """ Record the latency of a command. """
+
+        now = default_timer()
+        self.latencies.append(now - float(arguments.split(' ', 1)[0]))
+        if len(self.latencies) >= self.expected:
+            self.finished.set()
+
+        return
+
+    ###########################################################################
+    # Private interface.
+    ###########################################################################
+
+    #### Trait initializers ###################################################
+
+    def _latencies_default(self):
+        """ Trait initializer. """
+
+        return []
+
+    def _finished_default(self):
+        """ Trait initializer. """
+
+        return threading.Event()
+
+
+def make_commands(messages, mix=DEFAULT_MIX):
+    """ Return the padding for each of a number of commands with a mix. """
+
+    sizes = []
+    for size, weight in mix:
+        sizes.extend([size] * weight)
+
+    return [
+        ' ' + 'x' * size for size in itertools.islice(
+            itertools.cycle(sizes), messages
+        )
+    ]
+
+
+def percentile(values, fraction):
+    """ Return a percentile of some (sorted) values. """
+
+    if len(values) == 0:
+        return 0.0
+
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def latency_histogram(latencies, bounds=HISTOGRAM_BOUNDS):
+    """ Return a histogram of latencies as a list of (bound, count) tuples.
+
+    The last bucket has a bound of None and counts the latencies larger than
+    all of the bounds.
+
+    """
+
+    counts = [0] * (len(bounds) + 1)
+    for latency in latencies:
+        for index, bound in enumerate(bounds):
+            if latency <= bound:
+                break
+
+        else:
+            index = len(bounds)
+
+        counts[index] += 1
+
+    return zip(bounds + [None], counts)
+
+
+def run_load(pairs=1, messages=1000, mix=DEFAULT_MIX, server='event_loop',
+             transport='tcp', batch_window=0, timeout=60):
+    """ Send commands between pairs of Clients and measure them.
+
+    Each of the 'pairs' senders sends 'messages' commands, from its own
+    thread, as fast as it can. Returns a dictionary of results.
+
+    """
+
+    lock = _get_running_server_lock()
+    if lock is not None:
+        raise RuntimeError(
+            'A remote editor Server is already running (port %d)' % lock[0]
+        )
+
+    instance = SERVERS[server](transport=transport)
+    instance.init()
+    server_thread = threading.Thread(target=instance.main)
+    server_thread.setDaemon(True)
+    server_thread.start()
+
+    # The Server writes its lock file before it starts listening, and any
+    # Client that finds it in between would try to replace it.
+    _wait_until(
+        lambda: _get_running_server_lock() is not None, timeout, 'the Server'
+    )
+
+    senders, receivers = [], []
+    for i in range(pairs):
+        sender = LoadClient(
+            self_type     = 'benchmark.sender%d' % i,
+            other_type    = 'benchmark.receiver%d' % i,
+            batch_window  = batch_window
+        )
+        receiver = LoadClient(
+            self_type     = 'benchmark.receiver%d' % i,
+            other_type    = 'benchmark.sender%d' % i,
+            expected      = messages
+        )
+        sender.register()
+        receiver.register()
+        senders.append(sender)
+        receivers.append(receiver)
+
+    try:
+        _wait_until(
+            lambda: all(client.registered and not client.orphaned
+                        for client in senders + receivers),
+            timeout, 'the Clients to pair'
+        )
+
+        commands = make_commands(messages, mix)
+        def send(sender):
+            """ Send all of the commands. """
+
+            for padding in commands:
+                sender.send_command('load', repr(default_timer()) + padding)
+
+            return
+
+        threads = [
+            threading.Thread(target=send, args=(sender,))
+            for sender in senders
+        ]
+
+        start = default_timer()
+        for thread in threads:
+            thread.start()
+
+        for receiver in receivers:
+            receiver.finished.wait(max(0, timeout - (default_timer() - start)))
+
+        seconds = default_timer() - start
+        for thread in threads:
+            thread.join()
+
+    finally:
+        for client in senders + receivers:
+            client.unregister()
+
+        server_thread.join(timeout)
+
+    latencies = sorted(
+        itertools.chain(*[receiver.latencies for receiver in receivers])
+    )
+
+    return dict(
+        pairs      = pairs,
+        server     = server,
+        transport  = transport,
+        sent       = pairs * messages,
+        received   = len(latencies),
+        seconds    = seconds,
+        throughput = len(latencies) / seconds,
+        latency    = dict(
+            mean = sum(latencies) / len(latencies) if latencies else 0.0,
+            p50  = percentile(latencies, 0.50),
+            p90  = percentile(latencies, 0.90),
+            p99  = percentile(latencies, 0.99),
+            max  = latencies[-1] if latencies else 0.0
+        ),
+        histogram  = latency_histogram(latencies)
+    )
+
+
+def format_result(result):
+    """ Format the results of a run for display. """
+
+    latency = result['latency']
+    lines = [
+        '%(server)s/%(transport)s, %(pairs)d pair(s): %(received)d/%(sent)d '
+        'commands in %(seconds).3f s (%(throughput).0f/s)' % result,
+        '  latency: mean %.3f ms, p50 %.3f ms, p90 %.3f ms, p99 %.3f ms, '
+        'max %.3f ms' % tuple(
+            latency[name] * 1e3 for name in ('mean', 'p50', 'p90', 'p99', 'max')
+        )
+    ]
+
+    largest = max([count for bound, count in result['histogram']] + [1])
+    for bound, count in result['histogram']:
+        if count > 0:
+            label = '<= %g ms' % (bound * 1e3) if bound is not None else '>'
+            bar = '#' * max(1, 50 * count // largest)
+            lines.append('  %12s %8d %s' % (label, count, bar))
+
+    return '\n'.join(lines)
+
+
+#### Benchmarks ###############################################################
+
+@benchmark(pairs=[1, 10, 100], server=['threaded', 'event_loop'])
+def remote_editor_load(pairs, server):
+    """ Send a burst of commands between pairs of Clients.
+
+    The time includes starting the Server and pairing the Clients, so that
+    each run starts from scratch.
+
+    """
+
+    def run():
+        run_load(pairs, messages=200, server=server)
+
+    return run
+
+
+#### Command line #############################################################
+
+def main(argv=None):
+    """ The command line entry point. """
+
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.remote_editor_benchmarks',
+        description='Measure remote editor throughput and latency.'
+    )
+    parser.add_argument(
+        '-p', '--pairs', type=int, nargs='+', default=[1, 10, 100],
+        help='numbers of concurrent Client pairs (default 1 10 100)'
+    )
+    parser.add_argument(
+        '-n', '--messages', type=int, default=1000,
+        help='commands sent by each pair (default 1000)'
+    )
+    parser.add_argument(
+        '-m', '--mix', default=None,
+        help='comma-separated SIZE:WEIGHT argument sizes (default 64:9,16384:1)'
+    )
+    parser.add_argument(
+        '-s', '--server', choices=sorted(SERVERS), nargs='+',
+        default=sorted(SERVERS), help='Servers to benchmark (default all)'
+    )
+    parser.add_argument(
+        '-t', '--transport', choices=['tcp', 'unix'], nargs='+',
+        default=['tcp'], help='Server transports to benchmark (default tcp)'
+    )
+    parser.add_argument(
+        '-w', '--batch-window', type=float, default=0,
+        help='the Client batch window in seconds (default 0)'
+    )
+    parser.add_argument(
+        '-o', '--output', default=None,
+        help='write the results to this JSON file'
+    )
+    args = parser.parse_args(argv)
+
+    mix = DEFAULT_MIX
+    if args.mix is not None:
+        mix = [
+            tuple(int(value) for value in item.split(':'))
+            for item in args.mix.split(',')
+        ]
+
+    results = []
+    for server, transport, pairs in itertools.product(
+        args.server, args.transport, args.pairs
+    ):
+        result = run_load(
+            pairs, args.messages, mix, server, transport, args.batch_window
+        )
+        results.append(result)
+
+        print format_result(result)
+        sys.stdout.flush()
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    return 0
+
+
+def _get_running_server_lock():
+    """ Return the lock of the running Server, or None if there isn't one. """
+
+    lock = read_lock_file()
+    if lock is None or not server_is_alive(lock):
+        return None
+
+    return lock
+
+
+def _wait_until(condition, timeout, description):
+    """ Wait (polling) until a condition is true. """
+
+    deadline = default_timer() + timeout
+    while not condition():
+        if default_timer() > deadline:
+            raise RuntimeError('Timed out waiting for %s' % description)
+
+        time.sleep(0.01)
+
+    return
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+#### EOF ######################################################################
@@ -0,0 +1,236 @@
+""" A minimal framework for running and comparing benchmarks.
+
+A benchmark is a function decorated with 'benchmark'. It is called once for
+each set of parameters and must return a callable that performs the work to
+be timed (any setup is done *before* returning it), e.g::
+
+    @benchmark(n=[10, 100])
+    def get_extensions(n):
+        registry = make_registry(n)
+
+        def run():
+            registry.get_extensions('my.ep')
+
+        return run
+
+Results are recorded as JSON and can be compared against a saved baseline.
+
+"""
+
+
+# Standard library imports.
+import argparse, itertools, json, platform, sys
+from timeit import default_timer
+
+
+# The modules that contain benchmarks.
+BENCHMARK_MODULES = [
+    'benchmarks.action_benchmarks',
+    'benchmarks.core_benchmarks',
+    'benchmarks.project_benchmarks',
+    'benchmarks.remote_editor_benchmarks',
+]
+
+# All registered benchmarks, in the order they were defined.
+#
+# [(name, function, [params_dict, ...])]
+BENCHMARKS = []
+
+
+def benchmark(**params):
+    """ A decorator that registers a benchmark.
+
+    Each keyword argument is a list of values for a parameter and the
+    benchmark is run for every combination of them.
+
+    """
+
+    names = sorted(params)
+    grid = [
+        dict(zip(names, values))
+        for values in itertools.product(*[params[name] for name in names])
+    ]
+
+    def decorator(fn):
+        """ Register the benchmark. """
+
+        name = '%s.%s' % (fn.__module__.split('.')[-1], fn.__name__)
+        BENCHMARKS.append((name, fn, grid))
+
+        return fn
+
+    return decorator
+
+
+def load_benchmarks(modules=None):
+    """ Import the modules that contain benchmarks. """
+
+    for module in modules or BENCHMARK_MODULES:
+        __import__(module)
+
+    return BENCHMARKS
+
+
+def result_key(name, params):
+    """ Return the key used to identify a benchmark run in the results. """
+
+    if len(params) == 0:
+        return name
+
+    return '%s[%s]' % (
+        name, ','.join('%s=%s' % item for item in sorted(params.items()))
+    )
+
+
+def time_callable(run, repeat=5, min_time=0.05):
+    """ Time a callable.
+
+    The callable is called enough times for each measurement to take at least
+    'min_time' seconds, and the best of 'repeat' measurements is returned (in
+    seconds per call).
+
+    """
+
+    number = 1
+    while True:
+        start = default_timer()
+        for i in xrange(number):
+            run()
+        elapsed = default_timer() - start
+
+        if elapsed >= min_time or number >= 1000000:
+            break
+
+        number *= 10
+
+    best = elapsed / number
+    for i in xrange(repeat - 1):
+        start = default_timer()
+        for i in xrange(number):
+            run()
+        best = min(best, (default_timer() - start) / number)
+
+    return best, number
+
+
+def run_benchmarks(pattern=None, repeat=5, min_time=0.05, out=sys.stdout):
+    """ Run all benchmarks whose names contain 'pattern'.
+
+    Returns a dictionary of results keyed by 'result_key'.
+
+    """
+
+    results = {}
+    for name, fn, grid in BENCHMARKS:
+        if pattern is not None and pattern not in name:
+            continue
+
+        for params in grid:
+            key = result_key(name, params)
+            seconds, number = time_callable(fn(**params), repeat, min_time)
+            results[key] = dict(
+                name=name, params=params, seconds=seconds, number=number
+            )
+
+            out.write('%-60s %12.3f us\n' % (key, seconds * 1e6))
+            out.flush()
+
+    return results
+
+
+def compare(results, baseline, threshold=0.2, out=sys.stdout):
+    """ Compare results against a baseline.
+
+    Returns the keys of the benchmarks that are slower than the baseline by
+    more than 'threshold' (a fraction, e.g. 0.2 is 20%).
+
+    """
+
+    regressions = []
+    for key in sorted(results):
+        if key not in baseline:
+            continue
+
+        old = baseline[key]['seconds']
+        new = results[key]['seconds']
+        ratio = new / old if old > 0 else float('inf')
+
+        if ratio > 1 + threshold:
+            status = 'SLOWER'
+            regressions.append(key)
+
+        elif ratio < 1 - threshold:
+            status = 'faster'
+
+        else:
+            status = ''
+
+        out.write('%-60s %8.2fx %s\n' % (key, ratio, status))
+
+    return regressions
+
+
+def main(argv=None):
+    """ The command line entry point. """
+
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks', description='Run Envisage benchmarks.'
+    )
+    parser.add_argument(
+        '-k', dest='pattern', default=None,
+        help='only run benchmarks whose names contain PATTERN'
+    )
+    parser.add_argument(
+        '-o', '--output', default=None,
+        help='write the results to this JSON file'
+    )
+    parser.add_argument(
+        '-b', '--baseline', default=None,
+        help='compare the results against this JSON file'
+    )
+    parser.add_argument(
+        '-t', '--threshold', type=float, default=0.2,
+        help='fractional slow-down that counts as a regression (default 0.2)'
+    )
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=5,
+        help='number of measurements per benchmark (default 5)'
+    )
+    parser.add_argument(
+        '-l', '--list', action='store_true', help='list the benchmarks'
+    )
+    args = parser.parse_args(argv)
+
+    load_benchmarks()
+
+    if args.list:
+        for name, fn, grid in BENCHMARKS:
+            for params in grid:
+                print result_key(name, params)
+
+        return 0
+
+    results = run_benchmarks(args.pattern, args.repeat)
+
+    if args.output is not None:
+        document = dict(
+            python   = platform.python_version(),
+            platform = platform.platform(),
+            results  = results
+        )
+
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+        print
+        regressions = compare(results, baseline, args.threshold)
+        if len(regressions) > 0:
+            sys.exit(1)
+
+    return 0
+
+#### EOF ######################################################################
@@ -0,0 +1,148 @@
+""" Synthetic workloads for the benchmarks. """
+
+
+# Enthought library imports.
+from envisage.api import Application, ExtensionPoint, Plugin, ServiceOffer
+from traits.api import HasTraits, Interface, List, provides
+
+
+class IBenchmarkService(Interface):
+    """ The protocol that benchmark services are registered against. """
+
+
+@provides(IBenchmarkService)
+class BenchmarkService(HasTraits):
+    """ A service! """
+
+
+def extension_point_id(index):
+    """ Return the Id of the synthetic extension point with an index. """
+
+    return 'benchmark.ep%d' % index
+
+
+def make_offering_plugin(extension_points):
+    """ Make a plugin that offers some extension points. """
+
+    traits = {'id' : 'benchmark.offering'}
+    for i in range(extension_points):
+        traits['ep%d' % i] = ExtensionPoint(List, id=extension_point_id(i))
+
+    klass = type('OfferingPlugin', (Plugin,), traits)
+
+    return klass()
+
+
+def make_contributing_plugin(index, extension_points, contributions):
+    """ Make a plugin that contributes to every extension point. """
+
+    traits = {'id' : 'benchmark.contributing%d' % index}
+    for i in range(extension_points):
+        traits['contributions%d' % i] = List(
+            range(contributions), contributes_to=extension_point_id(i)
+        )
+
+    klass = type('ContributingPlugin%d' % index, (Plugin,), traits)
+
+    return klass()
+
+
+def make_service_plugin(index, services):
+    """ Make a plugin that offers some services. """
+
+    def _service_offers_default(self):
+        return [
+            ServiceOffer(
+                protocol   = IBenchmarkService,
+                factory    = BenchmarkService,
+                properties = {}
+            )
+
+            for i in range(services)
+        ]
+
+    traits = {
+        'id'                      : 'benchmark.services%d' % index,
+        'service_offers'          : List(
+            contributes_to='envisage.service_offers'
+        ),
+        '_service_offers_default' : _service_offers_default
+    }
+
+    klass = type('ServicePlugin%d' % index, (Plugin,), traits)
+
+    return klass()
+
+
+def make_plugins(plugins, extension_points, contributions):
+    """ Make a set of plugins.
+
+    One plugin offers 'extension_points' extension points and 'plugins'
+    plugins each contribute 'contributions' extensions to all of them.
+
+    """
+
+    return [make_offering_plugin(extension_points)] + [
+        make_contributing_plugin(i, extension_points, contributions)
+
+        for i in range(plugins)
+    ]
+
+
+def make_application(plugins, extension_points, contributions, services=0):
+    """ Make an application with a synthetic set of plugins. """
+
+    # Local imports.
+    from envisage.core_plugin import CorePlugin
+
+    all_plugins = [CorePlugin()]
+    all_plugins.extend(make_plugins(plugins, extension_points, contributions))
+    if services > 0:
+        all_plugins.append(make_service_plugin(0, services))
+
+    return Application(id='benchmarks', plugins=all_plugins)
+
+
+def make_action_sets(action_sets, actions, menus=20):
+    """ Make a set of action sets.
+
+    The 'actions' actions are spread evenly over 'action_sets' action sets.
+    Each action set adds a group to one of 'menus' menus, and its actions are
+    chained together with 'after' and listed in reverse order so that none of
+    them can be placed before the one listed after it.
+
+    """
+
+    # Enthought library imports.
+    from envisage.ui.action.api import Action, ActionSet, Group, Menu
+
+    result = []
+    per_set = actions // action_sets
+    for i in range(action_sets):
+        path = 'MenuBar/Menu%d' % (i % menus)
+        group = 'Group%d' % i
+
+        chain = [
+            Action(
+                class_name = 'Action%d_%d' % (i, j),
+                path       = path,
+                group      = group,
+                after      = 'Action%d_%d' % (i, j - 1) if j > 0 else ''
+            )
+
+            for j in range(per_set)
+        ]
+        chain.reverse()
+
+        result.append(
+            ActionSet(
+                id      = 'benchmark.action_set%d' % i,
+                menus   = [Menu(name='Menu%d' % (i % menus), path='MenuBar')],
+                groups  = [Group(id=group, path=path)],
+                actions = chain
+            )
+        )
+
+    return result
+
+#### EOF ######################################################################
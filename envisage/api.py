@@ -7,26 +7,32 @@ from i_extension_point_user import IExtensionPointUser
 from i_extension_provider import IExtensionProvider
 from i_extension_registry import IExtensionRegistry
 from i_import_manager import IImportManager
+from i_listener_dispatcher import IListenerDispatcher
 from i_plugin import IPlugin
 from i_plugin_activator import IPluginActivator
 from i_plugin_manager import IPluginManager
 from i_service_registry import IServiceRegistry
 
 from application import Application
+from application_snapshot import ApplicationSnapshot
 from category import Category
 from class_load_hook import ClassLoadHook
 from egg_plugin_manager import EggPluginManager
 from extension_registry import ExtensionRegistry
 from extension_point import ExtensionPoint, contributes_to
 from extension_point_binding import ExtensionPointBinding, bind_extension_point
+from extension_point_binding import unbind_extension_point
 from extension_provider import ExtensionProvider
 from extension_point_changed_event import ExtensionPointChangedEvent
 from import_manager import ImportManager
+from listener_dispatcher import GUIDispatcher, QueuingDispatcher
+from listener_dispatcher import SynchronousDispatcher, ThreadedDispatcher
 from plugin import Plugin
 from plugin_activator import PluginActivator
 from plugin_extension_registry import PluginExtensionRegistry
 from plugin_manager import PluginManager
 from provider_extension_registry import ProviderExtensionRegistry
+from registry_metrics import RegistryMetrics
 from service import Service
 from service_offer import ServiceOffer
 from service_registry import NoSuchServiceError, ServiceRegistry
@@ -92,6 +92,18 @@ class Application(HasTraits):
     # The service registry.
     service_registry = Instance(IServiceRegistry)
 
+    # The name of a file used to snapshot the application's resolved
+    # extension registry for faster warm starts (see 'ApplicationSnapshot').
+    #
+    # If this is set, then on start the registry is populated from the
+    # snapshot as long as it was taken from the same plugins (and code), and
+    # once the application has started a fresh snapshot is saved if needed.
+    # Note that this assumes that plugin contributions are deterministic
+    # (i.e. they don't depend on, say, user preferences). Snapshots are only
+    # supported by extension registries that have 'get_provider_extensions'
+    # and 'set_provider_extensions' methods, e.g. 'PluginExtensionRegistry'.
+    snapshot_filename = Str
+
     #### Private interface ####################################################
 
     # The import manager.
@@ -290,10 +302,17 @@ class Application(HasTraits):
         # Lifecycle event.
         self.starting = event = self._create_application_event()
         if not event.veto:
+            # Warm start from a snapshot if we have one.
+            restored = self._restore_snapshot()
+
             # Start the plugin manager (this starts all of the manager's
             # plugins).
             self.plugin_manager.start()
 
+            # If the snapshot was missing (or stale) then save a fresh one.
+            if not restored:
+                self._save_snapshot()
+
             # Lifecycle event.
             self.started = self._create_application_event()
 
@@ -490,6 +509,50 @@ class Application(HasTraits):
 
         return ApplicationEvent(application=self)
 
+    def _restore_snapshot(self):
+        """ Restore the extension registry from the snapshot (if any).
+
+        Returns True if the snapshot was restored, otherwise False.
+
+        """
+
+        if not self._snapshots_enabled():
+            return False
+
+        from application_snapshot import ApplicationSnapshot
+
+        snapshot = ApplicationSnapshot.load(self.snapshot_filename)
+        if snapshot is None or not snapshot.matches(self):
+            return False
+
+        snapshot.restore(self)
+
+        return True
+
+    def _save_snapshot(self):
+        """ Save a snapshot of the extension registry (if required). """
+
+        if not self._snapshots_enabled():
+            return
+
+        from application_snapshot import ApplicationSnapshot
+
+        try:
+            ApplicationSnapshot.capture(self).save(self.snapshot_filename)
+
+        except Exception:
+            logger.exception(
+                'error saving snapshot <%s>', self.snapshot_filename
+            )
+
+        return
+
+    def _snapshots_enabled(self):
+        """ Are snapshots enabled (and supported by the registry)? """
+
+        return len(self.snapshot_filename) > 0 \
+            and hasattr(self.extension_registry, 'set_provider_extensions')
+
     def _initialize_application_home(self):
         """ Initialize the application home directory. """
 
@@ -0,0 +1,473 @@
+""" Snapshots of an application's resolved extension registry.
+
+Starting an application asks every plugin for its contributions to every
+extension point that is accessed, which involves a fair amount of
+introspection (harvesting decorated methods etc). A snapshot records the
+result of all that work (as plain data - ids, symbol paths and ordering, but
+never live objects) so that the next time the *same* set of plugins (and the
+same code!) is started the registry can be populated directly from it.
+
+"""
+
+
+# Standard library imports.
+import ast, hashlib, inspect, json, logging, os, sys
+
+# Enthought library imports.
+from traits.api import Dict, HasTraits, Int, Str
+
+# Local imports.
+from category import Category
+from file_utils import recover_file, write_atomically_with
+from import_manager import ImportManager
+from service_offer import ServiceOffer
+
+
+# Logging.
+logger = logging.getLogger(__name__)
+
+# The (name, level) of each import in a module's source, keyed by the
+# filename and modification time of the source.
+_imported_module_names = {}
+
+
+class UnsupportedValue(Exception):
+    """ Raised when a value cannot be stored in a snapshot. """
+
+
+class ApplicationSnapshot(HasTraits):
+    """ A snapshot of an application's resolved extension registry. """
+
+    # The version of the snapshot format. Snapshots with any other version are
+    # ignored.
+    FORMAT_VERSION = 2
+
+    #### 'ApplicationSnapshot' interface ######################################
+
+    # The fingerprint of the plugins (and their code) that the snapshot was
+    # taken from.
+    fingerprint = Str
+
+    # The extensions contributed to each extension point, in the form:-
+    #
+    # { extension_point_id : [[encoded contributions of provider 0], ...] }
+    #
+    # Only extension points whose contributions could *all* be encoded are
+    # included.
+    extensions = Dict
+
+    # The version of the format that the snapshot was stored in.
+    version = Int(FORMAT_VERSION)
+
+    ###########################################################################
+    # 'ApplicationSnapshot' *CLASS* interface.
+    ###########################################################################
+
+    @classmethod
+    def capture(cls, application):
+        """ Take a snapshot of an application's extension registry.
+
+        Only extension points that have already been accessed (i.e. the ones
+        that the application actually needed to start) are captured, and
+        they are captured as they were first harvested (so any changes that
+        plugins have made to their contributions since, e.g. while they were
+        starting, are not included).
+
+        """
+
+        extensions = {}
+
+        registry = application.extension_registry
+        for extension_point_id, provider_extensions in \
+                registry.get_provider_extensions().items():
+            try:
+                extensions[extension_point_id] = [
+                    [encode(extension) for extension in contributions]
+
+                    for contributions in provider_extensions
+                ]
+
+            except UnsupportedValue, exc:
+                logger.debug(
+                    'not snapshotting extension point <%s>: %s',
+                    extension_point_id, exc
+                )
+
+        snapshot = cls(
+            fingerprint = cls.get_fingerprint(application),
+            extensions  = extensions
+        )
+
+        return snapshot
+
+    @classmethod
+    def get_fingerprint(cls, application):
+        """ Return the fingerprint of an application's plugins.
+
+        The fingerprint changes if plugins are added, removed or re-ordered,
+        if the 'snapshot_version' of any plugin changes, or if any module
+        that a plugin's contributions might come from changes. Those are the
+        modules that define each plugin class and its base classes, and the
+        modules that *they* import from.
+
+        """
+
+        digest = hashlib.sha1()
+        digest.update(str(cls.FORMAT_VERSION))
+
+        module_names = set()
+        for plugin in application.extension_registry.get_providers():
+            klass = type(plugin)
+            digest.update(
+                '%s|%s.%s|%s' % (
+                    plugin.id, klass.__module__, klass.__name__,
+                    getattr(plugin, 'snapshot_version', '')
+                )
+            )
+
+            module_names.update(get_module_names(klass))
+
+        for module_name in sorted(module_names):
+            filename = getattr(sys.modules.get(module_name), '__file__', None)
+            if filename is not None and os.path.exists(filename):
+                stat = os.stat(filename)
+                digest.update('|%s|%d|%d' % (filename, stat.st_mtime,
+                                             stat.st_size))
+
+        return digest.hexdigest()
+
+    @classmethod
+    def load(cls, filename):
+        """ Load a snapshot from a file.
+
+        Returns None if the file does not exist or cannot be read.
+
+        """
+
+        if not recover_file(filename):
+            return None
+
+        try:
+            with open(filename, 'rb') as f:
+                state = json.load(f)
+
+            if state.get('version') != cls.FORMAT_VERSION:
+                logger.debug('ignoring snapshot <%s> (old format)', filename)
+                return None
+
+            snapshot = cls(
+                fingerprint = str(state['fingerprint']),
+                extensions  = state['extensions']
+            )
+
+        except Exception:
+            logger.exception('error loading snapshot <%s>', filename)
+            snapshot = None
+
+        return snapshot
+
+    ###########################################################################
+    # 'ApplicationSnapshot' interface.
+    ###########################################################################
+
+    def matches(self, application):
+        """ Is the snapshot valid for the application? """
+
+        return self.fingerprint == self.get_fingerprint(application)
+
+    def restore(self, application):
+        """ Populate an application's extension registry from the snapshot.
+
+        Returns the Ids of the extension points that were restored. Extension
+        points that have already been accessed are left alone.
+
+        """
+
+        registry = application.extension_registry
+
+        restored = []
+        for extension_point_id, provider_extensions in self.extensions.items():
+            extension_point_id = str(extension_point_id)
+            try:
+                provider_extensions = [
+                    [decode(extension) for extension in contributions]
+
+                    for contributions in provider_extensions
+                ]
+
+            except Exception:
+                logger.exception(
+                    'error restoring extension point <%s>', extension_point_id
+                )
+                continue
+
+            if registry.set_provider_extensions(
+                extension_point_id, provider_extensions
+            ):
+                restored.append(extension_point_id)
+
+        logger.debug('restored extension points %s', restored)
+
+        return restored
+
+    def save(self, filename):
+        """ Save the snapshot to a file.
+
+        The file is replaced atomically, so that a partially written snapshot
+        is never read.
+
+        """
+
+        state = {
+            'version'     : self.version,
+            'fingerprint' : self.fingerprint,
+            'extensions'  : self.extensions
+        }
+
+        write_atomically_with(filename, lambda f: json.dump(state, f))
+
+        return
+
+
+def encode(value):
+    """ Encode a value as plain (JSON-able) data.
+
+    Raise an 'UnsupportedValue' exception if the value cannot be encoded.
+
+    """
+
+    if value is None or isinstance(value, (bool, int, long, float)):
+        encoded = value
+
+    # JSON only has one kind of string, so byte strings are stored as is
+    # (they must be UTF-8) and unicode strings are tagged so that they can be
+    # told apart when they are decoded.
+    elif isinstance(value, str):
+        encoded = encode_str(value)
+
+    elif isinstance(value, unicode):
+        encoded = {'__unicode__' : value}
+
+    elif isinstance(value, list):
+        encoded = [encode(item) for item in value]
+
+    elif isinstance(value, tuple):
+        encoded = {'__tuple__' : [encode(item) for item in value]}
+
+    elif isinstance(value, dict):
+        for key in value:
+            if not isinstance(key, str) or key.startswith('__'):
+                raise UnsupportedValue('dictionary key %r' % key)
+
+        encoded = dict(
+            (encode_str(key), encode(item)) for key, item in value.items()
+        )
+
+    # Service offers and categories are snapshotted as long as all they refer
+    # to is symbol paths.
+    elif type(value) is ServiceOffer:
+        encoded = {
+            '__service_offer__' : {
+                'protocol'   : encode_symbol(value.protocol),
+                'factory'    : encode_symbol(value.factory),
+                'properties' : encode(value.properties)
+            }
+        }
+
+    elif type(value) is Category:
+        encoded = {
+            '__category__' : {
+                'class_name'        : value.class_name,
+                'target_class_name' : value.target_class_name
+            }
+        }
+
+    elif inspect.isclass(value) or inspect.isfunction(value):
+        encoded = {'__symbol__' : encode_symbol(value)}
+
+    else:
+        raise UnsupportedValue(repr(value))
+
+    return encoded
+
+
+def decode(encoded):
+    """ Decode a value encoded by 'encode'. """
+
+    if isinstance(encoded, list):
+        value = [decode(item) for item in encoded]
+
+    elif isinstance(encoded, dict):
+        if '__tuple__' in encoded:
+            value = tuple(decode(item) for item in encoded['__tuple__'])
+
+        elif '__service_offer__' in encoded:
+            state = encoded['__service_offer__']
+            value = ServiceOffer(
+                protocol   = state['protocol'],
+                factory    = state['factory'],
+                properties = decode(state['properties'])
+            )
+
+        elif '__category__' in encoded:
+            state = encoded['__category__']
+            value = Category(
+                class_name        = state['class_name'],
+                target_class_name = state['target_class_name']
+            )
+
+        elif '__symbol__' in encoded:
+            value = ImportManager().import_symbol(encoded['__symbol__'])
+
+        elif '__unicode__' in encoded:
+            value = encoded['__unicode__']
+
+        else:
+            value = dict(
+                (key.encode('utf-8'), decode(item))
+                for key, item in encoded.items()
+            )
+
+    elif isinstance(encoded, unicode):
+        value = encoded.encode('utf-8')
+
+    else:
+        value = encoded
+
+    return value
+
+
+def encode_str(value):
+    """ Encode a byte string as plain (JSON-able) data.
+
+    Raise an 'UnsupportedValue' exception if the string is not UTF-8.
+
+    """
+
+    try:
+        value.decode('utf-8')
+
+    except UnicodeDecodeError:
+        raise UnsupportedValue(repr(value))
+
+    return value
+
+
+def get_module_names(klass):
+    """ Return the names of the modules that a class's code may come from.
+
+    These are the modules that define the class and its base classes, and
+    any (already imported) module that those modules import, or import
+    anything from.
+
+    """
+
+    module_names = set()
+    for base in inspect.getmro(klass):
+        module = sys.modules.get(base.__module__)
+        if module is None or module.__name__ in module_names:
+            continue
+
+        module_names.add(module.__name__)
+        for value in module.__dict__.values():
+            if inspect.ismodule(value):
+                module_names.add(value.__name__)
+
+            elif inspect.isclass(value) or inspect.isfunction(value):
+                module_names.add(value.__module__)
+
+        # Values that are imported from other modules, but aren't classes or
+        # functions (e.g. lists of contributions), can only be traced through
+        # the module's import statements.
+        module_names.update(get_imported_module_names(module))
+
+    return module_names
+
+
+def get_imported_module_names(module):
+    """ Return the names of the (already imported) modules that a module
+    imports.
+
+    """
+
+    filename = getattr(module, '__file__', None)
+    if filename is None:
+        return set()
+
+    # Only Python source can be scanned (not extension modules etc).
+    if filename.endswith(('.pyc', '.pyo')):
+        filename = filename[:-1]
+
+    if not filename.endswith('.py') or not os.path.exists(filename):
+        return set()
+
+    key = (filename, os.path.getmtime(filename))
+
+    imported = _imported_module_names.get(key)
+    if imported is None:
+        with open(filename, 'rU') as f:
+            tree = ast.parse(f.read(), filename)
+
+        imported = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                imported.extend((alias.name, 0) for alias in node.names)
+
+            elif isinstance(node, ast.ImportFrom):
+                imported.append((node.module or '', node.level))
+                imported.extend(
+                    ('%s.%s' % (node.module, alias.name) if node.module
+                     else alias.name, node.level)
+
+                    for alias in node.names
+                )
+
+        _imported_module_names[key] = imported
+
+    # Resolve relative (explicit or implicit) imports against the module's
+    # package.
+    package = module.__name__
+    if not hasattr(module, '__path__'):
+        package = package.rpartition('.')[0]
+
+    module_names = set()
+    for name, level in imported:
+        if level > 0:
+            base = package.rsplit('.', level - 1)[0] if level > 1 else package
+            candidates = ['%s.%s' % (base, name) if name else base]
+
+        elif package:
+            candidates = ['%s.%s' % (package, name), name]
+
+        else:
+            candidates = [name]
+
+        for candidate in candidates:
+            if sys.modules.get(candidate) is not None:
+                module_names.add(candidate)
+                break
+
+    return module_names
+
+
+def encode_symbol(value):
+    """ Return the symbol path of a value (which may already be one!).
+
+    Raise an 'UnsupportedValue' exception if the value cannot be re-imported
+    from its symbol path.
+
+    """
+
+    if isinstance(value, basestring):
+        return value
+
+    module_name = getattr(value, '__module__', None)
+    name = getattr(value, '__name__', None)
+
+    module = sys.modules.get(module_name)
+    if module is None or getattr(module, name, None) is not value:
+        raise UnsupportedValue('no symbol path for %r' % value)
+
+    return '%s:%s' % (module_name, name)
+
+#### EOF ######################################################################
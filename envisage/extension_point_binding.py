@@ -5,7 +5,7 @@
 import weakref
 
 # Enthought library imports.
-from traits.api import Any, HasTraits, Instance, Str, Undefined
+from traits.api import Any, HasTraits, Instance, Property, Str, Undefined
 
 # Local imports.
 from i_extension_registry import IExtensionRegistry
@@ -17,13 +17,43 @@ class ExtensionPointBinding(HasTraits):
     #### 'ExtensionPointBinding' *CLASS* interface ############################
 
     # We keep a reference to each binding alive until its associated object
-    # is garbage collected.
+    # is garbage collected (or until the binding is explicitly unbound).
+    #
+    # Bindings only hold a *weak* reference to their object, so the entries in
+    # this dictionary really do go away when the object does.
     _bindings = weakref.WeakKeyDictionary()
 
+    @classmethod
+    def get_binding_counts(cls):
+        """ Return the number of live bindings for each extension point.
+
+        Returns a dictionary in the form {extension_point_id : count}. This is
+        intended for diagnostics (e.g. to spot bindings that are never
+        released in long-running applications).
+
+        """
+
+        counts = {}
+        for bindings in cls._bindings.values():
+            for binding in bindings:
+                extension_point_id = binding.extension_point_id
+                counts[extension_point_id] = counts.get(extension_point_id,0)+1
+
+        return counts
+
+    @classmethod
+    def get_bindings(cls, obj):
+        """ Return all of the live bindings for an object. """
+
+        return cls._bindings.get(obj, [])[:]
+
     #### 'ExtensionPointBinding' interface ####################################
 
     # The object that we are binding the extension point to.
-    obj = Any
+    #
+    # Only a weak reference to the object is held by the binding, so this is
+    # None if the object has been garbage collected.
+    obj = Property
 
     # The Id of the extension point.
     extension_point_id = Str
@@ -41,6 +71,13 @@ class ExtensionPointBinding(HasTraits):
     # A flag that prevents us from setting a trait twice.
     _event_handled = False
 
+    # A weak reference to the object that we are binding the extension point
+    # to.
+    _obj_ref = Any
+
+    # Is the binding currently wired up to the object and the registry?
+    _bound = False
+
     ###########################################################################
     # 'object' interface.
     ###########################################################################
@@ -63,10 +100,59 @@ class ExtensionPointBinding(HasTraits):
 
         return
 
+    def __enter__(self):
+        """ Enter the binding's context (the binding is already live). """
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """ Exit the binding's context by unbinding it. """
+
+        self.unbind()
+
+        return
+
     ###########################################################################
     # 'ExtensionPointBinding' interface.
     ###########################################################################
 
+    def unbind(self):
+        """ Break the binding.
+
+        This unhooks the trait change handlers from the object and the
+        listener from the extension registry. After this the object's trait
+        is no longer kept in sync with the extension point. Unbinding a
+        binding more than once has no effect.
+
+        """
+
+        if not self._bound:
+            return
+
+        self._bound = False
+
+        obj = self.obj
+        if obj is not None:
+            obj.on_trait_change(
+                self._on_trait_changed, self.trait_name, remove=True
+            )
+
+            obj.on_trait_change(
+                self._on_trait_items_changed, self.trait_name + '_items',
+                remove=True
+            )
+
+            bindings = ExtensionPointBinding._bindings.get(obj, [])
+            if self in bindings:
+                bindings.remove(self)
+
+            if len(bindings) == 0:
+                ExtensionPointBinding._bindings.pop(obj, None)
+
+        self._remove_extension_point_listener()
+
+        return
+
     #### Trait initializers ###################################################
 
     def _extension_registry_default(self):
@@ -81,6 +167,23 @@ class ExtensionPointBinding(HasTraits):
     # Private interface.
     ###########################################################################
 
+    #### Trait properties #####################################################
+
+    def _get_obj(self):
+        """ Trait property getter. """
+
+        if self._obj_ref is None:
+            return None
+
+        return self._obj_ref()
+
+    def _set_obj(self, obj):
+        """ Trait property setter. """
+
+        self._obj_ref = weakref.ref(obj, self._on_obj_collected)
+
+        return
+
     #### Trait change handlers ################################################
 
     def _on_trait_changed(self, obj, trait_name, old, new):
@@ -104,6 +207,9 @@ class ExtensionPointBinding(HasTraits):
     def _extension_point_listener(self, extension_registry, event):
         """ Listener called when an extension point is changed. """
 
+        if self.obj is None:
+            return
+
         self._event_handled = True
         if event.index is not None:
             self._update_trait(event)
@@ -133,6 +239,34 @@ class ExtensionPointBinding(HasTraits):
             self._extension_point_listener, self.extension_point_id
         )
 
+        self._bound = True
+
+        return
+
+    def _on_obj_collected(self, ref):
+        """ Weak reference callback called when the object is collected. """
+
+        # There is nothing left to keep in sync so make sure that the registry
+        # doesn't hang on to our listener.
+        if self._bound:
+            self._bound = False
+            self._remove_extension_point_listener()
+
+        return
+
+    def _remove_extension_point_listener(self):
+        """ Remove our listener from the extension registry. """
+
+        try:
+            self.extension_registry.remove_extension_point_listener(
+                self._extension_point_listener, self.extension_point_id
+            )
+
+        # The listener may already have been removed (e.g. if the registry
+        # itself was cleared).
+        except ValueError:
+            pass
+
         return
 
     def _set_trait(self, notify):
@@ -195,4 +329,19 @@ def bind_extension_point(
 
     return ExtensionPointBinding(**traits)
 
+
+def unbind_extension_point(obj, trait_name=None):
+    """ Remove bindings between an object and extension points.
+
+    If a trait name is specified then only the binding for that trait is
+    removed, otherwise all of the object's bindings are removed.
+
+    """
+
+    for binding in ExtensionPointBinding.get_bindings(obj):
+        if trait_name is None or binding.trait_name == trait_name:
+            binding.unbind()
+
+    return
+
 #### EOF ######################################################################
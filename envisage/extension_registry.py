@@ -5,11 +5,14 @@
 import logging
 
 # Enthought library imports.
-from traits.api import Dict, HasTraits, provides
+from traits.api import Dict, HasTraits, Instance, provides
 
 # Local imports.
 from extension_point_changed_event import ExtensionPointChangedEvent
 from i_extension_registry import IExtensionRegistry
+from i_listener_dispatcher import IListenerDispatcher
+from listener_dispatcher import SynchronousDispatcher
+from registry_metrics import RegistryMetrics
 import safeweakref
 from unknown_extension_point import UnknownExtensionPoint
 
@@ -22,6 +25,18 @@ logger = logging.getLogger(__name__)
 class ExtensionRegistry(HasTraits):
     """ A base class for extension registry implementation. """
 
+    #### 'ExtensionRegistry' interface ########################################
+
+    # The dispatcher used to deliver extension point changed events to
+    # listeners. By default listeners are called synchronously, but this can
+    # be replaced by (say) a 'ThreadedDispatcher' so that slow listeners don't
+    # block the code that changes the registry.
+    dispatcher = Instance(IListenerDispatcher)
+
+    # Optional call counters and timings (nothing is recorded unless this is
+    # set).
+    metrics = Instance(RegistryMetrics)
+
     ###########################################################################
     # Protected 'ExtensionRegistry' interface.
     ###########################################################################
@@ -68,7 +83,17 @@ class ExtensionRegistry(HasTraits):
     def get_extensions(self, extension_point_id):
         """ Return the extensions contributed to an extension point. """
 
-        return self._get_extensions(extension_point_id)[:]
+        metrics = self.metrics
+        if metrics is None:
+            return self._get_extensions(extension_point_id)[:]
+
+        start = metrics.timer()
+        extensions = self._get_extensions(extension_point_id)[:]
+        metrics.record_call(
+            'get_extensions', extension_point_id, metrics.timer() - start
+        )
+
+        return extensions
 
     def get_extension_point(self, extension_point_id):
         """ Return the extension point with the specified Id. """
@@ -138,10 +163,17 @@ class ExtensionRegistry(HasTraits):
             index              = index
         )
 
-        for ref in refs:
-            listener = ref()
-            if listener is not None:
-                listener(self, event)
+        metrics = self.metrics
+        if metrics is None:
+            self.dispatcher.dispatch(self, refs, event)
+
+        else:
+            start = metrics.timer()
+            self.dispatcher.dispatch(self, refs, event)
+            metrics.record_call(
+                'call_listeners', extension_point_id, metrics.timer() - start
+            )
+            metrics.record_fan_out(extension_point_id, len(refs))
 
         return
 
@@ -177,4 +209,15 @@ class ExtensionRegistry(HasTraits):
 
         return refs
 
+    ###########################################################################
+    # Private interface.
+    ###########################################################################
+
+    #### Trait initializers ###################################################
+
+    def _dispatcher_default(self):
+        """ Trait initializer. """
+
+        return SynchronousDispatcher()
+
 #### EOF ######################################################################
@@ -0,0 +1,99 @@
+""" Utility functions for replacing files safely.
+
+A file written with 'write_atomically' either has its new contents or is
+unchanged, even if the process is interrupted. The new contents are written
+to a temporary file which is then renamed over the old one. Windows will not
+rename over an existing file, so there the old file is first moved aside to
+a backup, and 'recover_file' puts it back if we were interrupted before the
+new file was in place.
+
+"""
+
+
+# Standard library imports.
+import os
+
+
+def get_backup_filename(filename):
+    """ Return the name of the backup made while a file is replaced. """
+
+    return filename + '.bak'
+
+
+def recover_file(filename):
+    """ Restore a file that was being replaced when we were interrupted.
+
+    Return True if the file exists.
+
+    """
+
+    backup_filename = get_backup_filename(filename)
+    if not os.path.exists(filename) and os.path.exists(backup_filename):
+        os.rename(backup_filename, filename)
+
+    return os.path.exists(filename)
+
+
+def replace_file(temp_filename, filename):
+    """ Replace a file with a (temporary) file that has its new contents. """
+
+    try:
+        os.rename(temp_filename, filename)
+
+    except OSError:
+        if not os.path.exists(filename):
+            raise
+
+        # Windows will not rename over an existing file, so move the old file
+        # aside (where 'recover_file' will find it) and only remove it once
+        # the new file is in place.
+        backup_filename = get_backup_filename(filename)
+        if os.path.exists(backup_filename):
+            os.remove(backup_filename)
+
+        os.rename(filename, backup_filename)
+        try:
+            os.rename(temp_filename, filename)
+
+        except OSError:
+            os.rename(backup_filename, filename)
+            raise
+
+        os.remove(backup_filename)
+
+    return
+
+
+def write_atomically(filename, data):
+    """ Write a string to a file, replacing the file atomically. """
+
+    write_atomically_with(filename, lambda f: f.write(data))
+
+    return
+
+
+def write_atomically_with(filename, function):
+    """ Write a file by calling a function with it, replacing the file
+    atomically.
+
+    The function is called with the (temporary) file, open for writing in
+    binary mode.
+
+    """
+
+    temp_filename = '%s.%d.tmp' % (filename, os.getpid())
+    try:
+        with open(temp_filename, 'wb') as f:
+            function(f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        replace_file(temp_filename, filename)
+
+    finally:
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+
+    return
+
+#### EOF ######################################################################
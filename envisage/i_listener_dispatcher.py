@@ -0,0 +1,34 @@
+""" The interface for extension point listener dispatchers. """
+
+
+# Enthought library imports.
+from traits.api import Interface
+
+
+class IListenerDispatcher(Interface):
+    """ The interface for extension point listener dispatchers.
+
+    An extension registry hands every 'ExtensionPointChangedEvent' to its
+    dispatcher, and the dispatcher decides when (and on which thread) the
+    listeners actually get called.
+
+    """
+
+    def dispatch(self, extension_registry, refs, event):
+        """ Dispatch an event to the listeners referred to by 'refs'.
+
+        'refs' is a list of weak references to listeners, in the order that
+        the listeners should be called. Dispatchers must guarantee that any
+        single listener sees the events for an extension point in the order
+        in which they were dispatched.
+
+        """
+
+    def flush(self):
+        """ Wait until all pending events have been delivered.
+
+        Dispatchers that call listeners synchronously can simply return.
+
+        """
+
+#### EOF ######################################################################
@@ -0,0 +1,374 @@
+""" Dispatchers that deliver extension point changed events to listeners. """
+
+
+# Standard library imports.
+import logging, threading
+from collections import deque
+
+# Enthought library imports.
+from traits.api import Any, Bool, HasTraits, Int, provides
+
+# Local imports.
+from extension_point_changed_event import ExtensionPointChangedEvent
+from i_listener_dispatcher import IListenerDispatcher
+
+
+# Logging.
+logger = logging.getLogger(__name__)
+
+
+@provides(IListenerDispatcher)
+class SynchronousDispatcher(HasTraits):
+    """ A dispatcher that calls listeners immediately, in line.
+
+    This is the default dispatcher used by extension registries, and any
+    exception raised by a listener propagates to whoever changed the registry.
+
+    """
+
+    ###########################################################################
+    # 'IListenerDispatcher' interface.
+    ###########################################################################
+
+    def dispatch(self, extension_registry, refs, event):
+        """ Dispatch an event to the listeners referred to by 'refs'. """
+
+        for ref in refs:
+            listener = ref()
+            if listener is not None:
+                listener(extension_registry, event)
+
+        return
+
+    def flush(self):
+        """ Wait until all pending events have been delivered. """
+
+        return
+
+
+@provides(IListenerDispatcher)
+class QueuingDispatcher(HasTraits):
+    """ A base class for dispatchers that deliver events later.
+
+    Events are queued per listener. If a listener already has an undelivered
+    event for the same extension point (i.e. the queue is backed up) then the
+    new event is coalesced into the pending one rather than being queued
+    separately. Extensions that were added and then removed (or vice versa)
+    cancel out, and if nothing is left the event is not delivered at all.
+    Whatever the events that it replaces, a coalesced event is the net list of
+    extensions added and removed, with the lowest of their indices (or 0 if
+    none of them had one), so that it is delivered as an '_items' change.
+
+    Sub-classes decide where the queue is drained by implementing
+    '_schedule'.
+
+    """
+
+    #### 'QueuingDispatcher' interface ########################################
+
+    # The number of events that have been coalesced into pending ones (useful
+    # for diagnostics).
+    coalesced_count = Int
+
+    #### Private interface ####################################################
+
+    # Protects the queue and the index of pending events.
+    _lock = Any
+
+    # The pending deliveries in the form [registry, ref, event, coalesced].
+    _queue = Any
+
+    # Pending deliveries keyed by (id(ref), extension_point_id).
+    _pending = Any
+
+    # Signalled whenever the queue becomes empty.
+    _drained = Any
+
+    ###########################################################################
+    # 'object' interface.
+    ###########################################################################
+
+    def __init__(self, **traits):
+        """ Constructor. """
+
+        super(QueuingDispatcher, self).__init__(**traits)
+
+        self._lock    = threading.Lock()
+        self._queue   = deque()
+        self._pending = {}
+        self._drained = threading.Condition(self._lock)
+
+        return
+
+    ###########################################################################
+    # 'IListenerDispatcher' interface.
+    ###########################################################################
+
+    def dispatch(self, extension_registry, refs, event):
+        """ Dispatch an event to the listeners referred to by 'refs'. """
+
+        with self._lock:
+            was_empty = len(self._queue) == 0
+
+            for ref in refs:
+                key = (id(ref), event.extension_point_id)
+                entry = self._pending.get(key)
+                if entry is not None:
+                    entry[2] = self._coalesce(entry[2], event)
+                    entry[3] = True
+                    self.coalesced_count += 1
+
+                else:
+                    entry = [extension_registry, ref, event, False]
+                    self._pending[key] = entry
+                    self._queue.append(entry)
+
+            schedule = was_empty and len(self._queue) > 0
+
+        if schedule:
+            self._schedule()
+
+        return
+
+    def flush(self):
+        """ Wait until all pending events have been delivered. """
+
+        with self._lock:
+            while len(self._queue) > 0:
+                self._drained.wait()
+
+        return
+
+    ###########################################################################
+    # Protected 'QueuingDispatcher' interface.
+    ###########################################################################
+
+    def _drain(self):
+        """ Deliver every pending event. """
+
+        while True:
+            with self._lock:
+                if len(self._queue) == 0:
+                    self._drained.notify_all()
+                    break
+
+                # The entry stays at the head of the queue (and in the pending
+                # index) until we have finished with it so that 'flush' does
+                # not return early. Once it has been removed from the index,
+                # new events for the listener get queued rather than being
+                # coalesced into one that is being delivered.
+                extension_registry, ref, event, coalesced = self._queue[0]
+                del self._pending[(id(ref), event.extension_point_id)]
+
+            # Changes that cancelled each other out are not delivered at all
+            # (but events that were empty to begin with are, just as they
+            # would be by the synchronous dispatcher).
+            listener = ref()
+            if coalesced and self._is_empty(event):
+                listener = None
+
+            if listener is not None:
+                try:
+                    listener(extension_registry, event)
+
+                except:
+                    logger.exception(
+                        'error in listener for extension point <%s>',
+                        event.extension_point_id
+                    )
+
+            with self._lock:
+                self._queue.popleft()
+
+        return
+
+    def _schedule(self):
+        """ Arrange for '_drain' to be called. """
+
+        raise NotImplementedError
+
+    ###########################################################################
+    # Private interface.
+    ###########################################################################
+
+    def _coalesce(self, pending, event):
+        """ Coalesce a new event into a pending one.
+
+        An extension that is added by one event and removed by the other (or
+        vice versa) cancels out.
+
+        """
+
+        added   = list(pending.added)
+        removed = list(pending.removed)
+
+        for extension in event.removed:
+            if extension in added:
+                added.remove(extension)
+
+            else:
+                removed.append(extension)
+
+        for extension in event.added:
+            if extension in removed:
+                removed.remove(extension)
+
+            else:
+                added.append(extension)
+
+        indices = [
+            e.index for e in (pending, event) if e.index is not None
+        ]
+        index = min(indices) if len(indices) > 0 else 0
+
+        return ExtensionPointChangedEvent(
+            extension_point_id = pending.extension_point_id,
+            added              = added,
+            removed            = removed,
+            index              = index
+        )
+
+    def _is_empty(self, event):
+        """ Is an event a change that doesn't change anything? """
+
+        return len(event.added) == 0 and len(event.removed) == 0
+
+
+class ThreadedDispatcher(QueuingDispatcher):
+    """ A dispatcher that delivers events on a background thread.
+
+    A single worker thread drains the queue, so events are delivered to each
+    listener in the order in which they were dispatched, and a slow listener
+    no longer blocks the thread that changed the registry.
+
+    """
+
+    #### 'ThreadedDispatcher' interface #######################################
+
+    # Is the worker thread running?
+    running = Bool(False)
+
+    #### Private interface ####################################################
+
+    # Signalled when there is work to do (or when the worker should stop).
+    _wakeup = Any
+
+    # The worker thread.
+    _thread = Any
+
+    ###########################################################################
+    # 'object' interface.
+    ###########################################################################
+
+    def __init__(self, **traits):
+        """ Constructor. """
+
+        super(ThreadedDispatcher, self).__init__(**traits)
+
+        self._wakeup = threading.Event()
+
+        return
+
+    ###########################################################################
+    # 'ThreadedDispatcher' interface.
+    ###########################################################################
+
+    def start(self):
+        """ Start the worker thread (if it is not already running). """
+
+        if not self.running:
+            self.running = True
+
+            self._thread = threading.Thread(target=self._run)
+            self._thread.setDaemon(True)
+            self._thread.start()
+
+        return
+
+    def stop(self):
+        """ Deliver any pending events and stop the worker thread. """
+
+        if self.running:
+            self.flush()
+
+            self.running = False
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+
+        return
+
+    ###########################################################################
+    # Protected 'QueuingDispatcher' interface.
+    ###########################################################################
+
+    def _schedule(self):
+        """ Arrange for '_drain' to be called. """
+
+        self.start()
+        self._wakeup.set()
+
+        return
+
+    ###########################################################################
+    # Private interface.
+    ###########################################################################
+
+    def _run(self):
+        """ The worker thread's main loop. """
+
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+
+            if not self.running:
+                break
+
+            self._drain()
+
+        return
+
+
+class GUIDispatcher(QueuingDispatcher):
+    """ A dispatcher that delivers events on the GUI thread.
+
+    All pending events are delivered in a single GUI callback, so a burst of
+    changes (e.g. adding a plugin that contributes to many extension points)
+    only costs one trip through the GUI event loop. Requires 'pyface'.
+
+    """
+
+    ###########################################################################
+    # 'IListenerDispatcher' interface.
+    ###########################################################################
+
+    def flush(self):
+        """ Wait until all pending events have been delivered.
+
+        If this is called on the GUI thread then the events are delivered
+        immediately (waiting would deadlock).
+
+        """
+
+        if threading.current_thread().name == 'MainThread':
+            self._drain()
+
+        else:
+            super(GUIDispatcher, self).flush()
+
+        return
+
+    ###########################################################################
+    # Protected 'QueuingDispatcher' interface.
+    ###########################################################################
+
+    def _schedule(self):
+        """ Arrange for '_drain' to be called. """
+
+        from pyface.api import GUI
+
+        GUI.invoke_later(self._drain)
+
+        return
+
+#### EOF ######################################################################
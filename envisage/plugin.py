@@ -62,6 +62,15 @@ class Plugin(ExtensionProvider):
     # just set it!
     name = Str
 
+    #### 'Plugin' interface ###################################################
+
+    # A version that is included in the fingerprint of application snapshots.
+    #
+    # Snapshots are invalidated when any module that a plugin's code comes
+    # from changes. If the plugin's contributions also depend on anything
+    # else (e.g. data files) then change this whenever they do.
+    snapshot_version = Str
+
     #### 'IExtensionPointUser' interface ######################################
 
     # The extension registry that the object's extension points are stored in.
@@ -0,0 +1,182 @@
+# Standard library imports
+import logging
+from threading import Condition, Lock, Timer, current_thread
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CommandBatcher(object):
+    """ Collects the commands sent by a Client so that those issued close
+        together can be sent to the Server as a single frame.
+
+        Commands are held for up to 'window' seconds (a window of 0 sends
+        every command as soon as it is added). A command whose
+        'coalesce_key' matches that of the command pending immediately
+        before it replaces that command, so only the last of a run of
+        idempotent commands is sent.
+
+        The batcher applies back-pressure when the Server is slow: 'add'
+        blocks while 'max_pending' commands are waiting to be sent, and
+        sending blocks while 'max_in_flight' batches are waiting to be
+        acknowledged (for at most 'ack_timeout' seconds). Sending from
+        'ack_thread', the thread that receives the acknowledgements, never
+        waits for them, since they could not arrive until it returned.
+
+        'send' is called with a list of (command, arguments) tuples and
+        should return the id of the request that carries them if the Server
+        will acknowledge it, otherwise None.
+    """
+
+    def __init__(self, send, window=0, coalesce_key=None, max_pending=1024,
+                 max_in_flight=64, ack_timeout=5, ack_thread=None):
+        self.send = send
+        self.window = window
+        self.coalesce_key = coalesce_key
+        self.max_pending = max_pending
+        self.max_in_flight = max_in_flight
+        self.ack_timeout = ack_timeout
+        self.ack_thread = ack_thread
+
+        # Commands waiting to be sent, as [command, arguments, key, time]
+        # lists.
+        self._pending = []
+
+        # The commands in each unacknowledged batch, keyed by request id, as
+        # lists of (command, time) tuples.
+        self._in_flight = {}
+
+        # The ids of requests acknowledged while a batch was being sent. The
+        # acknowledgement of a batch can arrive before 'send' has returned its
+        # id (and so before it is in '_in_flight').
+        self._sending = False
+        self._early_acks = set()
+
+        # Latency statistics in the form { command : [count, total, max] }.
+        self._latency = {}
+
+        self._condition = Condition(Lock())
+        self._send_lock = Lock()
+        self._timer = None
+
+    def add(self, command, arguments):
+        """ Add a command to be sent.
+        """
+        key = None
+        if self.coalesce_key is not None:
+            key = self.coalesce_key(command, arguments)
+
+        with self._condition:
+            while len(self._pending) >= self.max_pending:
+                self._condition.wait()
+
+            pending = self._pending
+            if key is not None and pending and pending[-1][2] == key:
+                # Keep the new command, but the time of the one it replaces,
+                # so that the latency covers the whole run.
+                pending[-1][:3] = [command, arguments, key]
+            else:
+                pending.append([command, arguments, key, time.time()])
+
+            if self.window <= 0:
+                flush_now = True
+            else:
+                flush_now = False
+                if self._timer is None:
+                    self._timer = Timer(self.window, self.flush)
+                    self._timer.setDaemon(True)
+                    self._timer.start()
+
+        if flush_now:
+            self.flush()
+
+    def flush(self):
+        """ Send all pending commands now.
+        """
+        with self._send_lock:
+            with self._condition:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                batch, self._pending = self._pending, []
+                self._condition.notify_all()
+                if not batch:
+                    return
+
+                # Wait for the Server to catch up.
+                deadline = time.time() + self.ack_timeout
+                waiting = current_thread() is not self.ack_thread
+                while waiting and len(self._in_flight) >= self.max_in_flight:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        logger.warning("Server has not acknowledged %i "
+                                       "batches. Sending anyway...",
+                                       len(self._in_flight))
+                        self._in_flight.clear()
+                        break
+                    self._condition.wait(remaining)
+
+                self._sending = True
+
+            try:
+                request_id = self.send([(command, arguments)
+                                        for command, arguments, key, t
+                                        in batch])
+            finally:
+                with self._condition:
+                    self._sending = False
+                    early_acks, self._early_acks = self._early_acks, set()
+
+            sent = [(command, t) for command, arguments, key, t in batch]
+            with self._condition:
+                if request_id is None or request_id in early_acks:
+                    self._record(sent)
+                else:
+                    self._in_flight[request_id] = sent
+
+    def acknowledged(self, request_id):
+        """ Called when the Server acknowledges a request.
+        """
+        with self._condition:
+            sent = self._in_flight.pop(request_id, None)
+            if sent is not None:
+                self._record(sent)
+                self._condition.notify_all()
+            elif self._sending:
+                self._early_acks.add(request_id)
+
+    def stop(self):
+        """ Send any pending commands and stop waiting for acknowledgements.
+        """
+        self.flush()
+        with self._condition:
+            self._in_flight.clear()
+            self._condition.notify_all()
+
+    def get_latency_stats(self):
+        """ Return the latency of each command that has been sent, as a
+            dictionary of the form::
+
+                { command : {'count' : n, 'mean' : seconds, 'max' : seconds} }
+
+            Latency is measured from when a command is added until the Server
+            acknowledges it (or, without a persistent connection, until it has
+            been sent).
+        """
+        with self._condition:
+            return dict((command, dict(count=count, mean=total/count,
+                                       max=maximum))
+                        for command, (count, total, maximum)
+                        in self._latency.items())
+
+    def _record(self, sent):
+        now = time.time()
+        for command, t in sent:
+            latency = now - t
+            stats = self._latency.get(command)
+            if stats is None:
+                self._latency[command] = [1, latency, latency]
+            else:
+                stats[0] += 1
+                stats[1] += latency
+                stats[2] = max(stats[2], latency)
@@ -1,20 +1,30 @@
 # Standard library imports
+import json
 import logging
 import os
 import select
 import socket
 import sys
 from threading import Thread
+import time
+import zlib
 
 # ETS imports
-from traits.api import HasTraits, Int, Str, Bool, Instance, List, \
+from traits.api import HasTraits, Int, Str, Bool, Float, Instance, List, \
      Tuple, Enum
 from envisage.plugins import remote_editor
 
 # Local imports
-from server import Server
-from util import accept_no_intr, get_server_port, receive, send_port, \
-    spawn_independent, MESSAGE_SEP
+from batcher import CommandBatcher
+from dispatcher import UIDispatcher
+from payload_codecs import choose_codec, decode_payload, encode_payload, \
+    is_payload, COMPRESSIONS, CODECS
+from connection import Connection, ACK_COMMAND, CONNECT_COMMAND, \
+    CONNECTED_COMMAND, PROTOCOL_VERSION
+from util import accept_no_intr, acquire_spawn_lock, encode_fields, \
+    read_lock_file, receive, release_spawn_lock, remove_lock_file, send, \
+    send_port, server_is_alive, split_arguments, spawn_independent, \
+    HAS_UNIX_SOCKETS, MESSAGE_SEP, SOCKET_PATH, SPAWN_TIMEOUT
 
 logger = logging.getLogger(__name__)
 
@@ -27,57 +37,34 @@ class ClientThread(Thread):
         Thread.__init__(self)
         self.client = client
         self._finished = False
+        self._connection = None
 
     def run(self):
         # Get the server port, spawning it if necessary
-        server_port = get_server_port()
-        if server_port == -1 or not Server.ping(server_port, timeout=5):
-            if len(self.client.server_prefs):
-                # Spawn the server
-                logger.info("Client spawning Server...")
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(5)
-                sock.bind(('localhost', 0))
-                sock.listen(1)
-                port = sock.getsockname()[1]
-                args = self.client.server_prefs + ( port, )
-                code = "from envisage.plugins.remote_editor.communication." \
-                    "server import main; main(r'%s', '%s', %i)" % args
-                spawn_independent([sys.executable, '-c', code])
-
-                # Await a reponse from the server
-                try:
-                    server, address = accept_no_intr(sock)
-                    try:
-                        command, arguments = receive(server)
-                        if command == "__port__":
-                            self.client._server_port = int(arguments)
-                        else:
-                            raise socket.error
-                    finally:
-                        # Use try...except to handle timeouts
-                        try:
-                            server.shutdown(socket.SHUT_RD)
-                        except:
-                            pass
-                except socket.error, e:
-                    logger.error(repr(e))
-                    logger.error("Client spawned a non-responsive Server! " \
-                                     "Unregistering...")
-                    self.client.error = True
-                    self.client.unregister()
-                    return
-                finally:
-                    sock.close()
-
-            else:
-                logger.error("Client could not contact the Server and no " \
-                                 "spawn command is defined. Unregistering...")
+        lock = read_lock_file()
+        if lock is not None and server_is_alive(lock):
+            self.client._server_port = lock[0]
+        elif len(self.client.server_prefs):
+            server_port = self._find_or_spawn_server()
+            if server_port == -1:
                 self.client.error = True
                 self.client.unregister()
                 return
-        else:
             self.client._server_port = server_port
+        else:
+            logger.error("Client could not contact the Server and no " \
+                             "spawn command is defined. Unregistering...")
+            self.client.error = True
+            self.client.unregister()
+            return
+
+        # Prefer a persistent connection to the Server, falling back to
+        # one-shot connections if the Server does not support them.
+        if self.client.persistent:
+            connection = self._connect(self.client._server_port)
+            if connection is not None:
+                self._run_persistent(connection)
+                return
 
         # Create the socket that will receive commands from the server
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -87,18 +74,13 @@ class ClientThread(Thread):
 
         # Register with the server
         port = str(self.client._port)
-        arguments = MESSAGE_SEP.join((port, self.client.self_type,
-                                      self.client.other_type))
+        arguments = (port, self.client.self_type, self.client.other_type)
         self.client.error = not send_port(self.client._server_port, 'register',
-                                          arguments)
+                                          arguments, binary=self.client.binary)
         self.client.registered = True
 
         # Send queued commands (these can only exist if we spawned the server)
-        for command, args in self.client._queue:
-            arguments = MESSAGE_SEP.join((port, command, args))
-            self.client.error = not send_port(self.client._server_port, 'send',
-                                              arguments)
-        self.client._queue = []
+        self.client._send_queue()
 
         # Start the loop to listen for commands from the Server
         logger.info("Client listening on port %i..." % self.client._port)
@@ -118,38 +100,204 @@ class ClientThread(Thread):
                 command, arguments = receive(server)
                 msg = r"Client on port %s received: %s %s"
                 logger.debug(msg, port, command, arguments)
+                self._handle_command(command, arguments)
+        finally:
+            self.client.unregister()
+
+    def _find_or_spawn_server(self):
+        """ Spawn a Server, unless another Client is already doing so, in
+            which case wait for it. Returns the Server port, or -1 if no
+            Server could be started.
+        """
+        deadline = time.time() + SPAWN_TIMEOUT
+        while time.time() < deadline:
+            if acquire_spawn_lock():
+                try:
+                    # Another Client may have started a Server while we were
+                    # waiting for the lock.
+                    lock = read_lock_file()
+                    if lock is not None:
+                        if server_is_alive(lock):
+                            return lock[0]
+                        logger.info("Client removing stale Server lock...")
+                        remove_lock_file(lock)
+                    return self._spawn_server()
+                finally:
+                    release_spawn_lock()
+
+            # Another Client is spawning a Server, so wait for it to start.
+            time.sleep(.1)
+            lock = read_lock_file()
+            if lock is not None and server_is_alive(lock):
+                return lock[0]
 
-                # Handle special commands from the server
-                if command == "__orphaned__":
-                    self.client.orphaned = bool(int(arguments))
+        logger.error("Timed out waiting for another Client to spawn the "
+                     "Server. Unregistering...")
+        return -1
 
-                elif command == "__error__":
-                    error_status = arguments[0]
-                    error_message = ''
-                    if len(arguments) > 0:
-                        error_message = arguments[1:]
-                    logger.warning("Error status received from the server: " \
-                                       "%s\n%s" % (error_status, error_message))
-                    self.client.error = bool(int(error_status))
+    def _spawn_server(self):
+        """ Spawn a Server and wait for it to report its port. Returns the
+            port, or -1 if the Server did not respond.
+        """
+        logger.info("Client spawning Server...")
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(5)
+        sock.bind(('localhost', 0))
+        sock.listen(1)
+        port = sock.getsockname()[1]
+        args = self.client.server_prefs + ( port, )
+        code = "from envisage.plugins.remote_editor.communication." \
+            "server import main; main(r'%s', '%s', %i)" % args
+        spawn_independent([sys.executable, '-c', code])
 
-                # Handle other commands through Client interface
+        # Await a reponse from the server
+        try:
+            server, address = accept_no_intr(sock)
+            try:
+                command, arguments = receive(server)
+                if command == "__port__":
+                    return int(arguments)
                 else:
-                    if self.client.ui_dispatch == 'off':
-                        self.client.handle_command(command, arguments)
-                    else:
-                        if self.client.ui_dispatch == 'auto':
-                            from pyface.gui import GUI
-                        else:
-                            exec('from pyface.ui.%s.gui import GUI' %
-                                 self.client.ui_dispatch)
-                        GUI.invoke_later(self.client.handle_command,
-                                         command, arguments)
+                    raise socket.error
+            finally:
+                # Use try...except to handle timeouts
+                try:
+                    server.shutdown(socket.SHUT_RD)
+                except:
+                    pass
+        except socket.error, e:
+            logger.error(repr(e))
+            logger.error("Client spawned a non-responsive Server! " \
+                             "Unregistering...")
+            return -1
+        finally:
+            sock.close()
+
+    def _connect(self, server_port):
+        """ Open a persistent connection to the Server. Returns None if the
+            Server does not support persistent connections.
+        """
+        # Prefer the Server's Unix domain socket, if it has one.
+        sock = None
+        if self.client.transport == 'auto' and HAS_UNIX_SOCKETS and \
+                os.path.exists(SOCKET_PATH):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(5)
+            try:
+                sock.connect(SOCKET_PATH)
+            except socket.error:
+                sock.close()
+                sock = None
+
+        try:
+            if sock is None:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.settimeout(5)
+                sock.connect(('localhost', server_port))
+            send(sock, CONNECT_COMMAND, str(PROTOCOL_VERSION))
+            command, arguments = receive(sock)
+            if command != CONNECTED_COMMAND:
+                raise socket.error
+        except socket.error:
+            logger.info("Server does not support persistent connections. "
+                        "Falling back to one-shot connections...")
+            sock.close()
+            return None
+
+        sock.settimeout(None)
+        version, port = split_arguments(arguments, 2)
+        self.client._server_version = int(version)
+        self.client._port = int(port)
+        return Connection(sock)
+
+    def _run_persistent(self, connection):
+        """ Register and listen for commands over a persistent connection.
+        """
+        self._connection = connection
+        self.client._connection = connection
+
+        # Register with the server
+        port = str(self.client._port)
+        fields = [port, self.client.self_type, self.client.other_type]
+        if self.client._server_version >= 2:
+            fields.append(' '.join(self.client._get_capabilities()))
+        try:
+            connection.request('register', MESSAGE_SEP.join(fields))
+            self.client.error = False
+        except socket.error:
+            self.client.error = True
+        self.client.registered = True
+
+        # Send queued commands (these can only exist if we spawned the server)
+        self.client._send_queue()
+
+        # Start the loop to listen for commands from the Server
+        logger.info("Client connected to server from port %s..." % port)
+        try:
+            while not self._finished:
+                request_id, command, arguments = connection.receive()
+                msg = r"Client on port %s received: %s %s"
+                logger.debug(msg, port, command, arguments)
+                if command == ACK_COMMAND:
+                    batcher = self.client._batcher
+                    if batcher is not None:
+                        batcher.acknowledged(request_id)
+                    continue
+                self.client.error = False
+                self._handle_command(command, arguments)
+        except socket.error:
+            pass
         finally:
             self.client.unregister()
+            connection.close()
+
+    def _handle_command(self, command, arguments):
+        """ Handle a command received from the Server.
+        """
+        # Handle special commands from the server
+        if command == "__keepalive__":
+            pass
+
+        elif command == "__orphaned__":
+            self.client.orphaned = bool(int(arguments))
+            if self.client.orphaned:
+                self.client._peer_capabilities = []
+
+        elif command == "__peer__":
+            self.client._peer_capabilities = arguments.split()
+
+        elif command == "__error__":
+            error_status = arguments[0]
+            error_message = ''
+            if len(arguments) > 0:
+                error_message = arguments[1:]
+            logger.warning("Error status received from the server: " \
+                               "%s\n%s" % (error_status, error_message))
+            self.client.error = bool(int(error_status))
+
+        # Handle other commands through Client interface
+        else:
+            if is_payload(arguments):
+                try:
+                    arguments = decode_payload(arguments)
+                except (ValueError, TypeError, zlib.error), e:
+                    logger.error("Client could not decode the arguments of "
+                                 "'%s': %s" % (command, e))
+                    return
+
+            dispatcher = self.client._dispatcher
+            if dispatcher is None:
+                self.client.handle_command(command, arguments)
+            else:
+                dispatcher.dispatch(command, arguments)
 
     def stop(self):
         self._finished = True
 
+        # Closing a persistent connection wakes up the listening loop.
+        if self._connection is not None:
+            self._connection.close()
+
 
 class Client(HasTraits):
     """ An object that communicates with another object through a Server.
@@ -169,7 +317,9 @@ class Client(HasTraits):
 
     # Specifies how 'handle_command' should be called. If 'auto', use the
     # dispatch method appropriate for the toolkit Traits is using. Failure to
-    # set this variable as appropriate will likely result in crashes.
+    # set this variable as appropriate will likely result in crashes. Commands
+    # that arrive together are handled in a single GUI callback, with runs of
+    # idempotent commands (see 'idempotent_commands') collapsed to the last.
     ui_dispatch = Enum('off', 'auto', 'wx', 'qt4')
 
     # Whether this client has been registered with the Server. Note that this is
@@ -185,11 +335,62 @@ class Client(HasTraits):
     # this object's counterpart.
     error = Bool(False)
 
+    # Whether to use a single, persistent connection to the Server for all
+    # commands in both directions. If the Server does not support this, or if
+    # this is False, a new connection is made for every command.
+    persistent = Bool(True)
+
+    # Whether to use the binary framing for commands sent without a persistent
+    # connection. This allows arguments to contain any data at all, and makes
+    # large commands cheaper to receive, but requires a Server that
+    # understands it (any Server that supports persistent connections does).
+    binary = Bool(False)
+
+    # How to connect to the Server. With 'auto', a persistent connection is
+    # made over the Server's Unix domain socket if it has one (see
+    # 'Server.transport'), and over TCP otherwise.
+    transport = Enum('auto', 'tcp')
+
+    # Commands issued within this many seconds of each other are sent to the
+    # Server together, as a single batch. If this is 0 every command is sent
+    # immediately. Note that batches require a Server that supports them (any
+    # Server that supports persistent connections does).
+    batch_window = Float(0)
+
+    # Commands that are idempotent: a command in this list replaces the
+    # command sent immediately before it if both have the same name and the
+    # same first argument (e.g. successive 'goto_line' commands for the same
+    # file), as long as the first has not been sent yet. The same applies to
+    # received commands waiting to be handled on the GUI thread.
+    idempotent_commands = List(Str)
+
+    # The payload codecs this Client understands, in order of preference.
+    # Arguments are encoded with the first of these that the paired Client
+    # also understands; with Clients that do not support codecs (and for
+    # broadcasts) strings are sent as they are and anything else as JSON.
+    codecs = List(Str, ['binary', 'json', 'raw'])
+
+    # Arguments at least this long are compressed if the paired Client
+    # supports it. A value of 0 turns compression off.
+    compression_threshold = Int(4096)
+
+    # The maximum number of commands (or batches) sent over a persistent
+    # connection that the Server has not yet acknowledged. Sending blocks while
+    # this many are outstanding.
+    max_in_flight = Int(64)
+
     # Protected traits
     _port = Int
     _server_port = Int
+    _server_version = Int
+    _peer_capabilities = List(Str)
     _communication_thread = Instance(ClientThread)
-    _queue = List(Tuple(Str, Str))
+    _connection = Instance(Connection)
+    _batcher = Instance(CommandBatcher)
+    _dispatcher = Instance(UIDispatcher)
+    # Commands issued before registration, as (kind, command, arguments)
+    # where kind is 'send' or 'broadcast'.
+    _queue = List(Tuple(Str, Str, Str))
 
     def register(self):
         """ Inform the server that this Client is available to receive
@@ -200,6 +401,19 @@ class Client(HasTraits):
 
         self._communication_thread = ClientThread(self)
         self._communication_thread.setDaemon(True)
+
+        # The communication thread receives the acknowledgements, so it must
+        # never wait for them.
+        self._batcher = CommandBatcher(self._send_batch,
+                                       window=self.batch_window,
+                                       coalesce_key=self.coalesce_key,
+                                       max_in_flight=self.max_in_flight,
+                                       ack_thread=self._communication_thread)
+        if self.ui_dispatch != 'off':
+            # Resolve the GUI class now, rather than for every command.
+            self._dispatcher = UIDispatcher(self.handle_command,
+                                            toolkit=self.ui_dispatch,
+                                            coalesce_key=self.coalesce_key)
         self._communication_thread.start()
 
     def unregister(self):
@@ -208,10 +422,26 @@ class Client(HasTraits):
             Client is becoming unavailable. Calling 'unregister' when a Client
             is not registered has no effect.
         """
-        if self._communication_thread is not None:
-            self._communication_thread.stop()
-            self._communication_thread = None
-            send_port(self._server_port, 'unregister', str(self._port))
+        # Take the thread first, since the thread itself may be unregistering
+        # us at the same time.
+        thread, self._communication_thread = self._communication_thread, None
+        if thread is not None:
+            # Make sure that any commands waiting to be batched are sent.
+            batcher, self._batcher = self._batcher, None
+            if batcher is not None and self.registered:
+                batcher.stop()
+
+            connection = self._connection
+            if connection is not None:
+                try:
+                    connection.send('unregister', str(self._port))
+                except socket.error:
+                    pass
+                self._connection = None
+                thread.stop()
+            else:
+                thread.stop()
+                send_port(self._server_port, 'unregister', str(self._port))
             self._port = 0
             self._server_port = 0
             self.registered = False
@@ -226,12 +456,50 @@ class Client(HasTraits):
 
         msg = r"Client on port %i sending: %s %s"
         logger.debug(msg, self._port, command, arguments)
+        arguments = self._encode_arguments(arguments, self._peer_capabilities)
 
-        args = MESSAGE_SEP.join((str(self._port), command, arguments))
         if self.registered:
-            self.error = not send_port(self._server_port, 'send', args)
+            self._batcher.add(command, arguments)
         else:
-            self._queue.append((command, arguments))
+            self._queue.append(('send', command, arguments))
+
+    def broadcast_command(self, command, arguments=''):
+        """ Send a command to every registered object of the appropriate
+            type, rather than just to the one this Client is paired with.
+        """
+        if self._communication_thread is None:
+            raise RuntimeError, "Client is not registered. Cannot send command."
+
+        msg = r"Client on port %i broadcasting: %s %s"
+        logger.debug(msg, self._port, command, arguments)
+        arguments = self._encode_arguments(arguments, [])
+
+        if self.registered:
+            # Keep the broadcast in order with any batched commands.
+            self._batcher.flush()
+            self._send('broadcast', (str(self._port), command, arguments))
+        else:
+            self._queue.append(('broadcast', command, arguments))
+
+    def coalesce_key(self, command, arguments):
+        """ Returns a key identifying commands that replace each other when
+            batched, or None if the command should always be sent. By default
+            this uses 'idempotent_commands'.
+        """
+        if command in self.idempotent_commands and \
+                isinstance(arguments, basestring):
+            return command, arguments.split(MESSAGE_SEP, 1)[0]
+        return None
+
+    def get_latency_stats(self):
+        """ Returns the latency of the commands sent by this Client as a
+            dictionary of the form::
+
+                { command : {'count' : n, 'mean' : seconds, 'max' : seconds} }
+        """
+        if self._batcher is None:
+            return {}
+        return self._batcher.get_latency_stats()
 
     def handle_command(self, command, arguments):
         """ This function should take a command string and an arguments string
@@ -240,6 +508,95 @@ class Client(HasTraits):
         """
         raise NotImplementedError
 
+    def _get_capabilities(self):
+        """ Returns the capabilities this Client declares when it registers.
+        """
+        capabilities = [name for name in self.codecs if name in CODECS]
+        if self.compression_threshold > 0:
+            capabilities.extend(COMPRESSIONS)
+        return capabilities
+
+    def _encode_arguments(self, arguments, capabilities):
+        """ Encode the arguments of a command for a Client with the given
+            capabilities.
+        """
+        compression = None
+        if self.compression_threshold > 0 and 'zlib' in capabilities:
+            compression = 'zlib'
+
+        structured = [name for name in self.codecs
+                      if CODECS.get(name) and CODECS[name].structured]
+        if isinstance(arguments, unicode):
+            # Only byte strings can be sent, so unicode is encoded with a
+            # structured codec (so that it arrives as unicode) if the peer
+            # has one, and as UTF-8 otherwise.
+            codec = choose_codec(structured, capabilities)
+            if codec is None:
+                return arguments.encode('utf-8')
+        elif isinstance(arguments, str):
+            # Strings only need encoding if they are worth compressing.
+            if not is_payload(arguments) and (compression is None or
+                    len(arguments) < self.compression_threshold):
+                return arguments
+            codec = choose_codec(self.codecs, capabilities)
+            if codec is None:
+                return arguments
+        else:
+            codec = choose_codec(structured, capabilities)
+            if codec is None:
+                return json.dumps(arguments)
 
+        return encode_payload(arguments, codec, compression,
+                              self.compression_threshold)
 
-
+    def _send_queue(self):
+        """ Send the commands that were queued before registration.
+        """
+        queue, self._queue = self._queue, []
+
+        # Consecutive sends go together, and broadcasts go on their own.
+        commands = []
+        for kind, command, arguments in queue:
+            if kind == 'send':
+                commands.append((command, arguments))
+                continue
+            if commands:
+                self._send_batch(commands)
+                commands = []
+            self._send('broadcast', (str(self._port), command, arguments))
+        if commands:
+            self._send_batch(commands)
+
+    def _send_batch(self, commands):
+        """ Send a list of (command, arguments) tuples to the server. Returns
+            the id of the request if it was sent over the persistent connection.
+        """
+        # Only Servers that support persistent connections understand
+        # batches, so without one each command is sent on its own.
+        if len(commands) == 1 or self._connection is None:
+            for command, arguments in commands:
+                request_id = self._send('send', (str(self._port), command,
+                                                 arguments))
+            return request_id
+
+        fields = []
+        for command, arguments in commands:
+            fields.extend((command, arguments))
+        return self._send('batch', (str(self._port), encode_fields(fields)))
+
+    def _send(self, command, args):
+        """ Send a command to the server, over the persistent connection if
+            there is one. Returns the id of the request in that case.
+        """
+        connection = self._connection
+        if connection is not None:
+            try:
+                request_id = connection.request(command, MESSAGE_SEP.join(args))
+                self.error = False
+                return request_id
+            except socket.error:
+                self.error = True
+        else:
+            self.error = not send_port(self._server_port, command, args,
+                                       binary=self.binary)
+        return None
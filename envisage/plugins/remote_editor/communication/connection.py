@@ -0,0 +1,90 @@
+# Standard library imports
+import socket
+import struct
+from threading import Lock
+
+# Local imports
+from util import receive_into, MESSAGE_SEP
+
+
+# The header of each frame sent over a persistent connection: the length of
+# the payload followed by the id of the request that the frame belongs to.
+# Frames that are not part of a request/reply exchange have a request id of 0.
+FRAME_HEADER = struct.Struct('!II')
+
+# The commands used to upgrade a one-shot connection to a persistent one.
+CONNECT_COMMAND = '__connect__'
+CONNECTED_COMMAND = '__connected__'
+
+# The command the Server uses to acknowledge a request.
+ACK_COMMAND = '__ack__'
+
+# The version of the persistent connection protocol. Version 2 Servers accept
+# a list of capabilities (such as payload codecs) when a Client registers.
+PROTOCOL_VERSION = 2
+
+
+class Connection(object):
+    """ A long-lived connection that carries many framed messages in both
+        directions.
+
+        Each frame has a fixed-width header containing the payload length
+        and a request id, so several requests can be in flight at once and
+        replies can be matched up with them. Sending is thread-safe; receiving
+        should only be done from one thread.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self._send_lock = Lock()
+        self._request_id = 0
+
+    def close(self):
+        """ Close the connection. Any thread blocked in 'receive' will get a
+            socket.error.
+        """
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self.sock.close()
+
+    def fileno(self):
+        """ Allow the connection to be used with 'select'.
+        """
+        return self.sock.fileno()
+
+    def receive(self):
+        """ Receive a frame. Returns a (request_id, command, arguments) tuple.
+            Raises socket.error if the connection is closed.
+        """
+        header = self._receive_exactly(FRAME_HEADER.size)
+        length, request_id = FRAME_HEADER.unpack_from(header)
+        payload = str(self._receive_exactly(length))
+        command, sep, arguments = payload.partition(MESSAGE_SEP)
+        return request_id, command, arguments
+
+    def request(self, command, arguments=''):
+        """ Send a command as a new request. Returns the request id, which the
+            other end will use in its reply.
+        """
+        with self._send_lock:
+            self._request_id = self._request_id % 0xffffffff + 1
+            request_id = self._request_id
+            self._send(request_id, command, arguments)
+        return request_id
+
+    def send(self, command, arguments='', request_id=0):
+        """ Send a command (optionally as a reply to a request).
+        """
+        with self._send_lock:
+            self._send(request_id, command, arguments)
+
+    def _send(self, request_id, command, arguments):
+        payload = command + MESSAGE_SEP + arguments
+        self.sock.sendall(FRAME_HEADER.pack(len(payload), request_id) + payload)
+
+    def _receive_exactly(self, length):
+        data = bytearray(length)
+        receive_into(self.sock, data)
+        return data
@@ -0,0 +1,80 @@
+# Standard library imports
+import logging
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+
+def get_gui_class(toolkit='auto'):
+    """ Returns the pyface GUI class for a toolkit ('auto' for the toolkit
+        that Traits is using).
+    """
+    if toolkit == 'auto':
+        from pyface.gui import GUI
+        return GUI
+    module = __import__('pyface.ui.%s.gui' % toolkit, fromlist=['GUI'])
+    return module.GUI
+
+
+class UIDispatcher(object):
+    """ Passes the commands received by a Client to a handler on the GUI
+        thread.
+
+        Commands that arrive while a GUI callback is already pending are
+        queued and handled by that same callback, so a burst of commands
+        costs one trip through the GUI event loop rather than one per
+        command. A command whose 'coalesce_key' matches that of the command
+        queued immediately before it replaces that command, so only the last
+        of a run of idempotent commands is handled.
+
+        'invoke_later' is called with a callable to run on the GUI thread. If
+        it is not given, that of the GUI class for 'toolkit' is used.
+    """
+
+    def __init__(self, handler, toolkit='auto', coalesce_key=None,
+                 invoke_later=None):
+        self.handler = handler
+        self.coalesce_key = coalesce_key
+        if invoke_later is None:
+            invoke_later = get_gui_class(toolkit).invoke_later
+        self.invoke_later = invoke_later
+
+        # Commands waiting to be handled, as (command, arguments, key)
+        # tuples, and whether a callback to handle them has been scheduled.
+        self._pending = []
+        self._scheduled = False
+        self._lock = Lock()
+
+    def dispatch(self, command, arguments):
+        """ Queue a command to be handled on the GUI thread.
+        """
+        key = None
+        if self.coalesce_key is not None:
+            key = self.coalesce_key(command, arguments)
+
+        with self._lock:
+            pending = self._pending
+            if key is not None and pending and pending[-1][2] == key:
+                pending[-1] = (command, arguments, key)
+            else:
+                pending.append((command, arguments, key))
+
+            if self._scheduled:
+                return
+            self._scheduled = True
+
+        self.invoke_later(self._drain)
+
+    def _drain(self):
+        """ Handle all of the queued commands. Called on the GUI thread.
+        """
+        with self._lock:
+            batch, self._pending = self._pending, []
+            self._scheduled = False
+
+        for command, arguments, key in batch:
+            try:
+                self.handler(command, arguments)
+            except Exception:
+                logger.exception("Client failed to handle command '%s'",
+                                 command)
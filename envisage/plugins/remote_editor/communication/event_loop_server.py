@@ -0,0 +1,472 @@
+# Standard library imports
+from collections import deque
+from errno import EINPROGRESS, EINTR, EWOULDBLOCK, EAGAIN
+import logging
+import select
+import socket
+import time
+
+# ETS imports
+from traits.api import Any, Dict, Float, Int
+
+# Local imports
+from connection import Connection, FRAME_HEADER, CONNECT_COMMAND, \
+    CONNECTED_COMMAND, PROTOCOL_VERSION
+from server import Server
+from util import decode_message, encode_message, message_length, \
+    send_port, MESSAGE_SEP, SOCKET_PATH
+
+logger = logging.getLogger("communication")
+
+# Errors that just mean "try again later" on a non-blocking socket.
+WOULD_BLOCK = (EAGAIN, EWOULDBLOCK, EINTR)
+
+# Small chunks of outgoing data are joined up to this size before sending.
+SEND_SIZE = 65536
+
+
+def make_wakeup_pair():
+    """ Return a pair of connected sockets used to wake up 'select'.
+    """
+    if hasattr(socket, 'socketpair'):
+        return socket.socketpair()
+
+    # Windows has no 'socketpair' so make one over the loopback interface.
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        listener.bind(('localhost', 0))
+        listener.listen(1)
+        writer = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        writer.connect(listener.getsockname())
+        reader, address = listener.accept()
+    finally:
+        listener.close()
+    return reader, writer
+
+
+class Peer(Connection):
+    """ A non-blocking socket managed by the EventLoopServer.
+
+        Peers are 'incoming' (a Client has connected to send a one-shot
+        command), 'persistent' (an incoming connection that has been upgraded
+        to carry frames in both directions) or 'outgoing' (the Server is
+        delivering a one-shot command to a Client). Nothing is sent
+        immediately; data is buffered until the socket is writable.
+    """
+
+    def __init__(self, sock, kind, port=None, deadline=None):
+        Connection.__init__(self, sock)
+        sock.setblocking(False)
+        self.kind = kind
+        self.port = port
+        self.deadline = deadline
+        self.connected = kind != 'outgoing'
+        self.closed = False
+        self.close_when_flushed = False
+
+        # The command to re-route if an outgoing delivery fails, as a
+        # (origin port, command, arguments) tuple.
+        self.retry = None
+
+        # Incoming data is accumulated in a bytearray so that large messages
+        # are received in linear time.
+        self.rbuf = bytearray()
+
+        # Outgoing data is queued as chunks (the first of which may have been
+        # partly sent), so that a large backlog is sent in linear time.
+        self.wbuf = deque()
+        self.wbuf_offset = 0
+        self.wbuf_size = 0
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            Connection.close(self)
+
+    def write(self, data):
+        """ Buffer data to be sent when the socket is writable.
+        """
+        if data:
+            self.wbuf.append(data)
+            self.wbuf_size += len(data)
+
+    def next_chunk(self):
+        """ Return (a view of) the next data to send.
+        """
+        # Join small chunks so that a burst of commands isn't sent one
+        # system call at a time.
+        if len(self.wbuf) > 1 and \
+                len(self.wbuf[0]) - self.wbuf_offset < SEND_SIZE:
+            pieces = [self.wbuf.popleft()[self.wbuf_offset:]]
+            size = len(pieces[0])
+            while self.wbuf and size + len(self.wbuf[0]) <= SEND_SIZE:
+                pieces.append(self.wbuf.popleft())
+                size += len(pieces[-1])
+            self.wbuf.appendleft(''.join(pieces))
+            self.wbuf_offset = 0
+
+        return buffer(self.wbuf[0], self.wbuf_offset)
+
+    def consume(self, count):
+        """ Discard data that has been sent.
+        """
+        self.wbuf_size -= count
+        self.wbuf_offset += count
+        if self.wbuf_offset >= len(self.wbuf[0]):
+            self.wbuf.popleft()
+            self.wbuf_offset = 0
+
+    def _send(self, request_id, command, arguments):
+        payload = command + MESSAGE_SEP + arguments
+        self.write(FRAME_HEADER.pack(len(payload), request_id) + payload)
+
+
+class EventLoopServer(Server):
+    """ A Server that handles all of its Clients from a single, non-blocking
+        event loop.
+
+        Unlike the basic Server, routing a command never waits on the
+        network: deliveries to one-shot Clients connect and write in the
+        background, every peer has its own timeout, and keepalives for
+        orphans are sent without holding up other traffic. A peer that is
+        dead or too slow is unregistered when its timeout expires, and any
+        command it was being sent is re-routed as the basic Server would have
+        done.
+    """
+
+    # How long a peer may take to complete a connection, a one-shot message
+    # or to accept buffered data (in seconds).
+    peer_timeout = Float(5)
+
+    # The maximum amount of data buffered for a peer before it is considered
+    # to be stuck.
+    max_buffer_size = Int(64 * 1024 * 1024)
+
+    # All peers, keyed by socket.
+    _peers = Dict
+
+    # Used to wake up the event loop when peers are added from other threads.
+    _wakeup_reader = Any
+    _wakeup_writer = Any
+
+    # The origin port of the command currently being routed by '_send_from'.
+    _origin = Any
+
+    def main(self, port=0):
+        """ Starts the server event loop. See 'Server.main'.
+        """
+        self._wakeup_reader, self._wakeup_writer = make_wakeup_pair()
+        self._wakeup_reader.setblocking(False)
+        try:
+            logger.info("Server listening on port %i..." % self._port)
+            self._sock.listen(128)
+
+            # If necessary, inform the launcher that we have initialized
+            # correctly by telling it our port
+            if port:
+                if not send_port(port, "__port__", str(self._port), timeout=5):
+                    msg = "Server could not contact spawner. Shutting down..."
+                    logger.warning(msg)
+                    return
+
+            self._sock.setblocking(False)
+            if self._unix_sock is not None:
+                logger.info("Server listening on %s..." % SOCKET_PATH)
+                self._unix_sock.listen(128)
+                self._unix_sock.setblocking(False)
+            self._stopped = False
+            next_keepalive = time.time() + self.heartbeat_interval
+            while not self._stopped:
+                self._poll(next_keepalive)
+                if time.time() >= next_keepalive:
+                    with self._lock:
+                        self._gc()
+                    next_keepalive = time.time() + self.heartbeat_interval
+        finally:
+            with self._lock:
+                for peer in self._peers.values():
+                    peer.close()
+                self._peers.clear()
+            self._sock.close()
+            self._close_unix_socket()
+            self._remove_lock_file()
+            self._wakeup_reader.close()
+            self._wakeup_writer.close()
+
+    ###########################################################################
+    # Server interface
+    ###########################################################################
+
+    def _send_from(self, port, command, arguments):
+        """ Send a command from an object on the specified port.
+        """
+        self._origin = port
+        try:
+            Server._send_from(self, port, command, arguments)
+        finally:
+            self._origin = None
+
+    def _send_to(self, port, command, arguments):
+        """ Send a command to an object on the specified port. This only fails
+            immediately if the port is obviously dead; otherwise the command
+            is delivered in the background.
+        """
+        with self._lock:
+            connection = self._connections.get(port)
+            if connection is not None:
+                connection.send(command, arguments)
+                if connection.wbuf_size > self.max_buffer_size:
+                    logger.warning("Client on port %i is not reading its "
+                                   "commands.", port)
+                    self._fail(connection)
+                    return False
+                self._watch(connection)
+                return True
+
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            errno = sock.connect_ex(('localhost', port))
+            if errno not in (0, EINPROGRESS) + WOULD_BLOCK:
+                sock.close()
+                msg = "Server failed to communicate with client on port %i. " \
+                    "Unregistering..."
+                logger.warning(msg % port)
+                self._unregister(port)
+                return False
+
+            peer = Peer(sock, 'outgoing', port)
+            peer.write(encode_message(command, arguments,
+                                      self._is_binary(port)))
+            peer.close_when_flushed = True
+            if self._origin is not None and self._origin != port \
+                    and not command.startswith('__'):
+                peer.retry = (self._origin, command, arguments)
+            self._add_peer(peer)
+            return True
+
+    def _stop(self):
+        """ Stop the Server.
+        """
+        self._stopped = True
+        self._wake()
+
+    ###########################################################################
+    # Private interface
+    ###########################################################################
+
+    def _add_peer(self, peer):
+        self._peers[peer.sock] = peer
+        self._watch(peer)
+        self._wake()
+
+    def _wake(self):
+        """ Wake up the event loop (if it is waiting in another thread).
+        """
+        if self._wakeup_writer is not None:
+            try:
+                self._wakeup_writer.send('x')
+            except socket.error:
+                pass
+
+    def _watch(self, peer):
+        """ Start the timeout for a peer that has data waiting to be sent.
+        """
+        if peer.wbuf and peer.deadline is None:
+            peer.deadline = time.time() + self.peer_timeout
+
+    def _poll(self, next_keepalive):
+        """ Wait for, and handle, one round of socket events.
+        """
+        with self._lock:
+            readers = [self._sock, self._wakeup_reader]
+            if self._unix_sock is not None:
+                readers.append(self._unix_sock)
+            writers = []
+            deadlines = [next_keepalive]
+            for peer in self._peers.values():
+                if peer.kind != 'outgoing':
+                    readers.append(peer.sock)
+                if peer.wbuf or not peer.connected:
+                    writers.append(peer.sock)
+                if peer.deadline is not None:
+                    deadlines.append(peer.deadline)
+        timeout = max(0, min(deadlines) - time.time())
+
+        try:
+            readable, writable, errors = select.select(readers, writers, [],
+                                                       timeout)
+        except (select.error, socket.error), err:
+            if err[0] == EINTR:
+                return
+            raise
+
+        with self._lock:
+            for sock in readable:
+                if sock is self._sock or sock is self._unix_sock:
+                    self._accept(sock)
+                elif sock is self._wakeup_reader:
+                    self._drain_wakeup()
+                elif sock in self._peers:
+                    self._read(self._peers[sock])
+
+            for sock in writable:
+                peer = self._peers.get(sock)
+                if peer is not None and not peer.closed:
+                    self._write(peer)
+
+            now = time.time()
+            for peer in self._peers.values():
+                if not peer.closed and peer.deadline is not None \
+                        and peer.deadline < now:
+                    logger.warning("Server timed out communicating with "
+                                   "port %s.", peer.port)
+                    self._fail(peer)
+
+            for sock, peer in self._peers.items():
+                if peer.closed:
+                    del self._peers[sock]
+
+    def _accept(self, sock):
+        try:
+            client, address = sock.accept()
+        except socket.error, err:
+            if err[0] in WOULD_BLOCK:
+                return
+            raise
+
+        if sock is self._unix_sock:
+            # Clients on the Unix domain socket have no port, so they are
+            # given an id instead.
+            peer = Peer(client, 'incoming', self._local_id(),
+                        time.time() + self.peer_timeout)
+            self._peers[client] = peer
+            return
+
+        if address[0] != '127.0.0.1':
+            msg = "Server received connection from a non-local " \
+                "party (port %s). Ignoring..."
+            logger.warning(msg, address[0])
+            client.close()
+            return
+
+        peer = Peer(client, 'incoming', address[1],
+                    time.time() + self.peer_timeout)
+        self._peers[client] = peer
+
+    def _drain_wakeup(self):
+        try:
+            while self._wakeup_reader.recv(4096):
+                pass
+        except socket.error:
+            pass
+
+    def _read(self, peer):
+        try:
+            data = peer.sock.recv(65536)
+        except socket.error, err:
+            if err[0] in WOULD_BLOCK:
+                return
+            data = ''
+
+        if not data:
+            self._fail(peer)
+            return
+
+        peer.rbuf += data
+        if peer.kind == 'incoming':
+            # Progress was made, so give a large one-shot message more time.
+            peer.deadline = time.time() + self.peer_timeout
+            self._read_message(peer)
+        if peer.kind == 'persistent':
+            self._read_frames(peer)
+
+    def _read_message(self, peer):
+        """ Handle a complete one-shot message, if one has arrived.
+        """
+        try:
+            end = message_length(peer.rbuf)
+        except socket.error:
+            logger.warning("Server received a malformed message from port "
+                           "%s.", peer.port)
+            peer.close()
+            return
+        if end is None or len(peer.rbuf) < end:
+            return
+
+        command, arguments = decode_message(peer.rbuf[:end])
+        del peer.rbuf[:end]
+        logger.debug("Server received: %s %s", command, arguments)
+
+        if command == CONNECT_COMMAND:
+            # Upgrade to a persistent connection.
+            peer.kind = 'persistent'
+            peer.deadline = None
+            peer.write(encode_message(CONNECTED_COMMAND, MESSAGE_SEP.join(
+                (str(PROTOCOL_VERSION), str(peer.port)))))
+            self._watch(peer)
+            self._connections[peer.port] = peer
+            logger.debug("Server accepted persistent connection from port %i",
+                         peer.port)
+        else:
+            peer.close()
+            self._handle_command(command, arguments)
+
+    def _read_frames(self, peer):
+        """ Handle all of the complete frames that have arrived.
+        """
+        while len(peer.rbuf) >= FRAME_HEADER.size and not peer.closed:
+            length, request_id = FRAME_HEADER.unpack_from(peer.rbuf)
+            end = FRAME_HEADER.size + length
+            if len(peer.rbuf) < end:
+                break
+            payload = str(peer.rbuf[FRAME_HEADER.size:end])
+            del peer.rbuf[:end]
+            command, sep, arguments = payload.partition(MESSAGE_SEP)
+            self._handle_request(peer.port, request_id, command, arguments)
+
+    def _write(self, peer):
+        if not peer.connected:
+            errno = peer.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if errno:
+                self._fail(peer)
+                return
+            peer.connected = True
+
+        if peer.wbuf:
+            try:
+                sent = peer.sock.send(peer.next_chunk())
+            except socket.error, err:
+                if err[0] in WOULD_BLOCK:
+                    return
+                self._fail(peer)
+                return
+            peer.consume(sent)
+
+            # Progress was made, so restart the peer's timeout.
+            peer.deadline = None
+            self._watch(peer)
+
+        if not peer.wbuf and peer.close_when_flushed:
+            try:
+                peer.sock.shutdown(socket.SHUT_WR)
+            except socket.error:
+                pass
+            peer.close()
+
+    def _fail(self, peer):
+        """ Give up on a peer.
+        """
+        peer.close()
+        if peer.kind == 'persistent':
+            self._connection_closed(peer.port)
+        elif peer.kind == 'outgoing':
+            msg = "Server failed to communicate with client on port %i. " \
+                "Unregistering..."
+            logger.warning(msg % peer.port)
+            self._unregister(peer.port)
+
+            # Try to deliver the command somewhere else.
+            if peer.retry is not None:
+                origin, command, arguments = peer.retry
+                if origin in self._port_map:
+                    self._send_from(origin, command, arguments)
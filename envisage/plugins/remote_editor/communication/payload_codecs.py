@@ -0,0 +1,239 @@
+""" Payload codecs for the arguments of remote editor commands.
+
+    Clients that support codecs tell the Server which ones they understand
+    when they register, and the Server tells each Client what its partner
+    understands. A Client then encodes its arguments with the first codec in
+    its own preference list that its partner also supports, compressing them
+    if they are large. Arguments sent to (or received from) Clients that do
+    not support codecs are plain strings, as before.
+"""
+
+# Standard library imports
+import json
+import struct
+import zlib
+
+
+# Encoded payloads start with this prefix, followed by the codec tag and the
+# compression tag.
+PAYLOAD_MAGIC = '\x00\x07'
+
+# The compression methods supported.
+COMPRESSIONS = ['zlib']
+
+
+class Codec(object):
+    """ The base class for codecs.
+    """
+
+    # The name used when negotiating codecs.
+    name = ''
+
+    # The single character used to mark payloads encoded with this codec.
+    tag = ''
+
+    # Whether this codec can encode values other than strings.
+    structured = True
+
+    def encode(self, value):
+        """ Encode a value as a string.
+        """
+        raise NotImplementedError
+
+    def decode(self, data):
+        """ Decode a string produced by 'encode'.
+        """
+        raise NotImplementedError
+
+
+class RawCodec(Codec):
+    """ Strings are sent as they are.
+    """
+
+    name = 'raw'
+    tag = 'r'
+    structured = False
+
+    def encode(self, value):
+        if not isinstance(value, str):
+            raise TypeError('the raw codec can only encode strings')
+        return value
+
+    def decode(self, data):
+        return data
+
+
+class JSONCodec(Codec):
+    """ Values are encoded as JSON.
+    """
+
+    name = 'json'
+    tag = 'j'
+
+    def encode(self, value):
+        return json.dumps(value, separators=(',', ':'))
+
+    def decode(self, data):
+        return json.loads(data)
+
+
+class BinaryCodec(Codec):
+    """ A compact, msgpack-style binary encoding of None, booleans, integers,
+        floats, strings, unicode, lists (and tuples) and dictionaries. Unlike
+        JSON, strings are not escaped, so arbitrary binary data (such as file
+        contents) is cheap to send. Tuples are decoded as lists.
+    """
+
+    name = 'binary'
+    tag = 'b'
+
+    _length = struct.Struct('!I')
+    _int = struct.Struct('!q')
+    _float = struct.Struct('!d')
+
+    def encode(self, value):
+        parts = []
+        self._encode(value, parts)
+        return ''.join(parts)
+
+    def decode(self, data):
+        # Truncated or malformed data shows up as struct and index errors (or
+        # as unbounded nesting), so they are reported as ValueErrors like
+        # any other bad data.
+        try:
+            value, offset = self._decode(data, 0)
+        except (IndexError, struct.error, RuntimeError), e:
+            raise ValueError('malformed data: %s' % e)
+        if offset != len(data):
+            raise ValueError('trailing data after encoded value')
+        return value
+
+    def _encode(self, value, parts):
+        if value is None:
+            parts.append('N')
+        elif value is True:
+            parts.append('T')
+        elif value is False:
+            parts.append('F')
+        elif isinstance(value, (int, long)):
+            if -2**63 <= value < 2**63:
+                parts.append('i' + self._int.pack(value))
+            else:
+                text = str(value)
+                parts.append('L' + self._length.pack(len(text)) + text)
+        elif isinstance(value, float):
+            parts.append('d' + self._float.pack(value))
+        elif isinstance(value, str):
+            parts.append('s' + self._length.pack(len(value)))
+            parts.append(value)
+        elif isinstance(value, unicode):
+            text = value.encode('utf-8')
+            parts.append('u' + self._length.pack(len(text)))
+            parts.append(text)
+        elif isinstance(value, (list, tuple)):
+            parts.append('l' + self._length.pack(len(value)))
+            for item in value:
+                self._encode(item, parts)
+        elif isinstance(value, dict):
+            parts.append('m' + self._length.pack(len(value)))
+            for key, item in value.iteritems():
+                self._encode(key, parts)
+                self._encode(item, parts)
+        else:
+            raise TypeError('cannot encode %r' % (value,))
+
+    def _decode(self, data, offset):
+        tag = data[offset]
+        offset += 1
+        if tag == 'N':
+            return None, offset
+        elif tag == 'T':
+            return True, offset
+        elif tag == 'F':
+            return False, offset
+        elif tag == 'i':
+            return self._int.unpack_from(data, offset)[0], offset + 8
+        elif tag == 'd':
+            return self._float.unpack_from(data, offset)[0], offset + 8
+
+        length, = self._length.unpack_from(data, offset)
+        offset += 4
+        if tag in 'suL':
+            end = offset + length
+            if end > len(data):
+                raise ValueError('truncated string')
+            text = data[offset:end]
+            if tag == 'u':
+                text = text.decode('utf-8')
+            elif tag == 'L':
+                text = long(text)
+            return text, end
+        elif tag == 'l':
+            items = []
+            for i in xrange(length):
+                item, offset = self._decode(data, offset)
+                items.append(item)
+            return items, offset
+        elif tag == 'm':
+            items = {}
+            for i in xrange(length):
+                key, offset = self._decode(data, offset)
+                items[key], offset = self._decode(data, offset)
+            return items, offset
+        raise ValueError('unknown tag %r' % tag)
+
+
+# All available codecs, keyed by name.
+CODECS = dict((codec.name, codec)
+              for codec in (RawCodec(), JSONCodec(), BinaryCodec()))
+
+_CODECS_BY_TAG = dict((codec.tag, codec) for codec in CODECS.values())
+
+
+def choose_codec(preferred, supported):
+    """ Returns the first codec named in 'preferred' that is in 'supported',
+        or None if there is none.
+    """
+    for name in preferred:
+        if name in supported and name in CODECS:
+            return CODECS[name]
+    return None
+
+
+def encode_payload(value, codec, compression=None, threshold=4096):
+    """ Encode a value with a codec, compressing it if 'compression' is given
+        and the encoded value is at least 'threshold' bytes long.
+    """
+    data = codec.encode(value)
+    compressed = '0'
+    if compression == 'zlib' and len(data) >= threshold:
+        packed = zlib.compress(data)
+        if len(packed) < len(data):
+            data, compressed = packed, 'z'
+    return PAYLOAD_MAGIC + codec.tag + compressed + data
+
+
+def is_payload(data):
+    """ Returns whether a string was produced by 'encode_payload'.
+    """
+    return isinstance(data, str) and data[:len(PAYLOAD_MAGIC)] == PAYLOAD_MAGIC
+
+
+def decode_payload(data):
+    """ Decode a string produced by 'encode_payload'. Raises ValueError if it
+        uses an unknown codec or compression method, or if it is malformed.
+    """
+    offset = len(PAYLOAD_MAGIC)
+    if len(data) < offset + 2:
+        raise ValueError('truncated payload')
+    tag, compressed = data[offset:offset+2]
+    codec = _CODECS_BY_TAG.get(tag)
+    if codec is None:
+        raise ValueError('unknown codec %r' % tag)
+
+    data = data[offset+2:]
+    if compressed == 'z':
+        data = zlib.decompress(data)
+    elif compressed != '0':
+        raise ValueError('unknown compression %r' % compressed)
+    return codec.decode(data)
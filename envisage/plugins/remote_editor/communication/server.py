@@ -1,21 +1,31 @@
 # Standard library imports
+from collections import deque
+import itertools
 import os, sys
 import logging
 import socket
+import threading
+import time
 
 # ETS imports
 from apptools.preferences.api import Preferences
-from traits.api import HasTraits, HasStrictTraits, Int, Str, List, \
-     Dict, Tuple, Instance
+from traits.api import HasTraits, HasStrictTraits, Any, Bool, Enum, Float, \
+     Int, Str, List, Dict, Tuple, Instance
 
 # Local imports
-from util import accept_no_intr, receive, send_port, spawn_independent, \
-    MESSAGE_SEP, LOCK_PATH, LOG_PATH
+from connection import Connection, ACK_COMMAND, CONNECT_COMMAND, \
+    CONNECTED_COMMAND, PROTOCOL_VERSION
+from util import accept_no_intr, decode_fields, receive, remove_lock_file, \
+    send, send_port, split_arguments, spawn_independent, write_lock_file, \
+    HAS_UNIX_SOCKETS, MESSAGE_SEP, LOG_PATH, SOCKET_PATH
 
 logger = logging.getLogger("communication")
 logger.setLevel(logging.DEBUG)
 logging.basicConfig(filename=LOG_PATH)
 
+# How long the heartbeat waits for an orphaned Client (in seconds).
+KEEPALIVE_TIMEOUT = 5
+
 
 class PortInfo(HasStrictTraits):
     """ Object to store information on how a port is being used.
@@ -24,11 +34,149 @@ class PortInfo(HasStrictTraits):
     type = Str
     other_type = Str
 
+    # Whether the object registered using the binary framing (and so can be
+    # sent commands using it).
+    binary = Bool
+
+    # The capabilities (such as payload codecs) that the object declared when
+    # it registered. This is empty for older Clients.
+    capabilities = List(Str)
+
     def __str__(self):
         return "Port: %i, Type: %s, Other type: %s" % \
             (self.port, self.type, self.other_type)
 
 
+class OrphanQueue(object):
+    """ The orphans of one type, in the order in which they became orphans.
+        Orphans can be added, removed and taken from the front of the queue
+        in (amortized) constant time.
+    """
+
+    def __init__(self):
+        # port -> (sequence number, PortInfo)
+        self._orphans = {}
+
+        # (sequence number, port) for each orphan, in order. Entries for
+        # orphans that have since been removed are skipped (and dropped when
+        # there are too many of them).
+        self._order = deque()
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self._orphans)
+
+    def add(self, info):
+        """ Add an orphan to the back of the queue. An orphan that is already
+            in the queue keeps its place.
+        """
+        entry = self._orphans.get(info.port)
+        if entry is not None:
+            self._orphans[info.port] = (entry[0], info)
+        else:
+            sequence = next(self._sequence)
+            self._orphans[info.port] = (sequence, info)
+            self._order.append((sequence, info.port))
+
+    def remove(self, port):
+        """ Remove the orphan on a port (if there is one).
+        """
+        if self._orphans.pop(port, None) is not None and \
+                len(self._order) > 2 * len(self._orphans) + 16:
+            self._order = deque(sorted((sequence, port) for port, (sequence,
+                                       info) in self._orphans.items()))
+
+    def pop(self):
+        """ Remove and return the orphan at the front of the queue, or None if
+            it is empty.
+        """
+        while self._order:
+            sequence, port = self._order.popleft()
+            entry = self._orphans.get(port)
+            if entry is not None and entry[0] == sequence:
+                del self._orphans[port]
+                return entry[1]
+        return None
+
+    def values(self):
+        """ Returns the orphans in order.
+        """
+        return [info for sequence, info in sorted(self._orphans.values())]
+
+
+class ConnectionThread(threading.Thread):
+    """ A thread that reads commands from a persistent Client connection and
+        hands them to the Server.
+    """
+
+    def __init__(self, server, connection, port):
+        threading.Thread.__init__(self)
+        self.server = server
+        self.connection = connection
+        self.port = port
+
+    def run(self):
+        try:
+            while True:
+                request_id, command, arguments = self.connection.receive()
+                self.server._handle_request(self.port, request_id, command,
+                                            arguments)
+        except socket.error:
+            pass
+        finally:
+            self.server._connection_closed(self.port)
+
+
+class HeartbeatThread(threading.Thread):
+    """ A thread that periodically checks that orphaned Clients are still
+        alive, so that this does not hold up registration or routing.
+    """
+
+    def __init__(self, server):
+        threading.Thread.__init__(self)
+        self.server = server
+
+    def run(self):
+        server = self.server
+        while not server._stopped:
+            time.sleep(server.heartbeat_interval)
+            if not server._stopped:
+                server._heartbeat()
+
+
+class UnixListenerThread(threading.Thread):
+    """ A thread that accepts Client connections on the Server's Unix domain
+        socket.
+    """
+
+    def __init__(self, server):
+        threading.Thread.__init__(self)
+        self.server = server
+
+    def run(self):
+        server = self.server
+        while not server._stopped:
+            try:
+                client, address = accept_no_intr(server._unix_sock)
+            except socket.error:
+                break
+            persistent = False
+            try:
+                command, arguments = receive(client)
+                logger.debug("Server received: %s %s", command, arguments)
+                if command == CONNECT_COMMAND:
+                    persistent = server._accept_connection(
+                        client, server._local_id())
+                else:
+                    with server._lock:
+                        server._handle_command(command, arguments)
+            except socket.error:
+                pass
+            finally:
+                if not persistent:
+                    client.close()
+
+
 class Server(HasTraits):
     """ A socket protocal that facilates two objects communicating with each
         other.
@@ -40,31 +188,85 @@ class Server(HasTraits):
 
     spawn_commands = Dict(Str, Str)
 
+    # How Clients with persistent connections reach the Server. With 'unix'
+    # the Server also listens on a Unix domain socket (at SOCKET_PATH), which
+    # has lower latency than TCP and does not use up loopback ports. This can
+    # be set with the 'transport' preference in the '<node>.communication'
+    # preference node. The 'unix' transport falls back to 'tcp' on platforms
+    # without Unix domain sockets.
+    transport = Enum('tcp', 'unix')
+
+    # How often to check that orphaned Clients are still alive (in seconds).
+    heartbeat_interval = Float(300)
+
     _port = Int
     _sock = Instance(socket.socket)
     _port_map = Dict(Int, Instance(PortInfo))
-    _orphans = List(Instance(PortInfo))
     _pairs = Dict(Instance(PortInfo), Instance(PortInfo))
 
+    # Orphans waiting to be paired, indexed by type so that matching does not
+    # have to scan them all: type -> OrphanQueue. Orphans of a type are
+    # paired in the order in which they became orphans.
+    _orphans = Dict(Str, Any)
+
+    # All registered objects, indexed by type (for broadcasting):
+    # type -> {port : PortInfo}.
+    _types = Dict(Str, Any)
+
     # Commands that have been queued for spawned process
     # desired_type -> list of (command, arguments)
     _queue = Dict(Str, List(Tuple(Str, Str)))
 
+    # Persistent connections to Clients, keyed by the port that identifies the
+    # Client. Commands for these Clients are sent over the connection rather
+    # than by connecting to the Client.
+    _connections = Dict(Int, Instance(Connection))
+
+    # Serializes command handling between the main loop and the connection
+    # threads.
+    _lock = Any
+
+    # The thread running the mainloop, and whether the mainloop should stop.
+    _main_thread = Instance(threading.Thread)
+    _stopped = Bool(False)
+
+    # The Unix domain socket (if the 'unix' transport is used), and the
+    # (device, inode) of its file, so that we never remove a socket file that
+    # has since been replaced by another Server.
+    _unix_sock = Any
+    _unix_sock_id = Any
+
+    # The contents of the lock file written by this Server.
+    _lock_info = Any
+
+    # The last id given to a Client connected over the Unix domain socket.
+    # These Clients have no port, so they get an id outside the port range.
+    _last_local_id = Int(0xffff)
+
+    def __init__(self, **traits):
+        super(Server, self).__init__(**traits)
+        self._lock = threading.RLock()
+
     def init(self, pref_path='', pref_node=''):
         """ Read a configuration file and attempt to bind the server to the
             specified port.
         """
+        # Read configuration file
+        if pref_path:
+            self._read_preferences(pref_path, pref_node)
+
         # Bind to port and write port to lock file
         self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._sock.bind(('localhost', 0))
         self._port = self._sock.getsockname()[1]
-        f = open(LOCK_PATH, 'w')
-        f.write(str(self._port))
-        f.close()
+        self._lock_info = write_lock_file(self._port)
 
-        # Read configuration file
-        if not pref_path:
-            return
+        if self.transport == 'unix':
+            self._bind_unix_socket()
+
+    def _read_preferences(self, pref_path, pref_node):
+        """ Read the spawn commands and communication settings.
+        """
         if os.path.exists(pref_path):
             prefs = Preferences(filename=pref_path)
             if prefs.node_exists(pref_node):
@@ -74,6 +276,13 @@ class Server(HasTraits):
                     if cmd.startswith('python '):
                         cmd = cmd.replace('python', sys.executable, 1)
                     self.spawn_commands[key] = cmd
+                transport = prefs.get(pref_node + '.communication.transport',
+                                      self.transport).strip()
+                if transport in ('tcp', 'unix'):
+                    self.transport = transport
+                else:
+                    msg = "Server given unknown transport '%s'. Ignoring..."
+                    logger.error(msg % transport)
             else:
                 msg = "Server could not locate preference node '%s.'"
                 logger.error(msg % pref_node)
@@ -81,6 +290,49 @@ class Server(HasTraits):
             msg = "Server given non-existent preference path '%s'."
             logger.error(msg % pref_path)
 
+    def _bind_unix_socket(self):
+        """ Bind the Unix domain socket, replacing any left behind by a
+            Server that did not shut down cleanly.
+        """
+        if not HAS_UNIX_SOCKETS:
+            logger.info("Unix domain sockets are not supported. Using TCP...")
+            return
+
+        if os.path.exists(SOCKET_PATH):
+            os.remove(SOCKET_PATH)
+        self._unix_sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._unix_sock.bind(SOCKET_PATH)
+        stat = os.stat(SOCKET_PATH)
+        self._unix_sock_id = (stat.st_dev, stat.st_ino)
+
+    def _remove_lock_file(self):
+        """ Remove the lock file, unless another Server has replaced it.
+        """
+        if self._lock_info is not None:
+            remove_lock_file(self._lock_info)
+            self._lock_info = None
+
+    def _close_unix_socket(self):
+        """ Close and remove the Unix domain socket (if there is one).
+        """
+        if self._unix_sock is not None:
+            self._unix_sock.close()
+            self._unix_sock = None
+            try:
+                stat = os.stat(SOCKET_PATH)
+                if (stat.st_dev, stat.st_ino) == self._unix_sock_id:
+                    os.remove(SOCKET_PATH)
+            except OSError:
+                pass
+
+    def _local_id(self):
+        """ Returns a new id for a Client connected over the Unix domain
+            socket.
+        """
+        with self._lock:
+            self._last_local_id += 1
+            return self._last_local_id
+
     def main(self, port=0):
         """ Starts the server mainloop. If 'port' is specified, the assumption
             is that this Server was spawned from an object on said port. The
@@ -92,8 +344,15 @@ class Server(HasTraits):
             # we are working. This means that if the spawner tries to register,
             # we will be ready.
             logger.info("Server listening on port %i..." % self._port)
-            self._sock.listen(5)
+            # Use a large backlog, since many Clients may register at once.
+            self._sock.listen(128)
             self._sock.settimeout(300)
+            if self._unix_sock is not None:
+                logger.info("Server listening on %s..." % SOCKET_PATH)
+                self._unix_sock.listen(128)
+                thread = UnixListenerThread(self)
+                thread.setDaemon(True)
+                thread.start()
 
             # If necessary, inform the launcher that we have initialized
             # correctly by telling it our port
@@ -104,42 +363,150 @@ class Server(HasTraits):
                     return
 
             # Start the mainloop
-            while True:
+            self._main_thread = threading.current_thread()
+            self._stopped = False
+
+            # Periodically check on orphans, to make sure the server doesn't
+            # stay on with dead processes as zombies.
+            heartbeat = HeartbeatThread(self)
+            heartbeat.setDaemon(True)
+            heartbeat.start()
+            while not self._stopped:
                 try:
                     client, address = accept_no_intr(self._sock)
                 except socket.timeout:
-                    # Every 5 minutes of inactivity, we trigger a garbage
-                    # collection. We do this to make sure the server doesn't
-                    # stay on, with dead process as zombies.
-                    self._gc()
                     continue
+                except socket.error:
+                    if self._stopped:
+                        break
+                    raise
+                persistent = False
                 try:
                     if address[0] != '127.0.0.1':
                         msg = "Server received connection from a non-local " \
                             "party (port %s). Ignoring..."
                         logger.warning(msg, address[0])
                         continue
-                    command, arguments = receive(client)
+                    try:
+                        command, arguments = receive(client)
+                    except socket.error:
+                        # Clients check that we are alive by connecting
+                        # without sending anything.
+                        continue
                     logger.debug("Server received: %s %s", command, arguments)
-                    if command == "send":
-                        port, command, arguments = arguments.split(MESSAGE_SEP)
-                        self._send_from(int(port), command, arguments)
-                    elif command == "register":
-                        port, type, other_type = arguments.split(MESSAGE_SEP)
-                        self._register(int(port), type, other_type)
-                    elif command == "unregister":
-                        self._unregister(int(arguments))
-                    elif command == "ping":
-                        self._send_to(int(arguments), "__status__", "1")
-                    elif command == "spawn":
-                        self._spawn(arguments)
+                    if command == CONNECT_COMMAND:
+                        # The Client is identified by the port it connected
+                        # from.
+                        persistent = self._accept_connection(client,
+                                                             address[1])
                     else:
-                        logger.error("Server received unknown command: %s %s",
-                                     command, arguments)
+                        with self._lock:
+                            self._handle_command(command, arguments)
                 finally:
-                    client.close()
+                    if not persistent:
+                        client.close()
         finally:
+            self._stopped = True
             self._sock.close()
+            self._close_unix_socket()
+            self._remove_lock_file()
+
+    def _accept_connection(self, client, port):
+        """ Upgrade a connection from a Client to a persistent one, which is
+            identified by 'port'. Returns whether this was successful.
+        """
+        connection = Connection(client)
+        try:
+            send(client, CONNECTED_COMMAND,
+                 MESSAGE_SEP.join((str(PROTOCOL_VERSION), str(port))))
+        except socket.error:
+            return False
+
+        logger.debug("Server accepted persistent connection from port %i",
+                     port)
+        with self._lock:
+            self._connections[port] = connection
+        thread = ConnectionThread(self, connection, port)
+        thread.setDaemon(True)
+        thread.start()
+        return True
+
+    def _connection_closed(self, port):
+        """ Called when a persistent connection to a Client is closed.
+        """
+        with self._lock:
+            connection = self._connections.pop(port, None)
+            if connection is not None:
+                connection.close()
+            self._unregister(port)
+
+    def _handle_command(self, command, arguments):
+        """ Handle a command sent to the Server.
+        """
+        if command == "send":
+            port, command, arguments = split_arguments(arguments, 3)
+            self._send_from(int(port), command, arguments)
+        elif command == "broadcast":
+            port, command, arguments = split_arguments(arguments, 3)
+            self._broadcast_from(int(port), command, arguments)
+        elif command == "batch":
+            port, fields = split_arguments(arguments, 2)
+            fields = decode_fields(fields)
+            for i in xrange(0, len(fields) - 1, 2):
+                self._send_from(int(port), fields[i], fields[i+1])
+        elif command == "register":
+            # Newer Clients also send their capabilities.
+            binary = not isinstance(arguments, basestring)
+            if binary:
+                fields = list(arguments)
+            else:
+                fields = arguments.split(MESSAGE_SEP, 3)
+            port, type, other_type = fields[:3]
+            capabilities = fields[3].split() if len(fields) > 3 else []
+            self._register(int(port), type, other_type, binary=binary,
+                           capabilities=capabilities)
+        elif command == "unregister":
+            self._unregister(int(arguments))
+        elif command == "ping":
+            self._send_to(int(arguments), "__status__", "1")
+        elif command == "spawn":
+            self._spawn(arguments)
+        else:
+            logger.error("Server received unknown command: %s %s",
+                         command, arguments)
+
+    def _handle_request(self, port, request_id, command, arguments):
+        """ Handle a command received over a persistent connection.
+        """
+        logger.debug("Server received from port %i: %s %s", port, command,
+                     arguments)
+        with self._lock:
+            self._handle_command(command, arguments)
+
+            # Acknowledge the request so that the Client can tell that it
+            # arrived.
+            connection = self._connections.get(port)
+            if request_id and connection is not None:
+                try:
+                    connection.send(ACK_COMMAND, '', request_id)
+                except socket.error:
+                    pass
+
+    def _stop(self):
+        """ Stop the Server.
+        """
+        if threading.current_thread() is self._main_thread:
+            sys.exit(0)
+
+        # We have been called from a connection thread, so wake the mainloop
+        # up by shutting down the listening socket.
+        self._stopped = True
+        for sock in (self._sock, self._unix_sock):
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except socket.error:
+                    pass
 
     @staticmethod
     def ping(server_port, timeout=1, error_only=False):
@@ -205,37 +572,69 @@ class Server(HasTraits):
         """ Attempt to match a registered client on 'port' to another registered
             client of the same type.
         """
-        # Try to find a compatible orphan
+        # Try to find a compatible orphan. Orphans are not pinged first (the
+        # heartbeat takes care of dead ones), but one that cannot be told that
+        # it has been paired is unregistered and the next one is tried.
         info = self._port_map[port]
-        for orphan in self._orphans:
-            if info.other_type == orphan.type:
+        self._remove_orphan(info)
+        orphans = self._orphans.get(info.other_type)
+        while orphans:
+            orphan = orphans.pop()
+            if not self._send_to(orphan.port, "__orphaned__", "0"):
+                continue
 
-                # Ping the orphan to see if its alive:
-                if not self._send_to(orphan.port, '__keepalive__', ''):
-                    continue
+            # Save information about the matching
+            self._pairs[info] = orphan
+            self._pairs[orphan] = info
 
-                # Save information about the matching
-                self._orphans.remove(orphan)
-                self._pairs[info] = orphan
-                self._pairs[orphan] = info
+            # Dispatch orphaned status to client
+            self._send_to(port, "__orphaned__", "0")
 
-                # Dispatch orphaned status to clients
-                self._send_to(port, "__orphaned__", "0")
-                self._send_to(orphan.port, "__orphaned__", "0")
+            # Tell each client what its partner is capable of (only Clients
+            # that declared capabilities understand this).
+            for this, other in ((info, orphan), (orphan, info)):
+                if this.capabilities:
+                    self._send_to(this.port, "__peer__",
+                                  " ".join(other.capabilities))
 
-                # Check command queue and dispatch, if necessary
-                for command, arguments in self._queue.pop(info.type, []):
-                    self._send_to(port, command, arguments)
+            # Check command queue and dispatch, if necessary
+            for command, arguments in self._queue.pop(info.type, []):
+                self._send_to(port, command, arguments)
 
-                return orphan
+            return orphan
 
         # Otherwise, the object becomes an orphan
-        self._orphans.append(info)
+        self._add_orphan(info)
         return None
 
-    def _register(self, port, object_type, other_type):
+    def _add_orphan(self, info):
+        """ Add an object to the orphans waiting to be paired.
+        """
+        orphans = self._orphans.get(info.type)
+        if orphans is None:
+            orphans = self._orphans[info.type] = OrphanQueue()
+        orphans.add(info)
+
+    def _remove_orphan(self, info):
+        """ Remove an object from the orphans (if it is one).
+        """
+        orphans = self._orphans.get(info.type)
+        if orphans is not None:
+            orphans.remove(info.port)
+
+    def _get_orphans(self):
+        """ Returns a list of all orphans.
+        """
+        return [orphan for orphans in self._orphans.values()
+                for orphan in orphans.values()]
+
+    def _register(self, port, object_type, other_type, binary=False,
+                  capabilities=()):
         """ Register a port of 'object_type' that wants to be paired with
             another object of 'other_type'. These types are simply strings.
+            If 'binary' is set, commands are sent to the port using the
+            binary framing. 'capabilities' are passed on to the object's
+            partner when they are paired.
 
             Calling 'register' on an already registered port has no effect.
         """
@@ -243,8 +642,10 @@ class Server(HasTraits):
         if port in self._port_map:
             return
 
-        info = PortInfo(port=port, type=object_type, other_type=other_type)
+        info = PortInfo(port=port, type=object_type, other_type=other_type,
+                        binary=binary, capabilities=list(capabilities))
         self._port_map[port] = info
+        self._types.setdefault(object_type, {})[port] = info
         self._match(port)
 
     def _unregister(self, port):
@@ -255,29 +656,61 @@ class Server(HasTraits):
             info = self._port_map.pop(port)
         except KeyError:
             return
+        self._types[info.type].pop(port, None)
 
         if info in self._pairs:
             other = self._pairs.pop(info)
             if other in self._pairs:
                 self._pairs.pop(other)
-            self._orphans.append(other)
-            self._send_to(other.port, "__orphaned__", "1")
+
+            # Pair the other object with the next waiting orphan, if there is
+            # one.
+            if self._match(other.port) is None:
+                self._send_to(other.port, "__orphaned__", "1")
         else:
-            self._orphans.remove(info)
+            self._remove_orphan(info)
 
         # If we have nobody registered, terminate the server.
         if len(self._port_map) == 0:
             logger.info("No registered Clients left. Server shutting down...")
-            sys.exit(0)
+            self._stop()
 
     def _gc(self):
         """ Garbage collection of the processes. Check that all the orphaned
             processes are still responsive, and if not, unregister them.
         """
-        for object_info in self._orphans:
+        for object_info in self._get_orphans():
             self._send_to(object_info.port, '__keepalive__', '')
             # _send_to will automatically unregister the port.
 
+    def _heartbeat(self):
+        """ Like '_gc', but only holds the lock while finding the orphans and
+            unregistering the unresponsive ones, so that a Client that is
+            slow to respond does not hold up everything else.
+        """
+        with self._lock:
+            orphans = [info for info in self._get_orphans()
+                       if info.port not in self._connections]
+
+        # Orphans with persistent connections are left alone: their
+        # connection threads notice when they go away.
+        dead = []
+        for info in orphans:
+            if info.port > 0xffff or \
+                    not send_port(info.port, '__keepalive__', '',
+                                  timeout=KEEPALIVE_TIMEOUT,
+                                  binary=info.binary):
+                dead.append(info)
+
+        with self._lock:
+            for info in dead:
+                # The port may have been reused since we checked it.
+                if self._port_map.get(info.port) is info:
+                    msg = "Server failed to communicate with client on " \
+                        "port %i. Unregistering..."
+                    logger.warning(msg % info.port)
+                    self._unregister(info.port)
+
     def _send_from(self, port, command, arguments):
         """ Send a command from an object on the specified port.
         """
@@ -293,11 +726,14 @@ class Server(HasTraits):
         if object_info in self._pairs:
             other = self._pairs[object_info]
             while not self._send_to(other.port, command, arguments):
-                # The object will automatically be orphaned by _send_to in the
-                # event of a communication failure. Try to find another match.
-                if object_info in self._orphans:
-                    self._orphans.remove(object_info)
-                other = self._match(port)
+                # The object will automatically be orphaned (or paired with
+                # another orphan) by _send_to in the event of a communication
+                # failure. Try to find another match.
+                if port not in self._port_map:
+                    return
+                other = self._pairs.get(object_info)
+                if other is None:
+                    other = self._match(port)
                 if other is None:
                     try_spawn = True
                     break
@@ -316,11 +752,56 @@ class Server(HasTraits):
                     self._queue[object_info.other_type] = [(command, arguments)]
                     self._match(port)
 
+    def _is_binary(self, port):
+        """ Returns whether commands to the specified port should use the
+            binary framing.
+        """
+        info = self._port_map.get(port)
+        return info is not None and info.binary
+
+    def _broadcast_from(self, port, command, arguments):
+        """ Send a command from an object on the specified port to every
+            registered object of the type it wants to be paired with (whether
+            or not they are paired). If there are none, the command is sent
+            as if by '_send_from'.
+        """
+        try:
+            object_info = self._port_map[port]
+        except KeyError:
+            msg = "Server received a 'broadcast' command from an unregistered " \
+                "object (port %s)."
+            logger.warning(msg % port)
+            return
+
+        sent = 0
+        others = self._types.get(object_info.other_type, {})
+        for other in others.values():
+            # _send_to will automatically unregister dead objects.
+            if self._send_to(other.port, command, arguments):
+                sent += 1
+
+        if not sent:
+            self._send_from(port, command, arguments)
+
     def _send_to(self, port, command, arguments):
         """ Send a command to an object on the specified port. Returns whether
             the command was sent sucessfully.
         """
-        status = send_port(port, command, arguments)
+        connection = self._connections.get(port)
+        if connection is not None:
+            try:
+                connection.send(command, arguments)
+                status = True
+            except socket.error:
+                self._connections.pop(port)
+                connection.close()
+                status = False
+        elif port > 0xffff:
+            # A Client on the Unix domain socket, whose connection has gone.
+            status = False
+        else:
+            status = send_port(port, command, arguments,
+                               binary=self._is_binary(port))
         if not status:
             msg = "Server failed to communicate with client on port %i. " \
                 "Unregistering..."
@@ -330,6 +811,7 @@ class Server(HasTraits):
 
 
 def main(pref_path, pref_node, *arg, **kw):
-    server = Server()
+    from event_loop_server import EventLoopServer
+    server = EventLoopServer()
     server.init(pref_path, pref_node)
     server.main(*arg, **kw)
@@ -0,0 +1,81 @@
+# Standard library imports
+import unittest
+from threading import Thread
+from time import sleep
+
+# Local imports
+from envisage.plugins.remote_editor.communication.batcher import \
+    CommandBatcher
+
+
+class BatcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.batches = []
+
+    def _send(self, commands):
+        self.batches.append(commands)
+        return None
+
+    def _coalesce_key(self, command, arguments):
+        if command == 'goto':
+            return command, arguments.split(':')[0]
+        return None
+
+    def testImmediate(self):
+        """ Is every command sent at once when there is no window?
+        """
+        batcher = CommandBatcher(self._send)
+        batcher.add('foo', '1')
+        batcher.add('foo', '2')
+        self.assertEqual(self.batches, [[('foo', '1')], [('foo', '2')]])
+
+    def testWindow(self):
+        """ Are commands issued within the window sent as one batch, with
+            idempotent commands coalesced?
+        """
+        batcher = CommandBatcher(self._send, window=.1,
+                                 coalesce_key=self._coalesce_key)
+        batcher.add('goto', 'a.py:1')
+        batcher.add('goto', 'a.py:2')
+        batcher.add('goto', 'b.py:3')
+        batcher.add('foo', '')
+        batcher.add('goto', 'b.py:4')
+        self.assertEqual(self.batches, [])
+
+        sleep(.3)
+        self.assertEqual(self.batches, [[('goto', 'a.py:2'),
+                                         ('goto', 'b.py:3'),
+                                         ('foo', ''),
+                                         ('goto', 'b.py:4')]])
+
+        stats = batcher.get_latency_stats()
+        self.assertEqual(stats['goto']['count'], 3)
+        self.assertEqual(stats['foo']['count'], 1)
+        self.assert_(stats['goto']['max'] >= .1)
+
+    def testBackPressure(self):
+        """ Does sending block while too many batches are unacknowledged?
+        """
+        request_ids = iter(range(1, 100))
+        def send(commands):
+            self.batches.append(commands)
+            return request_ids.next()
+
+        batcher = CommandBatcher(send, max_in_flight=2)
+        batcher.add('foo', '1')
+        batcher.add('foo', '2')
+
+        thread = Thread(target=batcher.add, args=('foo', '3'))
+        thread.start()
+        sleep(.1)
+        self.assertEqual(len(self.batches), 2)
+
+        batcher.acknowledged(1)
+        thread.join(1)
+        self.assertEqual(len(self.batches), 3)
+        self.assertEqual(batcher.get_latency_stats()['foo']['count'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,17 +1,32 @@
 # Standard library imports
 import os
+import shutil
+import socket
+import tempfile
+import time
 import unittest
 from time import sleep
-from threading import Thread
+from threading import current_thread, Thread
 
 # ETS imports
-from traits.api import Int, Str
+from traits.api import Any, Int, Str
 
 # Local imports
-from envisage.plugins.remote_editor.communication.client import Client
-from envisage.plugins.remote_editor.communication.server import Server
+from envisage.plugins.remote_editor.communication.batcher import \
+    CommandBatcher
+from envisage.plugins.remote_editor.communication.client import Client, \
+    ClientThread
+from envisage.plugins.remote_editor.communication.event_loop_server import \
+    EventLoopServer, make_wakeup_pair, Peer
+from envisage.plugins.remote_editor.communication.payload_codecs import \
+    encode_payload, CODECS
+from envisage.plugins.remote_editor.communication import server as \
+    server_module
+from envisage.plugins.remote_editor.communication.server import \
+    OrphanQueue, PortInfo, Server
 from envisage.plugins.remote_editor.communication.util import \
-    get_server_port, LOCK_PATH
+    encode_message, get_server_port, send_port, HAS_UNIX_SOCKETS, LOCK_PATH, \
+    MESSAGE_SEP
 
 
 class TestClient(Client):
@@ -30,87 +45,652 @@ class TestClient(Client):
             self.error_count += 1
 
 
+class PayloadTestClient(TestClient):
+
+    arguments = Any
+
+
 class TestThread(Thread):
 
+    def __init__(self, server_class=Server, **traits):
+        Thread.__init__(self)
+        self.server_class = server_class
+        self.traits = traits
+
     def run(self):
-        self.server = Server()
+        self.server = self.server_class(**self.traits)
         self.server.init()
         self.server.main()
 
 
+def wait_for(condition, timeout=5):
+    """ Wait until 'condition()' is true, or until 'timeout' seconds have
+        passed. Returns the last value of the condition.
+    """
+    deadline = time.time() + timeout
+    while True:
+        value = condition()
+        if value or time.time() > deadline:
+            return value
+        sleep(.01)
+
+
 class CommunicationTestCase(unittest.TestCase):
 
+    # The type of Server to test, and the traits to create it with.
+    server_class = Server
+    server_traits = {}
+
     def setUp(self):
         """ Make sure no old lock files exist prior to run.
         """
-        if os.path.exists(LOCK_PATH):
-            os.remove(LOCK_PATH)
+        self._remove_lock_file()
 
     def tearDown(self):
         """ Make sure no old lock files are left around.
         """
-        if os.path.exists(LOCK_PATH):
-            os.remove(LOCK_PATH)
+        self._remove_lock_file()
 
     def testCommunication(self):
         """ Can the Server communicate with Clients and handle errors
             appropriately?
         """
+        self._testCommunication(persistent=True)
+
+    def testOneShotCommunication(self):
+        """ Does communication still work when Clients do not use persistent
+            connections?
+        """
+        self._testCommunication(persistent=False)
+
+    def testBinaryCommunication(self):
+        """ Does communication work when Clients use the binary framing?
+        """
+        self._testCommunication(persistent=False, binary=True)
+
+    def testPersistentConnections(self):
+        """ Do Clients share a single connection to the Server for commands in
+            both directions?
+        """
+        serverThread = self._start_server()
+
+        client1 = TestClient(self_type='client1', other_type='client2')
+        client1.register()
+        client2 = TestClient(self_type='client2', other_type='client1')
+        client2.register()
+        self._wait_until_paired(client1, client2)
+
+        server = serverThread.server
+        self.assertEqual(set(server._connections.keys()),
+                         set([client1._port, client2._port]))
+
+        # A burst of commands all arrive, in order, over the connection.
+        received = []
+        client2.on_trait_change(lambda new: received.append(new), 'arguments')
+        for i in range(50):
+            client1.send_command("foo", str(i))
+        wait_for(lambda: len(received) >= 50)
+        self.assertEqual(received, [str(i) for i in range(50)])
+
+        client1.unregister()
+        client2.unregister()
+
+    def testBroadcast(self):
+        """ Can a Client send a command to every Client of the other type,
+            and are orphans paired in the order they registered?
+        """
+        serverThread = self._start_server()
+        server = serverThread.server
+
+        editors = []
+        for i in range(3):
+            editor = TestClient(self_type='editor', other_type='shell')
+            editor.register()
+            editors.append(editor)
+            wait_for(lambda: editor.registered and
+                     editor._port in server._port_map)
+        shell = TestClient(self_type='shell', other_type='editor')
+        shell.register()
+        self._wait_until_paired(shell, editors[0])
+
+        # The shell is paired with the first editor.
+        self.assert_(not shell.orphaned)
+        self.assertEqual([editor.orphaned for editor in editors],
+                         [False, True, True])
+
+        shell.send_command("foo", "one")
+        shell.broadcast_command("foo", "all")
+        wait_for(lambda: [editor.arguments for editor in editors] ==
+                 ["all", "all", "all"])
+        self.assertEqual([editor.arguments for editor in editors],
+                         ["all", "all", "all"])
+        self.assertEqual([editor.command for editor in editors],
+                         ["foo", "foo", "foo"])
+
+        # When the first editor goes away, the shell is paired with the next.
+        editors[0].unregister()
+        self._wait_until_paired(shell, editors[1])
+        shell.send_command("foo", "two")
+        wait_for(lambda: editors[1].arguments == "two")
+        self.assertEqual(editors[1].arguments, "two")
+        self.assertEqual(editors[2].arguments, "all")
+
+        shell.unregister()
+        for editor in editors[1:]:
+            editor.unregister()
+
+    def testPayloadCodecs(self):
+        """ Are structured arguments and large strings encoded (and
+            compressed) using codecs that both Clients support?
+        """
+        self._start_server()
+
+        client1 = PayloadTestClient(self_type='client1', other_type='client2')
+        client1.register()
+        client2 = PayloadTestClient(self_type='client2', other_type='client1',
+                                    codecs=['json'])
+        client2.register()
+        self._wait_until_paired(client1, client2)
+        wait_for(lambda: client1._peer_capabilities and
+                 client2._peer_capabilities)
+
+        self.assertEqual(set(client1._peer_capabilities),
+                         set(['json', 'zlib']))
+        self.assert_('binary' in client2._peer_capabilities)
+
+        # Structured arguments arrive as they were sent.
+        value = {'file': 'foo.py', 'lines': [1, 2, 3]}
+        client1.send_command("foo", value)
+        wait_for(lambda: client2.arguments == value)
+        self.assertEqual(client2.arguments, value)
+
+        # Large strings are compressed on the way.
+        text = 'x' * 100000
+        encoded = client1._encode_arguments(text, client1._peer_capabilities)
+        self.assert_(len(encoded) < 1000)
+        client1.send_command("foo", text)
+        wait_for(lambda: client2.arguments == text)
+        self.assertEqual(client2.arguments, text)
+
+        # Small strings are sent as they are.
+        client2.send_command("foo", "bar")
+        wait_for(lambda: client1.arguments == "bar")
+        self.assertEqual(client1.arguments, "bar")
+
+        # Unicode arrives as unicode, however short it is.
+        client1.send_command("foo", u'h\xe9llo')
+        wait_for(lambda: client2.arguments == u'h\xe9llo')
+        self.assertEqual(client2.arguments, u'h\xe9llo')
+        self.assert_(isinstance(client2.arguments, unicode))
+
+        client1.unregister()
+        client2.unregister()
+
+    def testUnicodeToLegacyClient(self):
+        """ Is unicode sent as UTF-8 to a Client that has no capabilities?
+        """
+        self._start_server()
+
+        client1 = PayloadTestClient(self_type='client1', other_type='client2')
+        client1.register()
+        client2 = TestClient(self_type='client2', other_type='client1',
+                             codecs=[], compression_threshold=0)
+        client2.register()
+        self._wait_until_paired(client1, client2)
+
+        self.assertEqual(client1._peer_capabilities, [])
+        self.assertEqual(client1._encode_arguments(u'print 1', []),
+                         'print 1')
+        client1.send_command("foo", u'print 1')
+        wait_for(lambda: client2.arguments == 'print 1')
+        self.assertEqual(client2.arguments, 'print 1')
+
+        client1.send_command("foo", u'h\xe9llo')
+        wait_for(lambda: client2.arguments == 'h\xc3\xa9llo')
+        self.assertEqual(client2.arguments, 'h\xc3\xa9llo')
+
+        client1.broadcast_command("foo", u'caf\xe9')
+        wait_for(lambda: client2.arguments == 'caf\xc3\xa9')
+        self.assertEqual(client2.arguments, 'caf\xc3\xa9')
+
+        client1.unregister()
+        client2.unregister()
+
+    def testBatching(self):
+        """ Are commands sent close together batched, and are idempotent
+            commands coalesced?
+        """
+        self._start_server()
+
+        client1 = TestClient(self_type='client1', other_type='client2',
+                             batch_window=.1, idempotent_commands=['goto'])
+        client1.register()
+        client2 = TestClient(self_type='client2', other_type='client1')
+        client2.register()
+        self._wait_until_paired(client1, client2)
+
+        received = []
+        client2.on_trait_change(lambda new: received.append(new), 'arguments')
+        for i in range(10):
+            client1.send_command("foo", str(i))
+        for i in range(10):
+            client1.send_command("goto", "file.py" + MESSAGE_SEP + str(i))
+        wait_for(lambda: len(received) >= 11)
+        self.assertEqual(received, [str(i) for i in range(10)] +
+                         ["file.py" + MESSAGE_SEP + "9"])
+
+        # Latencies are recorded when the Server's acknowledgements arrive,
+        # which may be after the commands themselves have been delivered.
+        wait_for(lambda: set(["foo", "goto"]) <=
+                 set(client1.get_latency_stats()))
+        stats = client1.get_latency_stats()
+        self.assertEqual(stats["foo"]["count"], 10)
+        self.assertEqual(stats["goto"]["count"], 1)
+
+        client1.unregister()
+        client2.unregister()
+
+    def _remove_lock_file(self):
+        # A Server that is shutting down may remove the lock file itself.
+        try:
+            os.remove(LOCK_PATH)
+        except OSError:
+            pass
+
+    def _start_server(self, **traits):
+        """ Start a Server in a thread and wait until it answers pings.
+        """
+        serverThread = TestThread(self.server_class,
+                                  **dict(self.server_traits, **traits))
+        serverThread.setDaemon(True)
+        serverThread.start()
+        self.assert_(wait_for(lambda: get_server_port() != -1 and
+                              Server.ping(get_server_port(), timeout=.2)))
+        return serverThread
+
+    def _wait_until_paired(self, client1, client2):
+        """ Wait until two Clients have registered and been paired.
+        """
+        self.assert_(wait_for(lambda: client1.registered and
+                              client2.registered and
+                              not (client1.orphaned or client2.orphaned)))
+
+    def _testCommunication(self, persistent, binary=False):
         # Test server set up
 
         # Does the ping operation work when the Server is not running?
         self.assert_(not Server.ping(get_server_port()))
 
         # Set up server thread
-        serverThread = TestThread()
-        serverThread.setDaemon(True)
-        serverThread.start()
-        sleep(.5)
+        serverThread = self._start_server()
         self.assert_(os.path.exists(LOCK_PATH))
 
         # Test normal operation
 
         self.assert_(Server.ping(get_server_port()))
 
-        client1 = TestClient(self_type='client1', other_type='client2')
+        client1 = TestClient(self_type='client1', other_type='client2',
+                             persistent=persistent, binary=binary)
         client1.register()
-        client2 = TestClient(self_type='client2', other_type='client1')
+        client2 = TestClient(self_type='client2', other_type='client1',
+                             persistent=persistent, binary=binary)
         client2.register()
-        sleep(.5)
-        self.assert_(not(client1.orphaned or client2.orphaned))
+        self._wait_until_paired(client1, client2)
 
-        client1.send_command("foo", "bar")
-        sleep(.1)
+        # Arguments may contain the message separator.
+        arguments = "bar" + MESSAGE_SEP + "baz"
+        client1.send_command("foo", arguments)
+        wait_for(lambda: client2.command == "foo")
         self.assertEqual(client2.command, "foo")
-        self.assertEqual(client2.arguments, "bar")
+        self.assertEqual(client2.arguments, arguments)
 
         client1.unregister()
-        sleep(.1)
+        wait_for(lambda: client1.orphaned and client2.orphaned)
         self.assert_(client1.orphaned and client2.orphaned)
 
         client1.register()
-        sleep(.1)
-        self.assert_(not(client1.orphaned or client2.orphaned))
+        self._wait_until_paired(client1, client2)
 
         # Simulated breakage -- does the Server handle unexpected communication
         # failure?
 
-        # Have client1 'die'. We send the dummy command to force its connection
-        # loop to terminate after the call to 'stop'. (In Python we can't just
-        # kill the thread, which is really what we want to do in this case.)
-        client1._communication_thread.stop()
-        sleep(.1)
-        serverThread.server._send_to(client1._port, "dummy", "")
-        sleep(.1)
+        # Have client1 'die'. Without a persistent connection we send the dummy
+        # command to force its connection loop to terminate after the call to
+        # 'stop'. (In Python we can't just kill the thread, which is really
+        # what we want to do in this case.)
+        thread = client1._communication_thread
+        thread.stop()
+        if not persistent:
+            serverThread.server._send_to(client1._port, "dummy", "")
+        wait_for(lambda: not thread.is_alive())
 
         # The Server should inform client1 that it could not complete its
         # request
         client2.send_command("foo", "bar")
-        sleep(.1)
+        wait_for(lambda: client2.orphaned and client2.error_count > 0)
         self.assert_(client2.orphaned)
         self.assertEqual(client2.error_count, 1)
 
 
+class EventLoopCommunicationTestCase(CommunicationTestCase):
+
+    server_class = EventLoopServer
+
+    def testDeadClient(self):
+        """ Is a Client that has gone away without unregistering dropped, and
+            is the sender told?
+        """
+        serverThread = self._start_server()
+        server = serverThread.server
+
+        # Register a client1 that then dies without unregistering.
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('localhost', 0))
+        dead_port = sock.getsockname()[1]
+        send_port(get_server_port(), 'register',
+                  MESSAGE_SEP.join((str(dead_port), 'client1', 'client2')))
+        sock.close()
+        wait_for(lambda: dead_port in server._port_map)
+
+        # client2 is paired with client1 and the Server discovers that it is
+        # dead when telling it so.
+        client2 = TestClient(self_type='client2', other_type='client1')
+        client2.register()
+        wait_for(lambda: client2.registered and client2.orphaned and
+                 dead_port not in server._port_map)
+        self.assert_(dead_port not in server._port_map)
+        self.assert_(client2.orphaned)
+
+        client2.send_command("foo", "bar")
+        wait_for(lambda: client2.error_count > 0)
+        self.assertEqual(client2.error_count, 1)
+
+        # The Server is still responsive.
+        self.assert_(Server.ping(get_server_port()))
+
+        client2.unregister()
+
+
+    def testSlowUpload(self):
+        """ Is a one-shot message that takes longer than the peer timeout to
+            arrive still received, as long as it keeps arriving?
+        """
+        serverThread = self._start_server(peer_timeout=0.5)
+        server = serverThread.server
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('localhost', 0))
+        port = sock.getsockname()[1]
+
+        message = encode_message('register', MESSAGE_SEP.join(
+            (str(port), 'client1', 'client2')))
+        self.assert_(len(message) / 4 * .1 > server.peer_timeout)
+
+        upload = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        upload.connect(('localhost', get_server_port()))
+        for i in range(0, len(message), 4):
+            upload.sendall(message[i:i + 4])
+            sleep(.1)
+        upload.close()
+        wait_for(lambda: port in server._port_map)
+
+        self.assert_(port in server._port_map)
+        sock.close()
+
+    def testWriteBuffer(self):
+        """ Is buffered data sent in order, however it is split up?
+        """
+        sock, other = make_wakeup_pair()
+        peer = Peer(sock, 'persistent')
+        chunks = ['a' * 10, 'b' * 100000, 'c', 'd' * 5]
+        for chunk in chunks:
+            peer.write(chunk)
+        self.assertEqual(peer.wbuf_size, sum(map(len, chunks)))
+
+        received = []
+        while peer.wbuf:
+            data = peer.next_chunk()
+            sent = min(len(data), 30000)
+            received.append(str(data[:sent]))
+            peer.consume(sent)
+        self.assertEqual(''.join(received), ''.join(chunks))
+        self.assertEqual(peer.wbuf_size, 0)
+        sock.close()
+        other.close()
+
+
+@unittest.skipUnless(HAS_UNIX_SOCKETS, "Unix domain sockets not supported")
+class UnixCommunicationTestCase(CommunicationTestCase):
+
+    server_traits = dict(transport='unix')
+
+    def testUnixTransport(self):
+        """ Do persistent connections use the Unix domain socket?
+        """
+        serverThread = self._start_server()
+
+        client1 = TestClient(self_type='client1', other_type='client2')
+        client1.register()
+        client2 = TestClient(self_type='client2', other_type='client1',
+                             transport='tcp')
+        client2.register()
+        self._wait_until_paired(client1, client2)
+
+        # Clients on the Unix domain socket are given ids outside the port
+        # range.
+        self.assert_(client1._port > 0xffff)
+        self.assert_(client2._port <= 0xffff)
+        self.assertEqual(set(serverThread.server._connections.keys()),
+                         set([client1._port, client2._port]))
+
+        client1.send_command("foo", "bar")
+        wait_for(lambda: client2.arguments == "bar")
+        self.assertEqual(client2.arguments, "bar")
+
+        client1.unregister()
+        client2.unregister()
+
+
+@unittest.skipUnless(HAS_UNIX_SOCKETS, "Unix domain sockets not supported")
+class UnixEventLoopCommunicationTestCase(UnixCommunicationTestCase):
+
+    server_class = EventLoopServer
+
+
+class SendRecordingClient(TestClient):
+
+    sent = Any
+
+    def _send(self, command, args):
+        self.sent.append(command)
+        return None
+
+
+class BatchingTestCase(unittest.TestCase):
+
+    def testBatchesNeedPersistentConnections(self):
+        """ Are batches only sent over a persistent connection?
+        """
+        client = SendRecordingClient(sent=[])
+        client._send_batch([("foo", "1"), ("foo", "2")])
+        self.assertEqual(client.sent, ["send", "send"])
+
+        # Commands queued before registration are sent the same way.
+        client.sent = []
+        client._queue = [("send", "foo", "1"), ("send", "foo", "2")]
+        client._send_queue()
+        self.assertEqual(client.sent, ["send", "send"])
+
+    def testQueuedBroadcastsAreBroadcast(self):
+        """ Are broadcasts issued before registration still broadcast?
+        """
+        client = SendRecordingClient(sent=[])
+        client._communication_thread = ClientThread(client)
+        client.send_command("foo", "1")
+        client.broadcast_command("bar", "2")
+        client.send_command("foo", "3")
+        client._send_queue()
+        self.assertEqual(client.sent, ["send", "broadcast", "send"])
+
+    def testAckThreadDoesNotWait(self):
+        """ Does sending from the thread that receives acknowledgements
+            avoid waiting for them?
+        """
+        requests = []
+        def send(commands):
+            requests.append(commands)
+            return len(requests)
+
+        batcher = CommandBatcher(send, max_in_flight=1, ack_timeout=5,
+                                 ack_thread=current_thread())
+        start = time.time()
+        batcher.add("foo", "1")
+        batcher.add("foo", "2")
+        batcher.stop()
+        self.assert_(time.time() - start < 1)
+        self.assertEqual(requests, [[("foo", "1")], [("foo", "2")]])
+
+    def testEarlyAcknowledgement(self):
+        """ Is a batch that is acknowledged before 'send' returns its request
+            id still recorded?
+        """
+        def send(commands):
+            # The reader thread sees the acknowledgement first.
+            thread = Thread(target=batcher.acknowledged, args=(1,))
+            thread.start()
+            thread.join()
+            return 1
+
+        batcher = CommandBatcher(send, max_in_flight=1, ack_timeout=5)
+        batcher.add("foo", "1")
+        self.assertEqual(batcher.get_latency_stats()["foo"]["count"], 1)
+        self.assertEqual(batcher._in_flight, {})
+
+        # The next batch does not wait for the first to be acknowledged.
+        start = time.time()
+        batcher.add("foo", "2")
+        self.assert_(time.time() - start < 1)
+
+
+class MalformedPayloadTestCase(unittest.TestCase):
+
+    def testMalformedPayloadIsDropped(self):
+        """ Is a command with a truncated or malformed payload dropped,
+            without stopping the thread that received it?
+        """
+        client = PayloadTestClient()
+        thread = ClientThread(client)
+        payload = encode_payload([1, 'two'], CODECS['binary'])
+        for arguments in (payload[:-3], payload[:5], payload[:4] + 'l\xff'):
+            thread._handle_command("foo", arguments)
+        self.assertEqual(client.command, "")
+
+        thread._handle_command("foo", payload)
+        self.assertEqual(client.command, "foo")
+        self.assertEqual(client.arguments, [1, 'two'])
+
+
+class OrphanQueueTestCase(unittest.TestCase):
+
+    def testOrder(self):
+        """ Are orphans taken in the order in which they became orphans, even
+            after some have been removed (and added again)?
+        """
+        infos = [PortInfo(port=port, type='editor', other_type='shell')
+                 for port in range(100)]
+        orphans = OrphanQueue()
+        for info in infos:
+            orphans.add(info)
+        for info in infos[:90]:
+            orphans.remove(info.port)
+        orphans.add(infos[0])
+        orphans.add(infos[95])
+
+        self.assertEqual(len(orphans), 11)
+        self.assertEqual(orphans.values(), infos[90:] + infos[:1])
+        self.assert_(len(orphans._order) < 50)
+
+        taken = []
+        while orphans:
+            taken.append(orphans.pop())
+        self.assertEqual(taken, infos[90:] + infos[:1])
+        self.assertEqual(orphans.pop(), None)
+
+
+class HeartbeatTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._send_port = server_module.send_port
+
+    def tearDown(self):
+        server_module.send_port = self._send_port
+
+    def testHeartbeat(self):
+        """ Are unresponsive orphans unregistered, without the Server's lock
+            being held while they are contacted?
+        """
+        server = Server()
+
+        live_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        live_sock.bind(('localhost', 0))
+        live_sock.listen(1)
+        live_port = live_sock.getsockname()[1]
+        dead_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        dead_sock.bind(('localhost', 0))
+        dead_port = dead_sock.getsockname()[1]
+        dead_sock.close()
+
+        server._register(live_port, 'client1', 'client2')
+        server._register(dead_port, 'client1', 'client2')
+
+        # Record whether another thread could take the lock during each send.
+        locked = []
+        def send_port(*args, **kw):
+            def try_lock():
+                if server._lock.acquire(False):
+                    server._lock.release()
+                    locked.append(False)
+                else:
+                    locked.append(True)
+            thread = Thread(target=try_lock)
+            thread.start()
+            thread.join()
+            return self._send_port(*args, **kw)
+        server_module.send_port = send_port
+
+        try:
+            server._heartbeat()
+        finally:
+            live_sock.close()
+
+        self.assertEqual(server._port_map.keys(), [live_port])
+        self.assertEqual(locked, [False, False])
+
+
+class ServerPreferencesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.pref_path = os.path.join(self.tmpdir, 'preferences.ini')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def testTransportPreference(self):
+        """ Is the transport read from the preferences?
+        """
+        with open(self.pref_path, 'w') as f:
+            f.write("[remote_editor]\n"
+                    "editor = python -c 'pass'\n"
+                    "[remote_editor.communication]\n"
+                    "transport = unix\n")
+
+        server = Server()
+        server._read_preferences(self.pref_path, 'remote_editor')
+        self.assertEqual(server.transport, 'unix')
+        self.assertEqual(server.spawn_commands.keys(), ['editor'])
+
+
 if __name__ == '__main__':
     """ Run the unittest, but redirect the log to stderr for convenience.
     """
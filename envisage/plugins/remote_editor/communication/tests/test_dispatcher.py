@@ -0,0 +1,95 @@
+# Standard library imports
+import unittest
+from threading import Thread
+
+# Local imports
+from envisage.plugins.remote_editor.communication.dispatcher import \
+    UIDispatcher
+
+
+class DispatcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.callbacks = []
+        self.handled = []
+
+    def _handle_command(self, command, arguments):
+        if command == 'fail':
+            raise ValueError(arguments)
+        self.handled.append((command, arguments))
+
+    def _coalesce_key(self, command, arguments):
+        if command == 'goto':
+            return command, arguments.split(':')[0]
+        return None
+
+    def _invoke_later(self, callback):
+        self.callbacks.append(callback)
+
+    def _run_callbacks(self):
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+        return len(callbacks)
+
+    def testBurst(self):
+        """ Is a burst of commands handled in a single callback, with runs of
+            idempotent commands collapsed?
+        """
+        dispatcher = UIDispatcher(self._handle_command,
+                                  coalesce_key=self._coalesce_key,
+                                  invoke_later=self._invoke_later)
+        dispatcher.dispatch('goto', 'a.py:1')
+        dispatcher.dispatch('goto', 'a.py:2')
+        dispatcher.dispatch('goto', 'b.py:3')
+        dispatcher.dispatch('foo', '')
+        dispatcher.dispatch('goto', 'b.py:4')
+        self.assertEqual(self._run_callbacks(), 1)
+        self.assertEqual(self.handled, [('goto', 'a.py:2'),
+                                        ('goto', 'b.py:3'),
+                                        ('foo', ''),
+                                        ('goto', 'b.py:4')])
+
+        # Once the queue is drained, the next command schedules a new
+        # callback.
+        dispatcher.dispatch('foo', 'bar')
+        self.assertEqual(self._run_callbacks(), 1)
+        self.assertEqual(self.handled[-1], ('foo', 'bar'))
+
+    def testFailure(self):
+        """ Does a failing command leave the rest of the queue to be handled?
+        """
+        dispatcher = UIDispatcher(self._handle_command,
+                                  invoke_later=self._invoke_later)
+        dispatcher.dispatch('fail', 'oops')
+        dispatcher.dispatch('foo', 'bar')
+        self._run_callbacks()
+        self.assertEqual(self.handled, [('foo', 'bar')])
+
+    def testThreads(self):
+        """ Is every command dispatched from several threads handled once?
+        """
+        dispatcher = UIDispatcher(self._handle_command,
+                                  invoke_later=self._invoke_later)
+
+        def dispatch(name):
+            for i in range(1000):
+                dispatcher.dispatch(name, str(i))
+
+        threads = [Thread(target=dispatch, args=(name,))
+                   for name in ('a', 'b', 'c')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self._run_callbacks()
+
+        self.assertEqual(len(self.handled), 3000)
+        for name in ('a', 'b', 'c'):
+            self.assertEqual([arguments for command, arguments in self.handled
+                              if command == name],
+                             [str(i) for i in range(1000)])
+
+
+if __name__ == '__main__':
+    unittest.main()
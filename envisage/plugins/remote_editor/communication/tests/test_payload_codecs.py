@@ -0,0 +1,73 @@
+# Standard library imports
+import unittest
+
+# Local imports
+from envisage.plugins.remote_editor.communication.payload_codecs import \
+    choose_codec, decode_payload, encode_payload, is_payload, CODECS
+
+
+class PayloadCodecsTestCase(unittest.TestCase):
+
+    values = [None, True, False, 0, -1, 2**40, 1.5, '', 'foo\x00bar',
+              u'caf\xe9', [1, [2, 'three']], {'a': [1, 2], 'b': None}]
+
+    def testRoundTrip(self):
+        """ Do structured values survive a round trip through each codec?
+        """
+        for name in ('binary', 'json'):
+            codec = CODECS[name]
+            for value in self.values:
+                payload = encode_payload(value, codec)
+                self.assert_(is_payload(payload))
+                self.assertEqual(decode_payload(payload), value)
+
+    def testRawCodec(self):
+        """ Are strings passed through the raw codec unchanged?
+        """
+        payload = encode_payload('foo', CODECS['raw'])
+        self.assertEqual(decode_payload(payload), 'foo')
+        self.assertRaises(TypeError, encode_payload, [1], CODECS['raw'])
+
+    def testCompression(self):
+        """ Are payloads compressed only once they reach the threshold?
+        """
+        text = 'x' * 10000
+        small = encode_payload(text, CODECS['raw'], 'zlib', threshold=20000)
+        large = encode_payload(text, CODECS['raw'], 'zlib', threshold=1000)
+        self.assert_(len(small) > len(text))
+        self.assert_(len(large) < 1000)
+        self.assertEqual(decode_payload(small), text)
+        self.assertEqual(decode_payload(large), text)
+
+    def testUnknownCodec(self):
+        """ Are payloads from newer peers rejected cleanly?
+        """
+        payload = encode_payload('foo', CODECS['raw'])
+        self.assertRaises(ValueError, decode_payload,
+                          payload[:2] + '?' + payload[3:])
+        self.assertRaises(ValueError, decode_payload,
+                          payload[:3] + '?' + payload[4:])
+
+    def testMalformedPayloads(self):
+        """ Are truncated and malformed payloads rejected cleanly?
+        """
+        payload = encode_payload([1, 'two', {'three': 3.0}], CODECS['binary'])
+        for end in range(len(payload)):
+            self.assertRaises(ValueError, decode_payload, payload[:end])
+
+        nested = encode_payload([], CODECS['binary'])
+        nested = nested[:4] + 'l\x00\x00\x00\x01' * 10000 + nested[4:]
+        self.assertRaises(ValueError, decode_payload, nested)
+
+    def testChooseCodec(self):
+        """ Is the first mutually supported codec chosen?
+        """
+        self.assertEqual(choose_codec(['binary', 'json'], ['json', 'binary']),
+                         CODECS['binary'])
+        self.assertEqual(choose_codec(['binary', 'json'], ['json', 'zlib']),
+                         CODECS['json'])
+        self.assertEqual(choose_codec(['binary'], ['json']), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
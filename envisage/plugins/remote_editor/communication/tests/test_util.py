@@ -0,0 +1,177 @@
+# Standard library imports
+import os
+import socket
+import unittest
+from threading import Thread
+
+# Local imports
+from envisage.plugins.remote_editor.communication.util import \
+    acquire_spawn_lock, encode_message, get_server_port, message_length, \
+    read_lock_file, receive, release_spawn_lock, remove_lock_file, send, \
+    server_is_alive, split_arguments, write_lock_file, BINARY_HEADER, \
+    BINARY_VERSION, LOCK_PATH, MESSAGE_SEP, SPAWN_LOCK_PATH
+
+
+class UtilTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.reader, self.writer = socket.socketpair()
+
+    def tearDown(self):
+        self.reader.close()
+        self.writer.close()
+
+    def _round_trip(self, command, arguments, binary):
+        """ Send a message from another thread (so that large messages do not
+            fill up the socket buffer) and return what was received.
+        """
+        thread = Thread(target=send, args=(self.writer, command, arguments,
+                                           binary))
+        thread.start()
+        try:
+            return receive(self.reader)
+        finally:
+            thread.join()
+
+    def testTextFraming(self):
+        """ Does the original text framing still work?
+        """
+        self.assertEqual(self._round_trip('foo', 'bar', False), ('foo', 'bar'))
+        self.assertEqual(self._round_trip('foo', '', False), ('foo', ''))
+        self.assertEqual(encode_message('foo', 'bar'),
+                         '7' + MESSAGE_SEP + 'foo' + MESSAGE_SEP + 'bar')
+
+    def testBinaryFraming(self):
+        """ Are arguments containing separators kept intact by the binary
+            framing?
+        """
+        arguments = 'bar' + MESSAGE_SEP + '\x00baz'
+        self.assertEqual(self._round_trip('foo', arguments, True),
+                         ('foo', arguments))
+        self.assertEqual(self._round_trip('foo', ('1', arguments, ''), True),
+                         ('foo', ['1', arguments, '']))
+
+    def testLargeMessages(self):
+        """ Are large messages received intact with both framings?
+        """
+        arguments = 'x' * (8 * 1024 * 1024)
+        for binary in (False, True):
+            command, received = self._round_trip('foo', arguments, binary)
+            self.assertEqual(command, 'foo')
+            self.assertEqual(len(received), len(arguments))
+            self.assertEqual(received, arguments)
+
+    def testLargeMessagesWithoutMemoryview(self):
+        """ Are large messages received intact where there is no memoryview
+            (i.e. on Python 2.6)?
+        """
+        from envisage.plugins.remote_editor.communication import util
+        old_memoryview, util.memoryview = util.memoryview, None
+        try:
+            arguments = ''.join(chr(i % 256) for i in xrange(1024 * 1024))
+            for binary in (False, True):
+                command, received = self._round_trip('foo', arguments, binary)
+                self.assertEqual(command, 'foo')
+                self.assertEqual(received, arguments)
+        finally:
+            util.memoryview = old_memoryview
+
+    def testMessageLength(self):
+        """ Can the length of a partially received message be determined?
+        """
+        for binary in (False, True):
+            msg = encode_message('foo', 'bar', binary)
+            self.assertEqual(message_length(msg), len(msg))
+            self.assertEqual(message_length(msg[:1]), None)
+
+        msg = BINARY_HEADER.pack('\x00', BINARY_VERSION + 1, 0)
+        self.assertRaises(socket.error, message_length, msg)
+
+    def testSplitArguments(self):
+        """ Can arguments containing separators be split unambiguously?
+        """
+        arguments = MESSAGE_SEP.join(('1', 'foo', 'a' + MESSAGE_SEP + 'b'))
+        self.assertEqual(split_arguments(arguments, 3),
+                         ['1', 'foo', 'a' + MESSAGE_SEP + 'b'])
+        self.assertEqual(split_arguments(['1', 'foo', 'bar'], 3),
+                         ['1', 'foo', 'bar'])
+        self.assertRaises(ValueError, split_arguments, 'foo', 3)
+
+
+class LockFileTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._remove_locks()
+
+    def tearDown(self):
+        self._remove_locks()
+
+    def _remove_locks(self):
+        for path in (LOCK_PATH, SPAWN_LOCK_PATH):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def testReadWrite(self):
+        """ Does the lock file record the port, pid and start time?
+        """
+        self.assertEqual(read_lock_file(), None)
+        self.assertEqual(get_server_port(), -1)
+
+        lock = write_lock_file(1234)
+        self.assertEqual(lock[:2], (1234, os.getpid()))
+        self.assertEqual(read_lock_file(), lock)
+        self.assertEqual(get_server_port(), 1234)
+
+        # Lock files written by older servers only have the port.
+        with open(LOCK_PATH, 'w') as f:
+            f.write('1234')
+        self.assertEqual(read_lock_file(), (1234, None, None))
+
+    def testRemove(self):
+        """ Is a lock file only removed by its owner?
+        """
+        old_lock = write_lock_file(1234)
+        new_lock = write_lock_file(5678)
+        self.assert_(not remove_lock_file(old_lock))
+        self.assertEqual(read_lock_file(), new_lock)
+
+        self.assert_(remove_lock_file(new_lock))
+        self.assert_(not os.path.exists(LOCK_PATH))
+
+    def testLiveness(self):
+        """ Is a Server detected as alive only if its process is running and
+            its port accepts connections?
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('localhost', 0))
+        sock.listen(1)
+        port = sock.getsockname()[1]
+        try:
+            self.assert_(server_is_alive((port, os.getpid(), 0)))
+            self.assert_(server_is_alive((port, None, None)))
+
+            # A process that no longer exists.
+            self.assert_(not server_is_alive((port, 2**22 + 1, 0)))
+        finally:
+            sock.close()
+
+        self.assert_(not server_is_alive((port, os.getpid(), 0)))
+
+    def testSpawnLock(self):
+        """ Can only one Client at a time spawn a Server, and are stale spawn
+            locks broken?
+        """
+        self.assert_(acquire_spawn_lock())
+        self.assert_(not acquire_spawn_lock())
+        release_spawn_lock()
+        self.assert_(acquire_spawn_lock())
+
+        # A lock held by a process that has died.
+        with open(SPAWN_LOCK_PATH, 'w') as f:
+            f.write(str(2**22 + 1))
+        self.assert_(acquire_spawn_lock())
+        release_spawn_lock()
+
+
+if __name__ == '__main__':
+    unittest.main()
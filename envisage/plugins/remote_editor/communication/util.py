@@ -1,10 +1,12 @@
 # Standard library imports
-from errno import EINTR
+from errno import EEXIST, EINTR, EPERM
 import os
-import select
 import socket
+import struct
 from subprocess import Popen
 import sys
+import thread
+import time
 
 import csv
 import StringIO
@@ -15,11 +17,47 @@ from traits.etsconfig.api import ETSConfig
 # An obscure ASCII character that we used as separators in socket streams
 MESSAGE_SEP = chr(7) # 'bell' character
 
-# The location of the server lock file and the communication log
+# Binary framing. A binary message starts with a header containing a magic
+# byte (which can never start a text message, since those start with their
+# length in decimal), the framing version and the length of the payload. The
+# payload is a sequence of fields (the command followed by its arguments),
+# each preceded by its length, so arguments may contain any bytes at all.
+BINARY_MAGIC = '\x00'
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('!cBI')
+FIELD_HEADER = struct.Struct('!I')
+
+# The most that is received at a time when a message cannot be received in
+# place.
+RECEIVE_CHUNK_SIZE = 65536
+
+# 'memoryview' is new in Python 2.7.
+try:
+    memoryview = memoryview
+except NameError:
+    memoryview = None
+
+# The location of the server lock file and the communication log. The lock
+# file holds the port, pid and start time of the running server.
 LOCK_PATH = os.path.join(ETSConfig.application_data,
                          'remote_editor_server.lock')
+
+# The location of the lock file held by a client while it spawns a server, so
+# that concurrent clients do not spawn more than one, and how long it may be
+# held before it is considered stale (in seconds).
+SPAWN_LOCK_PATH = os.path.join(ETSConfig.application_data,
+                               'remote_editor_spawn.lock')
+SPAWN_TIMEOUT = 10
 LOG_PATH = os.path.join(ETSConfig.application_data, 'remote_editor_server.log')
 
+# The location of the Unix domain socket the server listens on when it is
+# configured to use the 'unix' transport.
+SOCKET_PATH = os.path.join(ETSConfig.application_data,
+                           'remote_editor_server.sock')
+
+# Whether this platform supports Unix domain sockets.
+HAS_UNIX_SOCKETS = hasattr(socket, 'AF_UNIX')
+
 
 def quoted_split(s):
     f = StringIO.StringIO(s)
@@ -67,14 +105,189 @@ def get_server_port():
     """ Reads the server port from the lock file. If the file does not exist
         returns -1.
     """
-    if os.path.exists(LOCK_PATH):
-        f = open(LOCK_PATH, 'r')
+    lock = read_lock_file()
+    if lock is None:
+        return -1
+    return lock[0]
+
+
+def read_lock_file(path=LOCK_PATH):
+    """ Reads the lock file. Returns a (port, pid, start_time) tuple, or None
+        if there is no (readable) lock file. The pid and start time are None
+        for lock files written by older servers.
+    """
+    try:
+        f = open(path, 'r')
         try:
-            return int(f.read().strip())
+            fields = f.read().split()
         finally:
             f.close()
+    except IOError:
+        return None
+
+    try:
+        if len(fields) == 1:
+            return int(fields[0]), None, None
+        port, pid, start_time = fields
+        return int(port), int(pid), float(start_time)
+    except ValueError:
+        return None
+
+
+def write_lock_file(port):
+    """ Atomically replace the lock file with one for a server in this
+        process listening on 'port'. Returns the contents as 'read_lock_file'
+        would.
+    """
+    lock = (port, os.getpid(), time.time())
+    tmp_path = _private_path(LOCK_PATH, 'tmp')
+    f = open(tmp_path, 'w')
+    try:
+        f.write('%i %i %r\n' % lock)
+    finally:
+        f.close()
+    _replace(tmp_path, LOCK_PATH)
+    return lock
+
+
+def remove_lock_file(lock):
+    """ Remove the lock file, but only if it still has the given contents
+        (so that a lock written in the meantime by a new server survives).
+        Returns whether the lock file was removed.
+    """
+    # Move the lock file out of the way first, so that it is checked and
+    # removed atomically.
+    tmp_path = _private_path(LOCK_PATH, 'stale')
+    try:
+        _replace(LOCK_PATH, tmp_path)
+    except OSError:
+        return False
+
+    if read_lock_file(tmp_path) == lock:
+        os.remove(tmp_path)
+        return True
+
+    # This is someone else's lock, so put it back (unless it has already been
+    # superseded).
+    if os.path.exists(LOCK_PATH):
+        os.remove(tmp_path)
     else:
-        return -1
+        _replace(tmp_path, LOCK_PATH)
+    return False
+
+
+def pid_exists(pid):
+    """ Returns whether a process with the given pid exists. On platforms
+        where this cannot be checked it is assumed that it does.
+    """
+    if sys.platform == 'win32':
+        import ctypes
+        SYNCHRONIZE = 0x100000
+        handle = ctypes.windll.kernel32.OpenProcess(SYNCHRONIZE, False, pid)
+        if handle:
+            ctypes.windll.kernel32.CloseHandle(handle)
+            return True
+        return False
+
+    try:
+        os.kill(pid, 0)
+    except OSError, err:
+        return err.errno == EPERM
+    return True
+
+
+def server_is_alive(lock, timeout=1):
+    """ Returns whether the server described by a lock (as returned by
+        'read_lock_file') is running. This checks that its process exists and
+        then makes a single connection to its port.
+    """
+    port, pid, start_time = lock
+    if pid is not None and not pid_exists(pid):
+        return False
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        return sock.connect_ex(('localhost', port)) == 0
+    finally:
+        sock.close()
+
+
+def acquire_spawn_lock():
+    """ Try to take the lock held while spawning a server. Returns whether
+        it was taken; if not, another client is spawning a server.
+    """
+    for attempt in range(2):
+        try:
+            fd = os.open(SPAWN_LOCK_PATH, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except OSError, err:
+            if err.errno != EEXIST:
+                raise
+        else:
+            os.write(fd, str(os.getpid()))
+            os.close(fd)
+            return True
+
+        # Break the lock if its holder has died or is taking too long. The
+        # lock is moved out of the way before it is checked, so that a lock
+        # taken by another client in the meantime is never removed.
+        stale_path = _private_path(SPAWN_LOCK_PATH, 'stale')
+        try:
+            _replace(SPAWN_LOCK_PATH, stale_path)
+        except OSError:
+            continue
+        if _spawn_lock_is_stale(stale_path):
+            os.remove(stale_path)
+        elif os.path.exists(SPAWN_LOCK_PATH):
+            os.remove(stale_path)
+            return False
+        else:
+            _replace(stale_path, SPAWN_LOCK_PATH)
+            return False
+    return False
+
+
+def release_spawn_lock():
+    """ Release the lock taken by 'acquire_spawn_lock'.
+    """
+    try:
+        os.remove(SPAWN_LOCK_PATH)
+    except OSError:
+        pass
+
+
+def _spawn_lock_is_stale(path):
+    """ Returns whether the spawn lock at 'path' is stale.
+    """
+    try:
+        age = time.time() - os.path.getmtime(path)
+        f = open(path, 'r')
+        try:
+            contents = f.read().strip()
+        finally:
+            f.close()
+    except (IOError, OSError):
+        return False
+
+    # A lock with no pid yet is still being written by its holder.
+    pid = int(contents) if contents.isdigit() else 0
+    return age >= SPAWN_TIMEOUT or bool(pid and not pid_exists(pid))
+
+
+def _private_path(path, suffix):
+    """ Returns a temporary path next to 'path' that no other process or
+        thread will use.
+    """
+    return '%s.%i.%i.%s' % (path, os.getpid(), thread.get_ident(), suffix)
+
+
+def _replace(src, dst):
+    """ Rename 'src' to 'dst', replacing 'dst' if it exists. This is atomic
+        except on Windows, where 'dst' has to be removed first.
+    """
+    if sys.platform == 'win32' and os.path.exists(dst):
+        os.remove(dst)
+    os.rename(src, dst)
 
 
 def accept_no_intr(sock):
@@ -92,24 +305,113 @@ def accept_no_intr(sock):
             pass
 
 
-def send(sock, command, arguments=''):
+def encode_message(command, arguments='', binary=False):
+    """ Encode a command with arguments for sending through a socket.
+
+        'arguments' is either a string or a sequence of strings. With the text
+        framing a sequence is joined with MESSAGE_SEP; with the binary framing
+        each string is sent as a separate field.
+    """
+    if binary:
+        if isinstance(arguments, basestring):
+            fields = [command, arguments]
+        else:
+            fields = [command] + list(arguments)
+        payload = encode_fields(fields)
+        return BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION,
+                                  len(payload)) + payload
+
+    if not isinstance(arguments, basestring):
+        arguments = MESSAGE_SEP.join(arguments)
+    msg = command + MESSAGE_SEP + arguments
+    return str(len(msg)) + MESSAGE_SEP + msg
+
+
+def encode_fields(fields):
+    """ Encode a sequence of strings, each preceded by its length.
+    """
+    return ''.join([FIELD_HEADER.pack(len(field)) + field for field in fields])
+
+
+def decode_fields(data):
+    """ Decode a sequence of strings encoded by 'encode_fields'. Raises
+        socket.error if the data is truncated.
+    """
+    fields = []
+    offset, end = 0, len(data)
+    while offset < end:
+        if offset + FIELD_HEADER.size > end:
+            raise socket.error('truncated field header')
+        length, = FIELD_HEADER.unpack_from(data, offset)
+        offset += FIELD_HEADER.size
+        if offset + length > end:
+            raise socket.error('truncated field')
+        fields.append(str(data[offset:offset+length]))
+        offset += length
+    return fields
+
+
+def decode_message(data):
+    """ Decode a message encoded by 'encode_message'. Returns a (command,
+        arguments) tuple. For binary messages 'arguments' is a string if a
+        single argument was sent, otherwise it is a list of strings.
+    """
+    if data[:1] == BINARY_MAGIC:
+        payload = buffer(data, BINARY_HEADER.size)
+        return _decode_fields(payload)
+
+    index = data.find(MESSAGE_SEP)
+    command, sep, arguments = str(data[index+1:]).partition(MESSAGE_SEP)
+    return command, arguments
+
+
+def message_length(data):
+    """ Return the total length of the message at the start of 'data', or
+        None if not enough of it has arrived to tell. Raises socket.error if
+        the message is malformed.
+    """
+    if data[:1] == BINARY_MAGIC:
+        if len(data) < BINARY_HEADER.size:
+            return None
+        magic, version, length = BINARY_HEADER.unpack_from(data)
+        if version != BINARY_VERSION:
+            raise socket.error('unsupported framing version %i' % version)
+        return BINARY_HEADER.size + length
+
+    index = data.find(MESSAGE_SEP)
+    if index == -1:
+        return None
+    try:
+        return index + 1 + int(data[:index])
+    except ValueError:
+        raise socket.error('malformed message header')
+
+
+def split_arguments(arguments, count):
+    """ Split the arguments of a command into 'count' fields.
+
+        Arguments received with the binary framing are already split. Text
+        arguments are split on MESSAGE_SEP, with any further separators left
+        in the last field (so that it can carry arbitrary data).
+    """
+    if isinstance(arguments, basestring):
+        fields = arguments.split(MESSAGE_SEP, count - 1)
+    else:
+        fields = list(arguments)
+    if len(fields) != count:
+        raise ValueError('expected %i arguments, got %i' % (count, len(fields)))
+    return fields
+
+
+def send(sock, command, arguments='', binary=False):
     """ Send a command with arguments (both strings) through a socket. This
         information is encoded with length information to ensure that everything
         is received.
     """
-    sent, total = 0, 0
-    msg = command + MESSAGE_SEP + arguments
-    msg = str(len(msg)) + MESSAGE_SEP + msg
-    length = len(msg)
-    while total < length:
-        msg = msg[sent:]
-        sent = sock.send(msg)
-        if not sent:
-            raise socket.error
-        total += sent
+    sock.sendall(encode_message(command, arguments, binary))
 
 
-def send_port(port, command, arguments='', timeout=None):
+def send_port(port, command, arguments='', timeout=None, binary=False):
     """ A send a command to a port. Convenience function that uses 'send'.
     """
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -121,7 +423,7 @@ def send_port(port, command, arguments='', timeout=None):
         return False
 
     try:
-        send(sock, command, arguments)
+        send(sock, command, arguments, binary)
     except socket.error:
         return False
     finally:
@@ -134,33 +436,68 @@ def send_port(port, command, arguments='', timeout=None):
 
 def receive(sock):
     """ Receive a command with arguments from a socket that was previously sent
-        information with 'send'.
-    """
-    index = -1
-    chunk, length = '', ''
-    received = False
-
-    while not received:
-        # Use select to query the socket for activity before calling sock.recv.
-        # Choose a timeout of 60 seconds for now.
-        readers, writers, in_error = select.select([sock], [], [], 60)
-
-        for rsock in readers:
-            while index == -1:
-                length += chunk
-                chunk = rsock.recv(4096)
-                if not chunk:
-                    raise socket.error
-                index = chunk.find(MESSAGE_SEP)
-            length = int(length + chunk[:index])
-
-            msg = chunk[index+1:]
-            while len(msg) < length:
-                chunk = rsock.recv(length - len(msg))
-                if not chunk:
-                    raise socket.error
-                msg += chunk
-            received = True
-
-    command, sep, arguments = msg.partition(MESSAGE_SEP)
+        information with 'send'. Both the text and binary framings are
+        understood (see 'decode_message' for the form of the arguments).
+
+        The message is received directly into a buffer of the right size, so
+        large messages are received in linear time.
+    """
+    # Read until we know how long the message is.
+    header = bytearray()
+    while True:
+        length = message_length(header)
+        if length is not None:
+            break
+        chunk = sock.recv(BINARY_HEADER.size if not header else 4096)
+        if not chunk:
+            raise socket.error('connection closed')
+        header += chunk
+
+    # Receive the rest of the message in place.
+    if len(header) >= length:
+        data = header[:length]
+    else:
+        data = bytearray(length)
+        data[:len(header)] = header
+        receive_into(sock, data, len(header))
+
+    return decode_message(data)
+
+
+def receive_into(sock, data, offset=0):
+    """ Fill a bytearray from a socket, starting at 'offset'.
+
+        The data is received in place where memoryviews are available (Python
+        2.7). Otherwise it is received in chunks and copied into place.
+    """
+    view = memoryview(data) if memoryview is not None else None
+    received, length = offset, len(data)
+    while received < length:
+        try:
+            if view is not None:
+                count = sock.recv_into(view[received:], length - received)
+            else:
+                chunk = sock.recv(min(length - received, RECEIVE_CHUNK_SIZE))
+                count = len(chunk)
+                data[received:received + count] = chunk
+        except socket.error, err:
+            if err[0] == EINTR:
+                continue
+            raise
+        if not count:
+            raise socket.error('connection closed')
+        received += count
+
+
+def _decode_fields(payload):
+    """ Decode the fields of a binary message payload.
+    """
+    fields = decode_fields(payload)
+    if not fields:
+        raise socket.error('empty message')
+    command, arguments = fields[0], fields[1:]
+    if len(arguments) == 1:
+        arguments = arguments[0]
+    elif not arguments:
+        arguments = ''
     return command, arguments
@@ -5,7 +5,7 @@
 import logging
 
 # Enthought library imports.
-from traits.api import List, provides, on_trait_change
+from traits.api import Dict, List, provides, on_trait_change
 
 # Local imports.
 from extension_registry import ExtensionRegistry
@@ -26,6 +26,11 @@ class ProviderExtensionRegistry(ExtensionRegistry):
     # The extension providers that populate the registry.
     _providers = List(IExtensionProvider)
 
+    # The contributions of each provider to each extension point as they were
+    # first harvested (i.e. before any provider changed them), in the same
+    # form as '_extensions'.
+    _harvested = Dict
+
     ###########################################################################
     # 'IExtensionRegistry' interface.
     ###########################################################################
@@ -54,6 +59,63 @@ class ProviderExtensionRegistry(ExtensionRegistry):
 
         return self._providers[:]
 
+    def get_provider_extensions(self):
+        """ Return the extensions of every extension point accessed so far.
+
+        Returns a dictionary in the form:-
+
+        { extension_point_id : [[contributions of provider 0], ...] }
+
+        i.e. with the contributions for each extension point broken down by
+        provider (in the same order as 'get_providers').
+
+        The contributions are the ones that each provider made when the
+        extension point was first accessed (or when the provider was added),
+        not including any changes that the provider has made since.
+
+        """
+
+        provider_extensions = {}
+        for extension_point_id, extensions in self._harvested.items():
+            if extension_point_id in self._extensions:
+                provider_extensions[extension_point_id] = [
+                    contributions[:] for contributions in extensions
+                ]
+
+        return provider_extensions
+
+    def set_provider_extensions(self, extension_point_id, extensions):
+        """ Pre-populate the extensions of an extension point.
+
+        'extensions' is a list containing the contributions of each provider
+        (in the same order as 'get_providers'). This allows the extensions to
+        be restored (e.g. from an 'ApplicationSnapshot') without asking each
+        provider for them.
+
+        Nothing is done if the extension point is unknown, has already been
+        accessed, or if the number of providers does not match. Returns True
+        if the extensions were set, otherwise False.
+
+        """
+
+        if extension_point_id not in self._extension_points:
+            return False
+
+        if extension_point_id in self._extensions:
+            return False
+
+        if len(extensions) != len(self._providers):
+            return False
+
+        self._extensions[extension_point_id] = [
+            list(contributions) for contributions in extensions
+        ]
+        self._harvested[extension_point_id] = [
+            list(contributions) for contributions in extensions
+        ]
+
+        return True
+
     def remove_provider(self, provider):
         """ Remove an extension provider.
 
@@ -88,11 +150,24 @@ class ProviderExtensionRegistry(ExtensionRegistry):
         elif extension_point_id in self._extensions:
             extensions = self._extensions[extension_point_id]
 
+            if self.metrics is not None:
+                self.metrics.record_cache(
+                    'extensions', extension_point_id, True
+                )
+
         # If not, then ask each provider for its contributions to the extension
         # point.
         else:
             extensions = self._initialize_extensions(extension_point_id)
             self._extensions[extension_point_id] = extensions
+            self._harvested[extension_point_id] = [
+                contributions[:] for contributions in extensions
+            ]
+
+            if self.metrics is not None:
+                self.metrics.record_cache(
+                    'extensions', extension_point_id, False
+                )
 
         # We store the extensions as a list of lists, with each inner list
         # containing the contributions from a single provider. Here we just
@@ -148,6 +223,10 @@ class ProviderExtensionRegistry(ExtensionRegistry):
 
             extensions.append(new)
 
+            harvested = self._harvested.get(extension_point_id)
+            if harvested is not None:
+                harvested.append(new[:])
+
         return events
 
     def _add_provider_extension_points(self, provider):
@@ -198,6 +277,10 @@ class ProviderExtensionRegistry(ExtensionRegistry):
 
             del extensions[index]
 
+            harvested = self._harvested.get(extension_point_id)
+            if harvested is not None:
+                del harvested[index]
+
         return events
 
     def _remove_provider_extension_points(self, provider, events):
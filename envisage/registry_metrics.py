@@ -0,0 +1,244 @@
+""" Call counters and timings for extension and service registries. """
+
+
+# Standard library imports.
+from timeit import default_timer
+
+# Enthought library imports.
+from traits.api import Any, HasTraits, Str
+
+
+class RegistryMetrics(HasTraits):
+    """ Call counters and timings for extension and service registries.
+
+    Metrics are opt-in: registries only record anything if their 'metrics'
+    trait is set, e.g::
+
+        metrics = RegistryMetrics()
+        application.extension_registry.metrics = metrics
+        application.service_registry.metrics = metrics
+
+        ...
+
+        print metrics.to_prometheus()
+
+    The same instance can be shared by several registries. Counters are kept
+    in plain dictionaries (and not in traits) so that recording is cheap
+    enough to leave switched on in production. Note that updates are not
+    locked, so counts may be slightly out if registries are used from
+    multiple threads at once.
+
+    """
+
+    #### 'RegistryMetrics' interface ##########################################
+
+    # The prefix used for metric names when exporting in Prometheus format.
+    prefix = Str('envisage')
+
+    #### Private interface ####################################################
+
+    # Call counts and cumulative times in the form:-
+    #
+    # { (operation, id) : [count, seconds] }
+    _calls = Any
+
+    # Cache hits and misses in the form:-
+    #
+    # { (cache, id) : [hits, misses] }
+    _caches = Any
+
+    # Listener fan-out in the form:-
+    #
+    # { extension_point_id : [events, listeners, max_listeners] }
+    _fan_out = Any
+
+    ###########################################################################
+    # 'object' interface.
+    ###########################################################################
+
+    def __init__(self, **traits):
+        """ Constructor. """
+
+        super(RegistryMetrics, self).__init__(**traits)
+
+        self.reset()
+
+        return
+
+    ###########################################################################
+    # 'RegistryMetrics' interface.
+    ###########################################################################
+
+    #### Recording ############################################################
+
+    # A timer suitable for measuring the duration of calls.
+    timer = staticmethod(default_timer)
+
+    def record_call(self, operation, id, seconds):
+        """ Record a call to an operation. """
+
+        key = (operation, id)
+        counter = self._calls.get(key)
+        if counter is None:
+            self._calls[key] = [1, seconds]
+
+        else:
+            counter[0] += 1
+            counter[1] += seconds
+
+        return
+
+    def record_cache(self, cache, id, hit):
+        """ Record a cache hit (or miss). """
+
+        key = (cache, id)
+        counter = self._caches.get(key)
+        if counter is None:
+            counter = self._caches[key] = [0, 0]
+
+        counter[0 if hit else 1] += 1
+
+        return
+
+    def record_fan_out(self, extension_point_id, listeners):
+        """ Record the number of listeners that an event was sent to. """
+
+        counter = self._fan_out.get(extension_point_id)
+        if counter is None:
+            self._fan_out[extension_point_id] = [1, listeners, listeners]
+
+        else:
+            counter[0] += 1
+            counter[1] += listeners
+            counter[2]  = max(counter[2], listeners)
+
+        return
+
+    def reset(self):
+        """ Reset all counters. """
+
+        self._calls   = {}
+        self._caches  = {}
+        self._fan_out = {}
+
+        return
+
+    #### Exporting ############################################################
+
+    def as_dict(self):
+        """ Return all of the metrics as a dictionary.
+
+        The dictionary has the form::
+
+          {
+            'calls' : {
+                operation : {id : {'count' : n, 'seconds' : s}}
+            },
+            'caches' : {
+                cache : {id : {'hits' : h, 'misses' : m, 'hit_rate' : r}}
+            },
+            'fan_out' : {
+                extension_point_id : {'events' : e, 'listeners' : l, 'max' : m}
+            }
+          }
+
+        """
+
+        calls = {}
+        for (operation, id), (count, seconds) in self._calls.items():
+            calls.setdefault(operation, {})[id] = dict(
+                count=count, seconds=seconds
+            )
+
+        caches = {}
+        for (cache, id), (hits, misses) in self._caches.items():
+            caches.setdefault(cache, {})[id] = dict(
+                hits=hits, misses=misses, hit_rate=float(hits)/(hits+misses)
+            )
+
+        fan_out = {}
+        for id, (events, listeners, maximum) in self._fan_out.items():
+            fan_out[id] = dict(events=events, listeners=listeners, max=maximum)
+
+        return dict(calls=calls, caches=caches, fan_out=fan_out)
+
+    def to_prometheus(self):
+        """ Return all of the metrics in the Prometheus text format. """
+
+        lines = []
+        def add(name, kind, help, samples):
+            """ Add a metric family. """
+
+            name = '%s_%s' % (self.prefix, name)
+            lines.append('# HELP %s %s' % (name, help))
+            lines.append('# TYPE %s %s' % (name, kind))
+            for labels, value in sorted(samples):
+                lines.append('%s{%s} %r' % (name, labels, value))
+
+            return
+
+        add('calls_total', 'counter', 'Number of registry calls.', [
+            (_labels(operation=operation, id=id), count)
+            for (operation, id), (count, seconds) in self._calls.items()
+        ])
+
+        add('call_seconds_total', 'counter', 'Time spent in registry calls.', [
+            (_labels(operation=operation, id=id), seconds)
+            for (operation, id), (count, seconds) in self._calls.items()
+        ])
+
+        add('cache_hits_total', 'counter', 'Number of registry cache hits.', [
+            (_labels(cache=cache, id=id), hits)
+            for (cache, id), (hits, misses) in self._caches.items()
+        ])
+
+        add('cache_misses_total', 'counter', 'Number of registry cache misses.',
+            [
+                (_labels(cache=cache, id=id), misses)
+                for (cache, id), (hits, misses) in self._caches.items()
+            ]
+        )
+
+        add('listener_events_total', 'counter',
+            'Number of extension point changed events.', [
+                (_labels(id=id), events)
+                for id, (events, listeners, maximum) in self._fan_out.items()
+            ]
+        )
+
+        add('listener_calls_total', 'counter',
+            'Number of extension point listeners notified.', [
+                (_labels(id=id), listeners)
+                for id, (events, listeners, maximum) in self._fan_out.items()
+            ]
+        )
+
+        add('listener_fan_out_max', 'gauge',
+            'Largest number of listeners notified of a single event.', [
+                (_labels(id=id), maximum)
+                for id, (events, listeners, maximum) in self._fan_out.items()
+            ]
+        )
+
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(**labels):
+    """ Format a set of Prometheus labels. """
+
+    def escape(value):
+        """ Escape a label value. """
+
+        value = str(value)
+        value = value.replace('\\', '\\\\')
+        value = value.replace('"', '\\"')
+        value = value.replace('\n', '\\n')
+
+        return value
+
+    return ','.join(
+        '%s="%s"' % (name, escape(value))
+        for name, value in sorted(labels.items())
+    )
+
+#### EOF ######################################################################
@@ -5,12 +5,13 @@
 import logging
 
 # Enthought library imports.
-from traits.api import Dict, Event, HasTraits, Int, Undefined, provides, \
-    Interface
+from traits.api import Dict, Event, HasTraits, Instance, Int, Undefined, \
+    provides, Interface
 
 # Local imports.
 from i_service_registry import IServiceRegistry
 from import_manager import ImportManager
+from registry_metrics import RegistryMetrics
 
 
 # Logging.
@@ -33,6 +34,12 @@ class ServiceRegistry(HasTraits):
     # An event that is fired when a service is unregistered.
     unregistered = Event
 
+    ####  'ServiceRegistry' interface #########################################
+
+    # Optional call counters and timings (nothing is recorded unless this is
+    # set).
+    metrics = Instance(RegistryMetrics)
+
     ####  Private interface ###################################################
 
     # The services in the registry.
@@ -97,35 +104,16 @@ class ServiceRegistry(HasTraits):
     def get_services(self, protocol, query='', minimize='', maximize=''):
         """ Return all services that match the specified query. """
 
-        services = []
-        for service_id, (name, obj, properties) in self._services.items():
-            if self._get_protocol_name(protocol) == name:
-                # If the protocol is a string then we need to import it!
-                if isinstance(protocol, basestring):
-                    actual_protocol = ImportManager().import_symbol(protocol)
-
-                # Otherwise, it is an actual protocol, so just use it!
-                else:
-                    actual_protocol = protocol
+        metrics = self.metrics
+        if metrics is None:
+            return self._get_services(protocol, query, minimize, maximize)
 
-                # If the registered service is actually a factory then use it
-                # to create the actual object.
-                obj = self._resolve_factory(
-                    actual_protocol, name, obj, properties, service_id
-                )
-
-                # If a query was specified then only add the service if it
-                # matches it!
-                if len(query) == 0 or self._eval_query(obj, properties, query):
-                    services.append(obj)
-
-        # Are we minimizing or maximising anything? If so then sort the list
-        # of services by the specified attribute/property.
-        if minimize != '':
-            services.sort(None, lambda x: getattr(x, minimize))
-
-        elif maximize != '':
-            services.sort(None, lambda x: getattr(x, maximize), reverse=True)
+        start = metrics.timer()
+        services = self._get_services(protocol, query, minimize, maximize)
+        metrics.record_call(
+            'get_services', self._get_protocol_name(protocol),
+            metrics.timer() - start
+        )
 
         return services
 
@@ -204,6 +192,10 @@ class ServiceRegistry(HasTraits):
 
         """
 
+        metrics = self.metrics
+        if metrics is not None:
+            start = metrics.timer()
+
         namespace = self._create_namespace(service, properties)
         try:
             result = eval(query, namespace)
@@ -211,8 +203,46 @@ class ServiceRegistry(HasTraits):
         except:
             result = False
 
+        if metrics is not None:
+            metrics.record_call('eval_query', query, metrics.timer() - start)
+
         return result
 
+    def _get_services(self, protocol, query, minimize, maximize):
+        """ Return all services that match the specified query. """
+
+        services = []
+        for service_id, (name, obj, properties) in self._services.items():
+            if self._get_protocol_name(protocol) == name:
+                # If the protocol is a string then we need to import it!
+                if isinstance(protocol, basestring):
+                    actual_protocol = ImportManager().import_symbol(protocol)
+
+                # Otherwise, it is an actual protocol, so just use it!
+                else:
+                    actual_protocol = protocol
+
+                # If the registered service is actually a factory then use it
+                # to create the actual object.
+                obj = self._resolve_factory(
+                    actual_protocol, name, obj, properties, service_id
+                )
+
+                # If a query was specified then only add the service if it
+                # matches it!
+                if len(query) == 0 or self._eval_query(obj, properties, query):
+                    services.append(obj)
+
+        # Are we minimizing or maximising anything? If so then sort the list
+        # of services by the specified attribute/property.
+        if minimize != '':
+            services.sort(None, lambda x: getattr(x, minimize))
+
+        elif maximize != '':
+            services.sort(None, lambda x: getattr(x, maximize), reverse=True)
+
+        return services
+
     def _get_protocol_name(self, protocol_or_name):
         """ Returns the full class name for a protocol. """
 
@@ -246,7 +276,14 @@ class ServiceRegistry(HasTraits):
         """ If 'obj' is a factory then use it to create the actual service. """
 
         # Is the registered service actually a service *factory*?
-        if self._is_service_factory(protocol, obj):
+        is_factory = self._is_service_factory(protocol, obj)
+
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.record_cache('services', name, not is_factory)
+            start = metrics.timer()
+
+        if is_factory:
             # A service factory is any callable that takes two arguments, the
             # first is the protocol, the second is the (possibly empty)
             # dictionary of properties that were registered with the service.
@@ -262,6 +299,11 @@ class ServiceRegistry(HasTraits):
             # unregistered first).
             self._services[service_id] = (name, obj, properties)
 
+            if metrics is not None:
+                metrics.record_call(
+                    'resolve_factory', name, metrics.timer() - start
+                )
+
         return obj
 
 #### EOF ######################################################################
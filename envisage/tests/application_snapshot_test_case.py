@@ -0,0 +1,323 @@
+""" Tests for application snapshots. """
+
+
+# Standard library imports.
+import os, shutil, sys, tempfile
+
+# Enthought library imports.
+from envisage.api import Application, ApplicationSnapshot, ExtensionPoint
+from envisage.api import Plugin, ServiceOffer, contributes_to
+from traits.api import Instance, Int, List
+from traits.testing.unittest_tools import unittest
+
+
+class TestApplication(Application):
+    """ The type of application used in the tests. """
+
+    id = 'test'
+
+
+class PluginA(Plugin):
+    """ A plugin that offers (and uses) some extension points. """
+
+    id = 'A'
+
+    x = ExtensionPoint(List, id='a.x')
+    offers = ExtensionPoint(List(ServiceOffer), id='a.offers')
+    objects = ExtensionPoint(List, id='a.objects')
+
+    def start(self):
+        """ Start the plugin. """
+
+        self.started_with = (self.x, self.offers, self.objects)
+
+        return
+
+
+class PluginB(Plugin):
+    """ A plugin that counts how often its contributions are harvested. """
+
+    id = 'B'
+
+    harvested = 0
+
+    @contributes_to('a.x')
+    def _get_x(self):
+        """ Contributions to 'a.x'. """
+
+        PluginB.harvested += 1
+
+        return [1, 'two', (3, 4), {'five' : [6]}, u'sev\xe9n']
+
+    offers = List(contributes_to='a.offers')
+    def _offers_default(self):
+        """ Trait initializer. """
+
+        offer = ServiceOffer(
+            protocol   = 'envisage.tests.i_foo.IFoo',
+            factory    = 'envisage.tests.foo.Foo',
+            properties = {'price' : 100}
+        )
+
+        return [offer]
+
+
+class PluginC(Plugin):
+    """ A plugin that contributes something that cannot be snapshotted. """
+
+    id = 'C'
+
+    objects = List(contributes_to='a.objects')
+    def _objects_default(self):
+        """ Trait initializer. """
+
+        return [object()]
+
+
+class PluginD(Plugin):
+    """ A plugin that changes its contributions while it is starting. """
+
+    id = 'D'
+
+    y = ExtensionPoint(List, id='d.y')
+
+    contributions = List(contributes_to='d.y')
+    def _contributions_default(self):
+        """ Trait initializer. """
+
+        return [1]
+
+    def start(self):
+        """ Start the plugin. """
+
+        self.started_with = self.y
+        self.contributions.append(2)
+
+        return
+
+
+class ApplicationSnapshotTestCase(unittest.TestCase):
+    """ Tests for application snapshots. """
+
+    ###########################################################################
+    # 'TestCase' interface.
+    ###########################################################################
+
+    def setUp(self):
+        """ Prepares the test fixture before each test method is called. """
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'snapshot.json')
+
+        PluginB.harvested = 0
+
+        return
+
+    def tearDown(self):
+        """ Called immediately after each test method has been called. """
+
+        shutil.rmtree(self.tmpdir)
+
+        for name in ['snapshot_helper', 'snapshot_plugin']:
+            sys.modules.pop(name, None)
+
+        return
+
+    ###########################################################################
+    # Tests.
+    ###########################################################################
+
+    def test_snapshot_saved_on_first_start(self):
+        """ snapshot saved on first start """
+
+        application = self._create_application()
+        application.start()
+
+        self.assert_(os.path.exists(self.filename))
+
+        snapshot = ApplicationSnapshot.load(self.filename)
+        self.assert_(snapshot.matches(application))
+        self.assertIn('a.x', snapshot.extensions)
+        self.assertIn('a.offers', snapshot.extensions)
+
+        # Extension points with contributions that cannot be encoded are not
+        # snapshotted.
+        self.assertNotIn('a.objects', snapshot.extensions)
+
+        return
+
+    def test_warm_start(self):
+        """ warm start """
+
+        application = self._create_application()
+        application.start()
+        self.assertEqual(1, PluginB.harvested)
+        expected = application.get_plugin('A').started_with
+
+        # Start the same plugins again.
+        application = self._create_application()
+        application.start()
+
+        # The contributions were restored rather than re-harvested...
+        self.assertEqual(1, PluginB.harvested)
+
+        # ... and they are equivalent to the originals.
+        x, offers, objects = application.get_plugin('A').started_with
+        self.assertEqual(expected[0], x)
+        self.assertEqual(1, len(offers))
+        self.assertEqual('envisage.tests.foo.Foo', offers[0].factory)
+        self.assertEqual({'price' : 100}, offers[0].properties)
+        self.assertEqual(1, len(objects))
+
+        return
+
+    def test_warm_start_preserves_string_types(self):
+        """ warm start preserves string types """
+
+        application = self._create_application()
+        application.start()
+        expected = application.get_plugin('A').started_with[0]
+
+        application = self._create_application()
+        application.start()
+
+        x = application.get_plugin('A').started_with[0]
+        self.assertEqual(str, type(x[1]))
+        self.assertEqual([str], map(type, x[3].keys()))
+        self.assertEqual(unicode, type(x[4]))
+        self.assertEqual(expected[4], x[4])
+
+        return
+
+    def test_snapshot_ignores_changes_made_while_starting(self):
+        """ snapshot ignores changes made while starting """
+
+        application = TestApplication(
+            plugins           = [PluginD()],
+            snapshot_filename = self.filename
+        )
+        application.start()
+        self.assertEqual([1], application.get_plugin('D').started_with)
+        self.assertEqual([1, 2], application.get_extensions('d.y'))
+
+        # The plugin sees the same contributions on a warm start as it did on
+        # a cold one.
+        application = TestApplication(
+            plugins           = [PluginD()],
+            snapshot_filename = self.filename
+        )
+        application.start()
+        self.assertEqual([1], application.get_plugin('D').started_with)
+        self.assertEqual([1, 2], application.get_extensions('d.y'))
+
+        return
+
+    def test_stale_snapshot_is_ignored(self):
+        """ stale snapshot is ignored """
+
+        application = self._create_application()
+        application.start()
+        self.assertEqual(1, PluginB.harvested)
+
+        # Start with a different set of plugins.
+        application = TestApplication(
+            plugins           = [PluginA(), PluginB()],
+            snapshot_filename = self.filename
+        )
+        application.start()
+
+        # The snapshot was not used, but it was replaced.
+        self.assertEqual(2, PluginB.harvested)
+
+        snapshot = ApplicationSnapshot.load(self.filename)
+        self.assert_(snapshot.matches(application))
+
+        return
+
+    def test_fingerprint_covers_imported_modules(self):
+        """ fingerprint covers imported modules """
+
+        # A plugin whose contributions come from a helper module.
+        self._write_module('snapshot_helper', 'X = [1, 2, 3]\n')
+        self._write_module('snapshot_plugin', (
+            'from envisage.api import Plugin\n'
+            'from traits.api import List\n'
+            'from snapshot_helper import X\n'
+            'class HelperPlugin(Plugin):\n'
+            '    id = "helper"\n'
+            '    x = List(contributes_to="a.x")\n'
+            '    def _x_default(self):\n'
+            '        return X\n'
+        ))
+
+        sys.path.insert(0, self.tmpdir)
+        try:
+            from snapshot_plugin import HelperPlugin
+
+        finally:
+            sys.path.remove(self.tmpdir)
+
+        application = TestApplication(plugins=[PluginA(), HelperPlugin()])
+        fingerprint = ApplicationSnapshot.get_fingerprint(application)
+
+        # Changing the helper module changes the fingerprint.
+        self._write_module('snapshot_helper', 'X = [4, 5, 6, 7]\n')
+        self.assertNotEqual(
+            fingerprint, ApplicationSnapshot.get_fingerprint(application)
+        )
+
+        return
+
+    def test_fingerprint_covers_snapshot_version(self):
+        """ fingerprint covers snapshot version """
+
+        application = self._create_application()
+        fingerprint = ApplicationSnapshot.get_fingerprint(application)
+
+        application.get_plugin('B').snapshot_version = '2'
+        self.assertNotEqual(
+            fingerprint, ApplicationSnapshot.get_fingerprint(application)
+        )
+
+        return
+
+    def test_corrupt_snapshot_is_ignored(self):
+        """ corrupt snapshot is ignored """
+
+        with open(self.filename, 'w') as f:
+            f.write('this is not a snapshot')
+
+        application = self._create_application()
+        application.start()
+        self.assertEqual(1, PluginB.harvested)
+
+        return
+
+    ###########################################################################
+    # Private interface.
+    ###########################################################################
+
+    def _create_application(self):
+        """ Create an application that uses the test snapshot file. """
+
+        application = TestApplication(
+            plugins           = [PluginA(), PluginB(), PluginC()],
+            snapshot_filename = self.filename
+        )
+
+        return application
+
+    def _write_module(self, name, source):
+        """ Write the source of a module into the temporary directory. """
+
+        with open(os.path.join(self.tmpdir, name + '.py'), 'w') as f:
+            f.write(source)
+
+        return
+
+
+# Entry point for stand-alone testing.
+if __name__ == '__main__':
+    unittest.main()
+
+#### EOF ######################################################################
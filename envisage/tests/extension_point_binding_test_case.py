@@ -1,9 +1,12 @@
 """ Tests for extension point bindings. """
 
 
+# Standard library imports.
+import gc
+
 # Enthought library imports.
-from envisage.api import ExtensionPoint
-from envisage.api import bind_extension_point
+from envisage.api import ExtensionPoint, ExtensionPointBinding
+from envisage.api import bind_extension_point, unbind_extension_point
 from traits.api import HasTraits, List
 from traits.testing.unittest_tools import unittest
 
@@ -42,6 +45,9 @@ class ExtensionPointBindingTestCase(unittest.TestCase):
         # Use the extension registry for all extension points and bindings.
         ExtensionPoint.extension_registry = self.extension_registry
 
+        # Make sure that bindings left over from other tests are gone.
+        gc.collect()
+
         return
 
     def tearDown(self):
@@ -238,6 +244,158 @@ class ExtensionPointBindingTestCase(unittest.TestCase):
 
         return
 
+    def test_unbind(self):
+        """ unbind """
+
+        registry = self.extension_registry
+
+        # Add an extension point.
+        registry.add_extension_point(self._create_extension_point('my.ep'))
+
+        # Declare a class that consumes the extension.
+        class Foo(HasTraits):
+            x = List
+
+        f = Foo()
+
+        binding = bind_extension_point(f, 'x', 'my.ep', registry)
+        registry.add_extension('my.ep', 42)
+        self.assertEqual([42], f.x)
+
+        # Break the binding.
+        binding.unbind()
+        self.assertEqual([], ExtensionPointBinding.get_bindings(f))
+        self.assertEqual([], registry._listeners['my.ep'])
+
+        # Changes in the registry no longer affect the object...
+        registry.add_extension('my.ep', 99)
+        self.assertEqual([42], f.x)
+
+        # ... and vice versa.
+        f.x = ['a string']
+        self.assertEqual([42, 99], registry.get_extensions('my.ep'))
+
+        # Unbinding twice does nothing.
+        binding.unbind()
+
+        return
+
+    def test_unbind_extension_point(self):
+        """ unbind extension point """
+
+        registry = self.extension_registry
+
+        # Add 2 extension points.
+        registry.add_extension_point(self._create_extension_point('my.ep'))
+        registry.add_extension_point(self._create_extension_point('another.ep'))
+
+        # Declare a class that consumes both of the extension points.
+        class Foo(HasTraits):
+            x = List
+            y = List
+
+        f = Foo()
+
+        bind_extension_point(f, 'x', 'my.ep', registry)
+        bind_extension_point(f, 'y', 'another.ep', registry)
+
+        # Remove the binding for just one trait.
+        unbind_extension_point(f, 'x')
+        registry.add_extension('my.ep', 42)
+        registry.add_extension('another.ep', 99)
+        self.assertEqual([], f.x)
+        self.assertEqual([99], f.y)
+
+        # Remove all of the object's bindings.
+        unbind_extension_point(f)
+        registry.add_extension('another.ep', 100)
+        self.assertEqual([99], f.y)
+        self.assertEqual([], ExtensionPointBinding.get_bindings(f))
+
+        return
+
+    def test_binding_as_context_manager(self):
+        """ binding as context manager """
+
+        registry = self.extension_registry
+
+        # Add an extension point.
+        registry.add_extension_point(self._create_extension_point('my.ep'))
+
+        # Declare a class that consumes the extension.
+        class Foo(HasTraits):
+            x = List
+
+        f = Foo()
+
+        with bind_extension_point(f, 'x', 'my.ep', registry):
+            registry.add_extension('my.ep', 42)
+            self.assertEqual([42], f.x)
+
+        registry.add_extension('my.ep', 99)
+        self.assertEqual([42], f.x)
+
+        return
+
+    def test_binding_does_not_keep_object_alive(self):
+        """ binding does not keep object alive """
+
+        registry = self.extension_registry
+
+        # Add an extension point.
+        registry.add_extension_point(self._create_extension_point('my.ep'))
+
+        # Declare a class that consumes the extension.
+        class Foo(HasTraits):
+            x = List
+
+        f = Foo()
+        binding = bind_extension_point(f, 'x', 'my.ep', registry)
+        self.assertEqual(1, ExtensionPointBinding.get_binding_counts()['my.ep'])
+
+        # Get rid of the object.
+        del f
+        gc.collect()
+
+        # The binding and the registry listener should have gone with it.
+        self.assertEqual(None, binding.obj)
+        self.assertEqual(
+            None, ExtensionPointBinding.get_binding_counts().get('my.ep')
+        )
+        self.assertEqual([], registry._listeners['my.ep'])
+
+        return
+
+    def test_binding_counts(self):
+        """ binding counts """
+
+        registry = self.extension_registry
+
+        # Add 2 extension points.
+        registry.add_extension_point(self._create_extension_point('my.ep'))
+        registry.add_extension_point(self._create_extension_point('another.ep'))
+
+        # Declare a class that consumes both of the extension points.
+        class Foo(HasTraits):
+            x = List
+            y = List
+
+        f = Foo()
+        g = Foo()
+
+        bind_extension_point(f, 'x', 'my.ep', registry)
+        bind_extension_point(f, 'y', 'another.ep', registry)
+        bind_extension_point(g, 'x', 'my.ep', registry)
+
+        counts = ExtensionPointBinding.get_binding_counts()
+        self.assertEqual(2, counts['my.ep'])
+        self.assertEqual(1, counts['another.ep'])
+
+        unbind_extension_point(f)
+        unbind_extension_point(g)
+
+        return
+
     ###########################################################################
     # Private interface.
     ###########################################################################
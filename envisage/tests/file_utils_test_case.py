@@ -0,0 +1,144 @@
+""" Tests for the file utilities. """
+
+
+# Standard library imports.
+import os
+import shutil
+import tempfile
+
+# Enthought library imports.
+from envisage import file_utils
+from envisage.file_utils import recover_file, write_atomically, \
+     write_atomically_with
+from traits.testing.unittest_tools import unittest
+
+
+class FileUtilsTestCase(unittest.TestCase):
+    """ Tests for the file utilities. """
+
+    ###########################################################################
+    # 'TestCase' interface.
+    ###########################################################################
+
+    def setUp(self):
+        """ Prepares the test fixture before each test method is called. """
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'file')
+
+        # Some tests replace 'os.rename' to behave like it does on Windows.
+        self.rename = os.rename
+
+        return
+
+    def tearDown(self):
+        """ Called immediately after each test method has been called. """
+
+        file_utils.os.rename = self.rename
+        shutil.rmtree(self.tmpdir)
+
+        return
+
+    ###########################################################################
+    # Tests.
+    ###########################################################################
+
+    def test_write_atomically(self):
+        """ write atomically """
+
+        write_atomically(self.filename, 'old')
+        write_atomically_with(self.filename, lambda f: f.write('new'))
+
+        self.assertEqual('new', self._read())
+        self.assertEqual(['file'], os.listdir(self.tmpdir))
+
+        return
+
+    def test_failed_write_leaves_file_unchanged(self):
+        """ failed write leaves file unchanged """
+
+        write_atomically(self.filename, 'old')
+
+        def function(f):
+            f.write('new')
+            raise ValueError('failed')
+
+        with self.assertRaises(ValueError):
+            write_atomically_with(self.filename, function)
+
+        self.assertEqual('old', self._read())
+        self.assertEqual(['file'], os.listdir(self.tmpdir))
+
+        return
+
+    def test_write_without_rename_over(self):
+        """ write without rename over """
+
+        write_atomically(self.filename, 'old')
+
+        # Rename like Windows does, which fails if the target exists.
+        rename = self.rename
+        def windows_rename(src, dst):
+            if os.path.exists(dst):
+                raise OSError('file exists')
+            rename(src, dst)
+
+        file_utils.os.rename = windows_rename
+        write_atomically(self.filename, 'new')
+
+        self.assertEqual('new', self._read())
+        self.assertEqual(['file'], os.listdir(self.tmpdir))
+
+        # If the new file can't be put in place the old one is kept.
+        def failing_rename(src, dst):
+            if src.endswith('.tmp'):
+                raise OSError('file exists')
+            rename(src, dst)
+
+        file_utils.os.rename = failing_rename
+        with self.assertRaises(OSError):
+            write_atomically(self.filename, 'newer')
+
+        self.assertEqual('new', self._read())
+        self.assertEqual(['file'], os.listdir(self.tmpdir))
+
+        return
+
+    def test_recover_file(self):
+        """ recover file """
+
+        self.assertFalse(recover_file(self.filename))
+
+        # A replace that was interrupted after the old file was moved aside.
+        with open(self.filename + '.bak', 'wb') as f:
+            f.write('old')
+
+        self.assertTrue(recover_file(self.filename))
+        self.assertEqual('old', self._read())
+        self.assertEqual(['file'], os.listdir(self.tmpdir))
+
+        # A stale backup is ignored if the file itself is there.
+        with open(self.filename + '.bak', 'wb') as f:
+            f.write('older')
+
+        self.assertTrue(recover_file(self.filename))
+        self.assertEqual('old', self._read())
+
+        return
+
+    ###########################################################################
+    # Private interface.
+    ###########################################################################
+
+    def _read(self):
+        """ Return the contents of the file. """
+
+        with open(self.filename, 'rb') as f:
+            return f.read()
+
+
+# Entry point for stand-alone testing.
+if __name__ == '__main__':
+    unittest.main()
+
+#### EOF ######################################################################
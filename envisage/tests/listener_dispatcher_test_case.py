@@ -0,0 +1,274 @@
+""" Tests for the extension point listener dispatchers. """
+
+
+# Standard library imports.
+import threading
+
+# Enthought library imports.
+from envisage.api import ExtensionPoint, QueuingDispatcher, ThreadedDispatcher
+from traits.api import HasTraits, Instance, List
+from traits.testing.unittest_tools import unittest
+
+# Local imports.
+#
+# We do these as absolute imports to allow nose to run from a different
+# working directory.
+from envisage.tests.mutable_extension_registry import (
+    MutableExtensionRegistry
+)
+
+
+class ManualDispatcher(QueuingDispatcher):
+    """ A queuing dispatcher that is only drained when we say so! """
+
+    def _schedule(self):
+        """ Arrange for '_drain' to be called. """
+
+        return
+
+
+class Contributed(HasTraits):
+    """ An object with an extension point trait. """
+
+    extension_registry = Instance(MutableExtensionRegistry)
+
+    x = ExtensionPoint(List, id='my.ep')
+
+
+class ListenerDispatcherTestCase(unittest.TestCase):
+    """ Tests for the extension point listener dispatchers. """
+
+    ###########################################################################
+    # 'TestCase' interface.
+    ###########################################################################
+
+    def setUp(self):
+        """ Prepares the test fixture before each test method is called. """
+
+        self.registry = MutableExtensionRegistry()
+        self.registry.add_extension_point(
+            ExtensionPoint(id='my.ep', trait_type=List)
+        )
+        self.registry.add_extension_point(
+            ExtensionPoint(id='another.ep', trait_type=List)
+        )
+
+        return
+
+    def tearDown(self):
+        """ Called immediately after each test method has been called. """
+
+        return
+
+    ###########################################################################
+    # Tests.
+    ###########################################################################
+
+    def test_synchronous_by_default(self):
+        """ synchronous by default """
+
+        events = []
+        def listener(extension_registry, event):
+            events.append(event)
+
+        self.registry.add_extension_point_listener(listener, 'my.ep')
+        self.registry.add_extension('my.ep', 42)
+
+        self.assertEqual(1, len(events))
+        self.assertEqual([42], events[0].added)
+
+        return
+
+    def test_queued_events_are_not_delivered_until_drained(self):
+        """ queued events are not delivered until drained """
+
+        dispatcher = ManualDispatcher()
+        self.registry.dispatcher = dispatcher
+
+        events = []
+        def listener(extension_registry, event):
+            events.append(event)
+
+        self.registry.add_extension_point_listener(listener, 'my.ep')
+        self.registry.add_extension('my.ep', 42)
+        self.assertEqual(0, len(events))
+
+        dispatcher._drain()
+        self.assertEqual(1, len(events))
+        self.assertEqual([42], events[0].added)
+        self.assertEqual(0, events[0].index)
+
+        return
+
+    def test_events_are_coalesced_while_backed_up(self):
+        """ events are coalesced while backed up """
+
+        dispatcher = ManualDispatcher()
+        self.registry.dispatcher = dispatcher
+
+        events = []
+        def listener(extension_registry, event):
+            events.append((event.extension_point_id, event))
+
+        self.registry.add_extension_point_listener(listener)
+        self.registry.add_extension('my.ep', 1)
+        self.registry.add_extension('another.ep', 2)
+        self.registry.add_extension('my.ep', 3)
+        self.registry.add_extension('my.ep', 4)
+
+        dispatcher._drain()
+
+        # One (coalesced) event per extension point, in the order that the
+        # extension points were first changed.
+        self.assertEqual(
+            ['my.ep', 'another.ep'], [id for id, event in events]
+        )
+        self.assertEqual([1, 3, 4], events[0][1].added)
+        self.assertEqual(0, events[0][1].index)
+        self.assertEqual([2], events[1][1].added)
+        self.assertEqual(2, dispatcher.coalesced_count)
+
+        return
+
+    def test_coalesced_add_and_remove_cancel_out(self):
+        """ coalesced add and remove cancel out """
+
+        dispatcher = ManualDispatcher()
+        self.registry.dispatcher = dispatcher
+
+        events = []
+        def listener(extension_registry, event):
+            events.append(event)
+
+        self.registry.add_extension_point_listener(listener, 'my.ep')
+        self.registry.add_extension('my.ep', 1)
+        self.registry.add_extension('my.ep', 2)
+        self.registry.remove_extension('my.ep', 1)
+
+        dispatcher._drain()
+        self.assertEqual(1, len(events))
+        self.assertEqual([2], events[0].added)
+        self.assertEqual([], events[0].removed)
+
+        # Changes that cancel out completely are not delivered at all.
+        self.registry.add_extension('my.ep', 3)
+        self.registry.remove_extension('my.ep', 3)
+
+        dispatcher._drain()
+        self.assertEqual(1, len(events))
+
+        return
+
+    def test_empty_events_that_were_not_coalesced_are_delivered(self):
+        """ empty events that were not coalesced are delivered """
+
+        dispatcher = ManualDispatcher()
+        self.registry.dispatcher = dispatcher
+
+        events = []
+        def listener(extension_registry, event):
+            events.append(event)
+
+        self.registry.add_extension_point_listener(listener, 'my.ep')
+
+        # The synchronous dispatcher delivers an event that changes nothing,
+        # so the queuing one must too.
+        self.registry.set_extensions('my.ep', [])
+
+        dispatcher._drain()
+        self.assertEqual(1, len(events))
+        self.assertEqual([], events[0].added)
+        self.assertEqual([], events[0].removed)
+
+        return
+
+    def test_coalesced_events_are_items_events(self):
+        """ coalesced events are delivered as '_items' events """
+
+        dispatcher = ManualDispatcher()
+        self.registry.dispatcher = dispatcher
+
+        obj = Contributed(extension_registry=self.registry)
+        ExtensionPoint.connect_extension_point_traits(obj)
+
+        events = []
+        obj.on_trait_change(
+            lambda event: events.append(event), 'x_items'
+        )
+
+        self.registry.add_extension('my.ep', 1)
+        self.registry.add_extension('my.ep', 2)
+        self.registry.remove_extension('my.ep', 1)
+
+        dispatcher._drain()
+        self.assertEqual(1, len(events))
+        self.assertEqual([2], events[0].added)
+        self.assertEqual([], events[0].removed)
+
+        return
+
+    def test_exceptions_in_queued_listeners_are_logged(self):
+        """ exceptions in queued listeners are logged """
+
+        dispatcher = ManualDispatcher()
+        self.registry.dispatcher = dispatcher
+
+        events = []
+        def bad_listener(extension_registry, event):
+            raise ValueError('bad listener')
+
+        def good_listener(extension_registry, event):
+            events.append(event)
+
+        self.registry.add_extension_point_listener(bad_listener, 'my.ep')
+        self.registry.add_extension_point_listener(good_listener, 'my.ep')
+        self.registry.add_extension('my.ep', 42)
+
+        dispatcher._drain()
+        self.assertEqual(1, len(events))
+
+        return
+
+    def test_threaded_dispatcher(self):
+        """ threaded dispatcher """
+
+        dispatcher = ThreadedDispatcher()
+        self.registry.dispatcher = dispatcher
+
+        # Block the worker thread in the first listener call so that the
+        # queue backs up.
+        release = threading.Event()
+        threads = []
+        events = []
+        def listener(extension_registry, event):
+            release.wait()
+            threads.append(threading.current_thread())
+            events.append(event)
+
+        self.registry.add_extension_point_listener(listener, 'my.ep')
+        self.registry.add_extension('my.ep', 1)
+        self.registry.add_extension('my.ep', 2)
+        self.registry.add_extension('my.ep', 3)
+
+        # Adding the extensions did not block on the listener.
+        release.set()
+        dispatcher.flush()
+        dispatcher.stop()
+        self.assertFalse(dispatcher.running)
+
+        self.assertNotEqual(threading.current_thread(), threads[0])
+
+        # The listener sees every extension, in order.
+        added = []
+        for event in events:
+            added.extend(event.added)
+        self.assertEqual([1, 2, 3], added)
+
+        return
+
+
+# Entry point for stand-alone testing.
+if __name__ == '__main__':
+    unittest.main()
+
+#### EOF ######################################################################
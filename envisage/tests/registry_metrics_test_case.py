@@ -0,0 +1,186 @@
+""" Tests for registry metrics. """
+
+
+# Enthought library imports.
+from envisage.api import Application, ExtensionPoint, Plugin
+from envisage.api import RegistryMetrics, ServiceRegistry
+from traits.api import HasTraits, Int, List
+from traits.testing.unittest_tools import unittest
+
+# Local imports.
+#
+# We do these as absolute imports to allow nose to run from a different
+# working directory.
+from envisage.tests.mutable_extension_registry import (
+    MutableExtensionRegistry
+)
+
+
+class PluginA(Plugin):
+    """ A plugin that offers an extension point. """
+
+    id = 'A'
+    x  = ExtensionPoint(List, id='a.x')
+
+
+class PluginB(Plugin):
+    """ A plugin that contributes to an extension point. """
+
+    id = 'B'
+    x  = List(Int, [1, 2, 3], contributes_to='a.x')
+
+
+class Foo(HasTraits):
+    """ A service. """
+
+    price = Int
+
+
+def foo_factory(**properties):
+    """ A factory for foos. """
+
+    return Foo(**properties)
+
+
+class RegistryMetricsTestCase(unittest.TestCase):
+    """ Tests for registry metrics. """
+
+    ###########################################################################
+    # 'TestCase' interface.
+    ###########################################################################
+
+    def setUp(self):
+        """ Prepares the test fixture before each test method is called. """
+
+        self.metrics = RegistryMetrics()
+
+        return
+
+    def tearDown(self):
+        """ Called immediately after each test method has been called. """
+
+        return
+
+    ###########################################################################
+    # Tests.
+    ###########################################################################
+
+    def test_metrics_are_off_by_default(self):
+        """ metrics are off by default """
+
+        application = Application(plugins=[PluginA(), PluginB()])
+
+        self.assertEqual(None, application.extension_registry.metrics)
+        self.assertEqual(None, application.service_registry.metrics)
+
+        return
+
+    def test_extension_registry_calls_and_cache(self):
+        """ extension registry calls and cache """
+
+        application = Application(plugins=[PluginA(), PluginB()])
+        application.extension_registry.metrics = self.metrics
+
+        application.get_extensions('a.x')
+        application.get_extensions('a.x')
+        application.get_extensions('a.x')
+
+        metrics = self.metrics.as_dict()
+        self.assertEqual(3, metrics['calls']['get_extensions']['a.x']['count'])
+
+        cache = metrics['caches']['extensions']['a.x']
+        self.assertEqual(2, cache['hits'])
+        self.assertEqual(1, cache['misses'])
+        self.assertAlmostEqual(2.0/3, cache['hit_rate'])
+
+        return
+
+    def test_listener_fan_out(self):
+        """ listener fan out """
+
+        registry = MutableExtensionRegistry(metrics=self.metrics)
+        registry.add_extension_point(ExtensionPoint(id='my.ep'))
+
+        def listener(extension_registry, event):
+            pass
+
+        def another_listener(extension_registry, event):
+            pass
+
+        registry.add_extension_point_listener(listener, 'my.ep')
+        registry.add_extension_point_listener(another_listener)
+        registry.add_extension('my.ep', 42)
+        registry.add_extension('my.ep', 43)
+
+        fan_out = self.metrics.as_dict()['fan_out']['my.ep']
+        self.assertEqual(2, fan_out['events'])
+        self.assertEqual(4, fan_out['listeners'])
+        self.assertEqual(2, fan_out['max'])
+
+        return
+
+    def test_service_registry(self):
+        """ service registry """
+
+        registry = ServiceRegistry(metrics=self.metrics)
+        registry.register_service(Foo, foo_factory, {'price' : 100})
+
+        registry.get_services(Foo)
+        registry.get_services(Foo, 'price < 200')
+
+        name = '%s.Foo' % __name__
+        metrics = self.metrics.as_dict()
+        self.assertEqual(2, metrics['calls']['get_services'][name]['count'])
+        self.assertEqual(
+            1, metrics['calls']['eval_query']['price < 200']['count']
+        )
+        self.assertEqual(1, metrics['calls']['resolve_factory'][name]['count'])
+
+        # The first lookup created the service, the second used the cached
+        # service object.
+        cache = metrics['caches']['services'][name]
+        self.assertEqual(1, cache['hits'])
+        self.assertEqual(1, cache['misses'])
+
+        return
+
+    def test_prometheus_export(self):
+        """ prometheus export """
+
+        self.metrics.record_call('get_extensions', 'my."ep"', 0.5)
+        self.metrics.record_cache('extensions', 'my.ep', True)
+        self.metrics.record_fan_out('my.ep', 3)
+
+        text = self.metrics.to_prometheus()
+        lines = text.splitlines()
+
+        self.assertIn('# TYPE envisage_calls_total counter', lines)
+        self.assertIn(
+            'envisage_calls_total{id="my.\\"ep\\"",operation="get_extensions"}'
+            ' 1', lines
+        )
+        self.assertIn(
+            'envisage_cache_hits_total{cache="extensions",id="my.ep"} 1', lines
+        )
+        self.assertIn('envisage_listener_fan_out_max{id="my.ep"} 3', lines)
+
+        return
+
+    def test_reset(self):
+        """ reset """
+
+        self.metrics.record_call('get_extensions', 'my.ep', 0.5)
+        self.metrics.reset()
+
+        self.assertEqual(
+            dict(calls={}, caches={}, fan_out={}), self.metrics.as_dict()
+        )
+
+        return
+
+
+# Entry point for stand-alone testing.
+if __name__ == '__main__':
+    unittest.main()
+
+#### EOF ######################################################################
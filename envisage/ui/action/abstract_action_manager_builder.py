@@ -1,6 +1,9 @@
 """ Builds menus, menu bars and tool bars from action sets. """
 
 
+# Standard library imports.
+import heapq
+
 # Enthought library imports.
 from pyface.action.api import ActionManager, MenuManager
 from traits.api import HasTraits, Instance, List, provides
@@ -54,19 +57,25 @@ class AbstractActionManagerBuilder(HasTraits):
         # New style (i.e multi) tool bars.
         ########################################
 
+        # The groups and actions for all of the tool bars.
+        all_groups = self._action_set_manager.get_groups(root)
+        all_actions = self._action_set_manager.get_actions(root)
+
         tool_bar_managers = []
         for tool_bar in self._action_set_manager.get_tool_bars(root):
+            prefix = '%s/%s' % (root, tool_bar.name)
+
             # Get all of the groups for the tool bar.
             groups = []
-            for group in self._action_set_manager.get_groups(root):
-                if group.path.startswith('%s/%s' % (root, tool_bar.name)):
-                    group.path = '/'.join(action.path.split('/')[1:])
+            for group in all_groups:
+                if group.path.startswith(prefix):
+                    group.path = '/'.join(group.path.split('/')[1:])
                     groups.append(group)
 
             # Get all of the actions for the tool bar.
             actions = []
-            for action in self._action_set_manager.get_actions(root):
-                if action.path.startswith('%s/%s' % (root, tool_bar.name)):
+            for action in all_actions:
+                if action.path.startswith(prefix):
                     action.path = '/'.join(action.path.split('/')[1:])
                     actions.append(action)
 
@@ -89,13 +98,13 @@ class AbstractActionManagerBuilder(HasTraits):
 
         # Get all of the groups for the tool bar.
         groups = []
-        for group in self._action_set_manager.get_groups(root):
+        for group in all_groups:
             if group.path == root:
                 groups.append(group)
 
         # Get all of the actions for the tool bar.
         actions = []
-        for action in self._action_set_manager.get_actions(root):
+        for action in all_actions:
             if action.path == root:
                 actions.append(action)
 
@@ -184,40 +193,46 @@ class AbstractActionManagerBuilder(HasTraits):
     def _add_actions(self, action_manager, actions):
         """ Add the specified actions to an action manager. """
 
-        while len(actions) > 0:
-            start = len(actions)
+        # The menu managers that each path resolves to. If any of the menus in
+        # a path are missing then they are created automatically (think
+        # 'mkdirs'!) the first time that the path is seen.
+        targets = {}
+
+        def place(action):
+            """ Attempt to place an action. """
 
-            for action in actions[:]:
-                # Resolve the action's path to find the action manager that it
-                # should be added to.
-                #
-                # If any of the menus in path are missing then this creates
-                # them automatically (think 'mkdirs'!).
+            target = targets.get(action.path)
+            if target is None:
                 target = self._make_submenus(action_manager, action.path)
+                targets[action.path] = target
+
+            # If the action needs to be placed 'before' or 'after' some other
+            # action, but the other action has not yet been added then it
+            # waits until it has been.
+            item = self._add_action(target, action)
+            group = self._find_group(target, action.group)
+            if item is None:
+                anchor = action.before or action.after
+
+                return (group, anchor), 'no item <%s> in group <%s> of %s' % (
+                    anchor, group.id, action.path
+                )
 
-                # Attempt to place the action.
-                #
-                # If the action needs to be placed 'before' or 'after' some
-                # other action, but the other action has not yet been added
-                # then we will try again later!
-                if self._add_action(target, action):
-                    actions.remove(action)
+            placer.provide((group, item.id))
 
-            end = len(actions)
+            return None
 
-            # If we didn't succeed in placing *any* actions then we must have a
-            # problem!
-            if start == end:
-                raise ValueError('Could not place %s' % actions)
+        placer = _Placer(actions, place)
+        placer.run()
 
         return
 
     def _add_action(self, action_manager, action):
         """ Add an action to an action manager.
 
-        Return True if the action was added successfully.
+        Return the action implementation if the action was added successfully.
 
-        Return False if the action needs to be placed 'before' or 'after' some
+        Return None if the action needs to be placed 'before' or 'after' some
         other action, but the other action has not yet been added.
 
         """
@@ -230,82 +245,112 @@ class AbstractActionManagerBuilder(HasTraits):
         if len(action.before) > 0:
             item = group.find(action.before)
             if item is None:
-                return False
+                return None
 
             index = group.items.index(item)
 
         elif len(action.after) > 0:
             item = group.find(action.after)
             if item is None:
-                return False
+                return None
 
             index = group.items.index(item) + 1
 
         else:
             index = len(group.items)
 
-        group.insert(index, self._create_action(action))
+        item = self._create_action(action)
+        group.insert(index, item)
 
-        return True
+        return item
 
     def _add_groups_and_menus(self, action_manager, groups_and_menus):
         """ Add the specified groups and menus to an action manager. """
 
-        # The reason we put the groups and menus together is that as we iterate
-        # over the list trying to add them, we might need to add a group before
-        # we can add a menu and we might need to add a menu before we can add a
-        # group! Hence, we take multiple passes over the list and we only barf
-        # if, in any single iteration, we cannot add anything.
-        while len(groups_and_menus) > 0:
-            start = len(groups_and_menus)
-
-            for item in groups_and_menus[:]:
-                # Resolve the path to find the menu manager that we are about
-                # to add the sub-menu or group to.
-                target = self._find_action_manager(action_manager, item.path)
-                if target is not None:
-                    # Attempt to place a group.
-                    if isinstance(item, Group):
-                        if self._add_group(target, item):
-                            groups_and_menus.remove(item)
-
-                    # Attempt to place a menu.
-                    elif self._add_menu(target, item):
-                        groups_and_menus.remove(item)
-
-            end = len(groups_and_menus)
-
-            # If we didn't succeed in adding *any* menus or groups then we
-            # must have a problem!
-            if start == end:
-                raise ValueError('Could not place %s' % groups_and_menus)
+        # The reason we put the groups and menus together is that we might
+        # need to add a group before we can add a menu and we might need to
+        # add a menu before we can add a group! Hence, anything that cannot be
+        # placed yet waits until whatever it is missing has been added.
+        def place(item):
+            """ Attempt to place a group or menu. """
+
+            # Resolve the path to find the menu manager that we are about to
+            # add the sub-menu or group to.
+            path   = _path_key(item.path)
+            target = self._find_action_manager(action_manager, item.path)
+            if target is None:
+                return ('menu', path), 'no menu at %s' % item.path
+
+            # Attempt to place a group.
+            if isinstance(item, Group):
+                if self._add_group(target, item) is None:
+                    anchor = item.before or item.after
+
+                    return ('group', path, anchor), 'no group <%s> in %s' % (
+                        anchor, item.path
+                    )
+
+                placer.provide(('group', path, item.id))
+
+                return None
+
+            # Attempt to place a menu.
+            group = self._find_group(target, item.group)
+            if group is None:
+                group_id = item.group or 'additions'
+
+                return ('group', path, group_id), 'no group <%s> in %s' % (
+                    group_id, item.path
+                )
+
+            menu_manager = self._add_menu(target, item)
+            if menu_manager is None:
+                anchor = item.before or item.after
+
+                return ('item', path, group.id, anchor), \
+                    'no item <%s> in group <%s> of %s' % (
+                        anchor, group.id, item.path
+                    )
+
+            menu_path = _path_key('%s/%s' % (item.path, item.id))
+            placer.provide(('menu', menu_path))
+            placer.provide(('item', path, group.id, item.id))
+            for menu_group in menu_manager.groups:
+                placer.provide(('group', menu_path, menu_group.id))
+
+            return None
+
+        placer = _Placer(groups_and_menus, place)
+        placer.run()
 
         return
 
     def _add_group(self, action_manager, group):
         """ Add a group to an action manager.
 
-        Return True if the group was added successfully.
+        Return the group implementation if the group was added successfully
+        (or already exists).
 
-        Return False if the group needs to be placed 'before' or 'after' some
+        Return None if the group needs to be placed 'before' or 'after' some
         other group, but the other group has not yet been added.
 
         """
 
         # Does the group already exist in the menu? If not then add it,
         # otherwise do nothing.
-        if action_manager.find_group(group.id) is None:
+        item = action_manager.find_group(group.id)
+        if item is None:
             if len(group.before) > 0:
                 item = action_manager.find_group(group.before)
                 if item is None:
-                    return False
+                    return None
 
                 index = action_manager.groups.index(item)
 
             elif len(group.after) > 0:
                 item = action_manager.find_group(group.after)
                 if item is None:
-                    return False
+                    return None
 
                 index = action_manager.groups.index(item) + 1
 
@@ -321,35 +366,37 @@ class AbstractActionManagerBuilder(HasTraits):
                 else:
                     index = len(action_manager.groups)
 
-            action_manager.insert(index, self._create_group(group))
+            item = self._create_group(group)
+            action_manager.insert(index, item)
 
-        return True
+        return item
 
     def _add_menu(self, menu_manager, menu):
         """ Add a menu manager to a errr, menu manager.
 
-        Return True if the menu was added successfully.
+        Return the menu manager implementation if the menu was added
+        successfully (or merged with an existing one).
 
-        Return False if the menu needs to be placed 'before' or 'after' some
+        Return None if the menu needs to be placed 'before' or 'after' some
         other item, but the other item has not yet been added.
 
         """
 
         group = self._find_group(menu_manager, menu.group)
         if group is None:
-            return False
+            return None
 
         if len(menu.before) > 0:
             item = group.find(menu.before)
             if item is None:
-                return False
+                return None
 
             index = group.items.index(item)
 
         elif len(menu.after) > 0:
             item = group.find(menu.after)
             if item is None:
-                return False
+                return None
 
             index = group.items.index(item) + 1
 
@@ -359,14 +406,15 @@ class AbstractActionManagerBuilder(HasTraits):
         # If the menu does *not* already exist in the group then add it.
         menu_item = group.find(menu.id)
         if menu_item is None:
-            group.insert(index, self._create_menu_manager(menu))
+            menu_item = self._create_menu_manager(menu)
+            group.insert(index, menu_item)
 
         # Otherwise, add all of the new menu's groups to the existing one.
         else:
             for group in menu.groups:
                 self._add_group(menu_item, group)
 
-        return True
+        return menu_item
 
     def _find_group(self, action_manager, id):
         """ Find the group with the specified ID. """
@@ -425,4 +473,112 @@ class AbstractActionManagerBuilder(HasTraits):
 
         return menu_manager
 
+
+def _path_key(path):
+    """ Return a path without its root component (the part that is resolved
+    relative to an action manager).
+
+    """
+
+    return path.partition('/')[2]
+
+
+class _Placer(object):
+    """ Places items that may have to wait for other items to be placed.
+
+    Each item is offered to 'place' in order. If it cannot be placed yet,
+    'place' returns a (key, reason) tuple and the item waits until some other
+    item provides that key (see 'provide'). Items are offered in exactly the
+    order that repeatedly sweeping the list until nothing is left would offer
+    them, but each item is only retried when whatever it is waiting for has
+    been added, so placing N items takes O(N) calls to 'place' instead of
+    O(N^2).
+
+    """
+
+    def __init__(self, items, place):
+        """ Constructor. """
+
+        self.items = items
+        self.place = place
+
+        # The indices of the items waiting for each key.
+        self._waiting = {}
+
+        # The reason that each waiting item could not be placed (by index).
+        self._reasons = {}
+
+        # The indices of the items to try in this sweep and the next one, and
+        # the index of the item being tried.
+        self._this_sweep = []
+        self._next_sweep = []
+        self._index = -1
+
+        return
+
+    def provide(self, key):
+        """ Wake up any items waiting for a key. """
+
+        for index in self._waiting.pop(key, []):
+            del self._reasons[index]
+
+            # Items after the current one get tried in this sweep.
+            if index > self._index:
+                heapq.heappush(self._this_sweep, index)
+
+            else:
+                self._next_sweep.append(index)
+
+        return
+
+    def run(self):
+        """ Place all of the items.
+
+        Raise a ValueError describing every item that cannot be placed.
+
+        """
+
+        self._this_sweep = range(len(self.items))
+        full_sweep = False
+        while len(self._this_sweep) > 0:
+            placed = False
+            while len(self._this_sweep) > 0:
+                self._index = heapq.heappop(self._this_sweep)
+                result = self.place(self.items[self._index])
+                if result is None:
+                    placed = True
+
+                else:
+                    key, reason = result
+                    self._waiting.setdefault(key, []).append(self._index)
+                    self._reasons[self._index] = reason
+
+            self._this_sweep, self._next_sweep = self._next_sweep, []
+            heapq.heapify(self._this_sweep)
+            self._index = -1
+
+            # Anything still waiting is normally stuck for good, but as a
+            # safety net try everything once more (in case something was
+            # added that nobody 'provided', e.g. by a custom '_create_*'
+            # method).
+            if len(self._this_sweep) == 0 and len(self._reasons) > 0:
+                if full_sweep and not placed:
+                    break
+
+                self._this_sweep = sorted(self._reasons)
+                self._waiting.clear()
+                self._reasons.clear()
+                full_sweep = True
+
+            else:
+                full_sweep = False
+
+        if len(self._reasons) > 0:
+            raise ValueError('Could not place %s' % ', '.join(
+                '%s (%s)' % (self.items[index], self._reasons[index])
+                for index in sorted(self._reasons)
+            ))
+
+        return
+
 #### EOF ######################################################################
@@ -2,7 +2,7 @@
 
 
 # Enthought library imports.
-from traits.api import Str
+from traits.api import Bool, Enum, Str
 
 # Local imports.
 from location import Location
@@ -19,6 +19,21 @@ class Action(Location):
     # The name of the class that implements the action.
     class_name = Str
 
+    # If True then the class that implements the action is only imported
+    # (and the action created) when the action is first performed from a
+    # menu, or added to a tool bar. This is only honoured for actions that
+    # have a name (and a class name), and until the action is created its
+    # menu item is shown enabled and uses the 'accelerator' and 'style'
+    # given here, so only defer actions that are enabled by default and
+    # give them the same accelerator and style as their class.
+    lazy = Bool(False)
+
+    # The accelerator shown in the menu item of a deferred action.
+    accelerator = Str
+
+    # The style of a deferred action.
+    style = Enum('push', 'radio', 'toggle')
+
     ###########################################################################
     # 'object' interface
     ###########################################################################
@@ -26,7 +41,7 @@ class Action(Location):
     def __str__(self):
         """ Return the 'informal' string representation of the object. """
 
-        return 'Action(%s)' % self.name
+        return 'Action(%s)' % (self.name or self.class_name)
 
     __repr__ = __str__
 
@@ -2,7 +2,7 @@
 
 
 # Enthought library imports.
-from traits.api import HasTraits, List
+from traits.api import Dict, HasTraits, List, on_trait_change
 
 # Local imports.
 from action_set import ActionSet
@@ -16,6 +16,18 @@ class ActionSetManager(HasTraits):
     # The action sets that this manager manages.
     action_sets = List(ActionSet)
 
+    #### Private interface ####################################################
+
+    # The items contributed by each action set, indexed by their (effective)
+    # root, e.g. {action_set : {root : {'actions' : [...], ...}}}. An action
+    # set is indexed the first time it is needed and dropped from the index
+    # whenever it (or the 'action_sets' list) changes.
+    _index = Dict
+
+    # The items for each (attribute_name, root) pair, merged (in action set
+    # order) from the index.
+    _items = Dict
+
     ###########################################################################
     # 'ActionSetManager' interface.
     ###########################################################################
@@ -23,41 +35,65 @@ class ActionSetManager(HasTraits):
     def get_actions(self, root):
         """ Return all action definitions for a root. """
 
-        return self._get_items(self.action_sets, 'actions', root)
+        return self._get_items('actions', root)
 
     def get_groups(self, root):
         """ Return all group definitions for a root. """
 
-        return self._get_items(self.action_sets, 'groups', root)
+        return self._get_items('groups', root)
 
     def get_menus(self, root):
         """ Return all menu definitions for a root. """
 
-        return self._get_items(self.action_sets, 'menus', root)
+        return self._get_items('menus', root)
 
     def get_tool_bars(self, root):
         """ Return all tool bar definitions for a root. """
 
-        return self._get_items(self.action_sets, 'tool_bars', root)
+        return self._get_items('tool_bars', root)
 
     ###########################################################################
     # 'Private' interface.
     ###########################################################################
 
-    def _get_items(self, action_sets, attribute_name, root):
+    def _get_items(self, attribute_name, root):
         """ Return all actions, groups or menus for a particular root.
 
         e.g. To get all of the groups::
 
-            self._get_items(action_sets, 'groups', root)
+            self._get_items('groups', root)
 
         """
 
-        items = []
-        for action_set in action_sets:
-            for item in getattr(action_set, attribute_name):
-                if self._get_root(item.path, action_set.aliases) == root:
-                    items.append(item)
+        key = (attribute_name, root)
+
+        items = self._items.get(key)
+        if items is None:
+            items = []
+            for action_set in self.action_sets:
+                items.extend(
+                    self._get_index(action_set).get(root, {}).get(
+                        attribute_name, []
+                    )
+                )
+
+            self._items[key] = items
+
+        # Callers are free to modify the list that they get back!
+        return items[:]
+
+    def _get_index(self, action_set):
+        """ Return the items of an action set indexed by their root. """
+
+        index = self._index.get(action_set)
+        if index is None:
+            index = self._index[action_set] = {}
+            for attribute_name in ['actions', 'groups', 'menus', 'tool_bars']:
+                for item in getattr(action_set, attribute_name):
+                    root = self._get_root(item.path, action_set.aliases)
+                    index.setdefault(root, {}).setdefault(
+                        attribute_name, []
+                    ).append(item)
 
                     # fixme: Hacky, but the model needs to maintain the
                     # action set that contributed the item.
@@ -69,7 +105,7 @@ class ActionSetManager(HasTraits):
                         for group in item.groups:
                             group._action_set_ = action_set
 
-        return items
+        return index
 
     def _get_root(self, path, aliases):
         """ Return the effective root for a path.
@@ -115,4 +151,36 @@ class ActionSetManager(HasTraits):
 
         return root
 
+    #### Trait change handlers ################################################
+
+    def _action_sets_changed(self, old, new):
+        """ Static trait change handler. """
+
+        self._index = {}
+        self._items = {}
+
+        return
+
+    def _action_sets_items_changed(self, event):
+        """ Static trait change handler. """
+
+        for action_set in event.removed:
+            self._index.pop(action_set, None)
+
+        self._items = {}
+
+        return
+
+    @on_trait_change(
+        'action_sets:[actions,groups,menus,tool_bars,aliases]'
+        ',action_sets:[actions_items,groups_items,menus_items,tool_bars_items]'
+    )
+    def _on_action_set_changed(self, action_set, trait_name, old, new):
+        """ Dynamic trait change handler. """
+
+        self._index.pop(action_set, None)
+        self._items = {}
+
+        return
+
 #### EOF ######################################################################
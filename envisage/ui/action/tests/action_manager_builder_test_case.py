@@ -3,6 +3,7 @@
 
 # Enthought library imports.
 from envisage.ui.action.api import Action, ActionSet, Group, Menu
+from envisage.ui.action.action_set_manager import ActionSetManager
 from traits.testing.unittest_tools import unittest
 
 # Local imports.
@@ -788,6 +789,154 @@ class ActionManagerBuilderTestCase(unittest.TestCase):
 
         return
 
+    def test_long_chain_of_actions_listed_in_reverse(self):
+        """ long chain of actions listed in reverse """
+
+        # Each action goes after the one listed *after* it, so every action
+        # has to wait for the next one to be placed.
+        actions = [
+            Action(
+                class_name = 'Action%d' % i,
+                path       = 'MenuBar/File',
+                after      = 'Action%d' % (i - 1) if i > 0 else ''
+            )
+
+            for i in range(100)
+        ]
+        actions.reverse()
+
+        action_sets = [ActionSet(actions=actions)]
+
+        # Create a builder containing the action set.
+        builder = DummyActionManagerBuilder(action_sets=action_sets)
+
+        # Create a menu bar manager for the 'MenuBar'.
+        menu_manager = builder.create_menu_bar_manager('MenuBar')
+
+        menu = menu_manager.find_item('File')
+        additions = menu.find_group('additions')
+
+        ids = [item.id for item in additions.items]
+        self.assertEqual(['Action%d' % i for i in range(100)], ids)
+
+        return
+
+    def test_action_set_manager_roots(self):
+        """ action set manager roots """
+
+        first = ActionSet(
+            aliases = {'Bar' : 'MenuBar'},
+            actions = [
+                Action(class_name='A', path='MenuBar/File'),
+                Action(class_name='B', path='ToolBar'),
+                Action(class_name='C', path='Bar/Edit')
+            ]
+        )
+
+        second = ActionSet(
+            actions = [Action(class_name='D', path='MenuBar')]
+        )
+
+        manager = ActionSetManager(action_sets=[first, second])
+
+        # Aliases are applied, and the items are in action set order.
+        actions = manager.get_actions('MenuBar')
+        self.assertEqual(['A', 'C', 'D'], [a.class_name for a in actions])
+        self.assertEqual(
+            [first, first, second], [a._action_set_ for a in actions]
+        )
+        self.assertEqual(['B'], [a.class_name for a in manager.get_actions(
+            'ToolBar'
+        )])
+        self.assertEqual([], manager.get_actions('Bar'))
+
+        # Changing the list that we get back doesn't change the manager.
+        del actions[:]
+        self.assertEqual(3, len(manager.get_actions('MenuBar')))
+
+        return
+
+    def test_action_set_manager_follows_changes(self):
+        """ action set manager follows changes """
+
+        first = ActionSet(actions=[Action(class_name='A', path='MenuBar')])
+        manager = ActionSetManager(action_sets=[first])
+
+        def names():
+            return [a.class_name for a in manager.get_actions('MenuBar')]
+
+        self.assertEqual(['A'], names())
+
+        # Add an action set.
+        second = ActionSet(actions=[Action(class_name='B', path='MenuBar')])
+        manager.action_sets.insert(0, second)
+        self.assertEqual(['B', 'A'], names())
+
+        # Add an action to an action set.
+        first.actions.append(Action(class_name='C', path='MenuBar'))
+        self.assertEqual(['B', 'A', 'C'], names())
+
+        # Change the aliases of an action set.
+        second.aliases = {'MenuBar' : 'ToolBar'}
+        self.assertEqual(['A', 'C'], names())
+
+        # Remove an action set.
+        manager.action_sets.remove(first)
+        self.assertEqual([], names())
+
+        # Replace all of the action sets.
+        manager.action_sets = [first, second]
+        self.assertEqual(['A', 'C'], names())
+
+        return
+
+    def test_unplaceable_items_are_reported(self):
+        """ unplaceable items are reported """
+
+        action_sets = [
+            ActionSet(
+                actions = [
+                    Action(
+                        class_name = 'Placed',
+                        path       = 'MenuBar/File'
+                    ),
+
+                    Action(
+                        class_name = 'Before',
+                        path       = 'MenuBar/File',
+                        before     = 'After'
+                    ),
+
+                    Action(
+                        class_name = 'After',
+                        path       = 'MenuBar/File',
+                        after      = 'Before'
+                    ),
+                ]
+            ),
+        ]
+
+        # Create a builder containing the action set.
+        builder = DummyActionManagerBuilder(action_sets=action_sets)
+
+        # Both of the actions that wait for each other are reported, along
+        # with what they were waiting for.
+        with self.assertRaises(ValueError) as context:
+            builder.create_menu_bar_manager('MenuBar')
+
+        message = str(context.exception)
+        self.assertNotIn('Placed', message)
+        self.assertIn(
+            'Action(Before) (no item <After> in group <additions> of '
+            'MenuBar/File)', message
+        )
+        self.assertIn(
+            'Action(After) (no item <Before> in group <additions> of '
+            'MenuBar/File)', message
+        )
+
+        return
+
 
 # Entry point for stand-alone testing.
 if __name__ == '__main__':
@@ -11,6 +11,7 @@
 from services import IPROJECT_MODEL, IPROJECT_UI
 
 # Commonly referred to classes within this plugin
+from chunked_project import ChunkedProject
 from factory_definition import FactoryDefinition
 from model_service import ModelService
 from project import Project
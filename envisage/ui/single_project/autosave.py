@@ -0,0 +1,454 @@
+#-----------------------------------------------------------------------------
+#
+#  Copyright (c) 2005-2007 by Enthought, Inc.
+#  All rights reserved.
+#
+#-----------------------------------------------------------------------------
+
+"""
+Saves snapshots of projects in the background.
+
+"""
+
+# Standard library imports.
+import logging
+import os
+import threading
+
+# Enthought library imports
+from envisage.file_utils import recover_file, write_atomically
+from traits.api import Any, Bool, HasTraits, Int
+from traits.has_traits import __newobj__
+
+
+# Setup a logger for this module.
+logger = logging.getLogger(__name__)
+
+
+# The format of the names of the journal segments that follow a snapshot.
+JOURNAL_FORMAT = '%s.journal.%06d'
+
+
+class AutoSaver(HasTraits):
+    """
+    Saves snapshots of projects in the background.
+
+    The auto-saver listens to the project that it last saved, and each
+    snapshot only pickles the traits of the project's state that have
+    changed since the one before (the pickles of the others are reused).
+    This is done on the GUI thread, as the objects in the project's state
+    are shared with the live project and may change at any time.  Putting
+    the pickled traits together into a full snapshot, and writing it
+    atomically, is left to a worker thread, so the GUI does not wait for
+    either while a large project is saved.
+
+    Only changes that the project notifies (i.e. changes to its traits, or
+    to the items of its list, dict and set traits) are seen.  Anything that
+    changes the objects held in a trait without the project knowing must
+    call *mark_changed* for that trait.  As each trait is pickled
+    separately, any object shared by two traits is restored as two copies,
+    so the auto-saver is only suitable for projects that don't share
+    objects between their traits.
+
+    If journalling is enabled then, after the first full snapshot, only the
+    traits that changed are written, as journal segments next to the
+    snapshot.  The journal is compacted into a full snapshot every so often,
+    and whenever the snapshot is restored.
+
+    """
+
+    ##########################################################################
+    # Attributes
+    ##########################################################################
+
+    #### public 'AutoSaver' interface ########################################
+
+    # Whether to write only the changed parts of a project as journal
+    # segments.
+    journal = Bool(False)
+
+    # The number of journal segments after which a full snapshot is written
+    # instead.
+    max_segments = Int(20)
+
+    #### protected 'AutoSaver' interface #####################################
+
+    # The snapshot waiting to be written, as a (filename, callable) tuple,
+    # or None.  The callable writes the snapshot to the file.
+    _pending = Any
+
+    # The worker thread (if it is running).
+    _worker = Any
+
+    # Protects the pending snapshot and worker.
+    _lock = Any
+
+    # The file that the last snapshot was written to, the pickled parts of
+    # the state that it contained, and the number of journal segments written
+    # since the last full snapshot.
+    _filename = Any
+    _parts = Any
+    _segments = Int(0)
+
+    # The project that we are listening to, the pickled parts of its state
+    # as of the last snapshot that we took, and the names of the traits that
+    # have changed since (None if every trait must be pickled again).  These
+    # are only used on the GUI thread.
+    _project = Any
+    _pickled = Any
+    _changed = Any
+
+
+    ##########################################################################
+    # 'AutoSaver' interface.
+    ##########################################################################
+
+    #### public interface ####################################################
+
+    def clean(self, filename):
+        """
+        Remove the snapshot in the specified file and any journal segments
+        that follow it.
+
+        Any snapshot that is waiting to be written is discarded.
+
+        """
+
+        with self._lock:
+            self._pending = None
+
+        self.wait()
+        self._track(None)
+
+        for path in [filename] + self._get_segments(filename):
+            if os.path.isfile(path):
+                os.remove(path)
+
+        if filename == self._filename:
+            self._filename = None
+
+        return
+
+
+    def compact(self, filename, pickle_package):
+        """
+        Apply any journal segments that follow the snapshot in the specified
+        file, so that it can be loaded like any other project.
+
+        """
+
+        self.wait()
+
+        recover_file(filename)
+        segments = self._get_segments(filename)
+        if len(segments) > 0:
+            with open(filename, 'rb') as f:
+                project = pickle_package.load(f)
+
+            for segment in segments:
+                with open(segment, 'rb') as f:
+                    parts = pickle_package.load(f)
+
+                state = {}
+                for name, data in parts.items():
+                    state[name] = pickle_package.loads(data)
+                project.__setstate__(state)
+
+            self._write(filename, pickle_package.dumps(project, 1))
+            for segment in segments:
+                os.remove(segment)
+
+        if filename == self._filename:
+            self._filename = None
+
+        return
+
+
+    def mark_changed(self, project, *names):
+        """
+        Mark traits of a project's state as changed, so that they are
+        pickled again in the next snapshot.
+
+        If no names are given then every trait is pickled again.
+
+        """
+
+        if project is self._project and self._changed is not None:
+            if len(names) > 0:
+                self._changed.update(names)
+            else:
+                self._changed = None
+
+        return
+
+
+    def save(self, project, location):
+        """
+        Take a snapshot of a project and write it to the file for the
+        specified location in the background.
+
+        If a snapshot is still waiting to be written, it is replaced by this
+        one.
+
+        """
+
+        filename = project.get_pickle_filename(location)
+
+        # Allow the project to prepare for being saved (this is done on this
+        # thread, as it would be for a normal save).
+        project._save_hook(location)
+
+        # Pickle the parts of the snapshot that have changed now, while
+        # nothing else can change them.
+        if project is not self._project:
+            self._track(project)
+
+        state = project.__getstate__()
+        pickle_package = project.get_pickle_package()
+        parts = {}
+        for name, value in state.items():
+            data = self._pickled.get(name)
+            if data is None or self._changed is None or name in self._changed:
+                data = pickle_package.dumps(value, 1)
+
+            parts[name] = data
+
+        self._pickled = parts
+        self._changed = set()
+
+        klass = type(project)
+        self.submit(filename, lambda: self._write_snapshot(filename, klass,
+            parts, pickle_package))
+
+        return
+
+
+    def submit(self, location, write):
+        """
+        Call a function that writes a snapshot of a project to the specified
+        location, in the background.
+
+        This is for projects that save themselves in their own way.  The
+        function is called on the worker thread, so it must not use the live
+        project.  If a snapshot is still waiting to be written, it is
+        replaced by this one.
+
+        """
+
+        with self._lock:
+            self._pending = (location, write)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run,
+                    name='AutoSaver')
+                self._worker.setDaemon(True)
+                self._worker.start()
+
+        return
+
+
+    def wait(self, timeout=None):
+        """
+        Wait until any snapshots have been written.
+
+        """
+
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+
+        return
+
+
+    #### protected interface #################################################
+
+    def _get_segments(self, filename):
+        """
+        Return the journal segments that follow a snapshot, in order.
+
+        """
+
+        path, name = os.path.split(filename)
+        if not os.path.isdir(path or os.curdir):
+            return []
+
+        prefix = name + '.journal.'
+        segments = [os.path.join(path, entry) for entry in
+            os.listdir(path or os.curdir) if entry.startswith(prefix)
+            and entry[len(prefix):].isdigit()]
+        segments.sort()
+
+        return segments
+
+
+    def _run(self):
+        """
+        Write snapshots until there are none waiting.  Called on the worker
+        thread.
+
+        """
+
+        while True:
+            with self._lock:
+                pending, self._pending = self._pending, None
+                if pending is None:
+                    self._worker = None
+                    break
+
+            location, write = pending
+            try:
+                write()
+
+            except:
+                logger.exception('Error auto-saving project to [%s]',
+                    location)
+
+        return
+
+
+    def _write(self, filename, data):
+        """
+        Write a file so that it either has the new contents or is unchanged.
+
+        """
+
+        path = os.path.dirname(filename)
+        if len(path) > 0 and not os.path.isdir(path):
+            os.makedirs(path)
+
+        write_atomically(filename, data)
+
+        return
+
+
+    def _track(self, project):
+        """
+        Start listening for changes to a project (or, if it is None, stop).
+
+        """
+
+        if self._project is not None:
+            self._project.on_trait_change(self._on_project_changed,
+                remove=True)
+
+        if project is not None:
+            project.on_trait_change(self._on_project_changed)
+
+        self._project = project
+        self._pickled = {}
+        self._changed = None
+
+        return
+
+
+    def _write_snapshot(self, filename, klass, parts, pickle_package):
+        """
+        Write a snapshot of a project (or the changes since the last one).
+
+        """
+
+        # If we are journalling, and the last snapshot was written to the same
+        # file, just write the parts that have changed.
+        if self.journal and filename == self._filename \
+            and self._segments < self.max_segments \
+            and os.path.isfile(filename):
+            changed = {}
+            for name, data in parts.items():
+                if self._parts.get(name) != data:
+                    changed[name] = data
+
+            # Traits that are no longer in the state can't be journalled.
+            for name in self._parts:
+                if name not in parts:
+                    changed = None
+                    break
+
+            if changed is None:
+                self._write_full_snapshot(filename, klass, parts,
+                    pickle_package)
+
+            elif len(changed) > 0:
+                self._segments += 1
+                self._write(JOURNAL_FORMAT % (filename, self._segments),
+                    pickle_package.dumps(changed, 1))
+
+        else:
+            self._write_full_snapshot(filename, klass, parts, pickle_package)
+
+        self._filename = filename
+        self._parts = parts
+
+        logger.debug('Auto-saved project to [%s]', filename)
+
+        return
+
+
+    def _write_full_snapshot(self, filename, klass, parts, pickle_package):
+        """
+        Write a full snapshot of a project, which makes any journal segments
+        that follow the last one obsolete.
+
+        """
+
+        # The state is unpickled from the parts, so it is not shared with the
+        # live project.
+        state = {}
+        for name, part in parts.items():
+            state[name] = pickle_package.loads(part)
+
+        self._write(filename, pickle_package.dumps(_Snapshot(klass, state), 1))
+
+        for segment in self._get_segments(filename):
+            os.remove(segment)
+
+        self._segments = 0
+
+        return
+
+
+    #### trait change handlers ###############################################
+
+    def _on_project_changed(self, project, trait_name, old, new):
+        """
+        Called whenever a trait of the project that we are listening to
+        changes.
+
+        """
+
+        if self._changed is not None:
+            self._changed.add(trait_name)
+
+            # Changes to the items of a list (etc) are reported as changes to
+            # a trait named 'xxx_items'.
+            if trait_name.endswith('_items'):
+                self._changed.add(trait_name[:-len('_items')])
+
+        return
+
+
+    #### trait initializers ##################################################
+
+    def __lock_default(self):
+        """
+        Generates the default value for our lock.
+
+        """
+
+        return threading.Lock()
+
+
+class _Snapshot(object):
+    """
+    Pickles exactly as the project that the state was taken from would.
+
+    """
+
+    def __init__(self, klass, state):
+        self.klass = klass
+        self.state = state
+
+
+    def __reduce_ex__(self, protocol):
+        return (__newobj__, (self.klass,), self.state)
+
+
+#### EOF #####################################################################
@@ -0,0 +1,767 @@
+#-----------------------------------------------------------------------------
+#
+#  Copyright (c) 2005-2007 by Enthought, Inc.
+#  All rights reserved.
+#
+#-----------------------------------------------------------------------------
+
+"""
+A project that is saved as a manifest plus a separate file for each of its
+resources, so that the resources can be loaded lazily.
+
+"""
+
+# Standard library imports.
+import hashlib
+import json
+import logging
+import os
+import zipfile
+from io import BytesIO
+
+# Enthought library imports
+from envisage.file_utils import recover_file, replace_file, \
+     write_atomically_with
+from traits.api import Any, Dict, Int, List, Property, Str
+
+# Local imports.
+from project import Project
+
+# Numpy is optional; without it, arrays are simply pickled like any other
+# resource.
+try:
+    import numpy
+
+except ImportError:
+    numpy = None
+
+
+# Setup a logger for this module.
+logger = logging.getLogger(__name__)
+
+
+# The names of the manifest and of the (pickled) project within a container.
+MANIFEST_NAME = 'manifest.json'
+PROJECT_NAME = 'project'
+
+# The directory within a container that the resources are stored in.
+RESOURCE_DIRECTORY = 'resources'
+
+# The current version of the manifest.
+MANIFEST_VERSION = 1
+
+
+class ChunkedProject(Project):
+    """
+    A project that is saved as a manifest plus a separate file for each of
+    its resources.
+
+    The project itself is pickled as usual, but only contains whatever is not
+    a resource, so it is small and quick to load (and upgrade).  Each
+    resource is only read when it is first asked for, so opening a large
+    project doesn't have to wait for all of its data.
+
+    Resources that are numpy arrays (of anything but objects) are saved in
+    the '.npy' format and, when the project is a directory, are loaded as
+    copy-on-write memory maps.  Any other resource is pickled.
+
+    Projects are saved as directories or, if PROJECTS_ARE_FILES is True, as
+    zip files (which can't be memory mapped, so arrays are read in full when
+    they are loaded).
+
+    Auto-saving only writes the resources that have been set since the
+    project was loaded or saved (and that have changed since the last
+    auto-saved copy), and it writes them in the background.  The manifest
+    of an auto-saved copy refers to the others in the container that the
+    project was loaded from, so restoring the copy needs that container, as
+    it would be anyway.
+
+    """
+
+    ##########################################################################
+    # CLASS Attributes
+    ##########################################################################
+
+    #### public 'Project' class interface ####################################
+
+    # Indicates whether instances of this project class are stored as (zip)
+    # files or directories.
+    PROJECTS_ARE_FILES = False
+
+
+    ##########################################################################
+    # Attributes
+    ##########################################################################
+
+    #### public 'ChunkedProject' interface ###################################
+
+    # The names of this project's resources (in the order that they were
+    # added).
+    resource_names = Property(List(Str), depends_on='_resource_names[]')
+
+
+    #### protected 'ChunkedProject' interface ################################
+
+    # The names of this project's resources.
+    _resource_names = List(Str, transient=True)
+
+    # The resources that have been loaded (or set) so far, by name.
+    _resources = Dict(transient=True)
+
+    # The manifest entries of the resources in the container that this
+    # project was loaded from (or last saved to), by name.
+    _entries = Dict(transient=True)
+
+    # The container that this project was loaded from (or last saved to).
+    _container = Any(transient=True)
+
+    # The other containers that resources are read from (i.e. those that an
+    # auto-saved copy refers to), by location.
+    _containers = Dict(transient=True)
+
+    # The location that this project was last saved to, and the manifest
+    # entries that were saved, as a tuple (or None).
+    _saved = Any(transient=True)
+
+    # The resources that have been set since this project was loaded or last
+    # saved, mapped to the number of the change that last set them.
+    _changed = Dict(transient=True)
+
+    # The number of changes made to this project's resources.
+    _changes = Int(transient=True)
+
+    # The location of the last auto-saved copy of this project, and the
+    # manifest entries of the changed resources that were written to it
+    # (mapped to the number of the change that set them), as a tuple (or
+    # None).
+    _autosaved = Any(transient=True)
+
+
+    ##########################################################################
+    # 'ChunkedProject' interface.
+    ##########################################################################
+
+    #### public interface ####################################################
+
+    def get_resource(self, name):
+        """
+        Return the resource with the specified name, loading it if necessary.
+
+        A *KeyError* is raised if there is no such resource.
+
+        """
+
+        if name not in self._resources:
+            entry = self._entries.get(name)
+            if entry is None:
+                raise KeyError(name)
+
+            logger.debug('Loading resource [%s] of Project [%s]', name, self)
+            self._resources[name] = self._read_resource(entry)
+
+        return self._resources[name]
+
+
+    def is_resource_loaded(self, name):
+        """
+        Return True if the resource with the specified name has been loaded.
+
+        """
+
+        return name in self._resources
+
+
+    def remove_resource(self, name):
+        """
+        Remove the resource with the specified name.
+
+        A *KeyError* is raised if there is no such resource.
+
+        """
+
+        self.remove_resources([name])
+
+        return
+
+
+    def remove_resources(self, names):
+        """
+        Remove the resources with the specified names.
+
+        This is much quicker than removing the resources one at a time.  A
+        *KeyError* is raised (and nothing is removed) if there is no resource
+        with one of the names.
+
+        """
+
+        names = set(names)
+        for name in names:
+            if name not in self._resources and name not in self._entries:
+                raise KeyError(name)
+
+        self._resource_names = [name for name in self._resource_names
+            if name not in names]
+        for name in names:
+            self._resources.pop(name, None)
+            self._entries.pop(name, None)
+            self._changed.pop(name, None)
+
+        self.dirty = True
+
+        return
+
+
+    def set_resource(self, name, value):
+        """
+        Set the resource with the specified name, adding it if necessary.
+
+        """
+
+        if name not in self._resources and name not in self._entries:
+            self._resource_names.append(name)
+
+        self._resources[name] = value
+        self._changes += 1
+        self._changed[name] = self._changes
+        self.dirty = True
+
+        return
+
+
+    #### protected interface #################################################
+
+    def _get_resource_names(self):
+        """
+        Returns the names of this project's resources.
+
+        """
+
+        return list(self._resource_names)
+
+
+    def _get_container(self, entry):
+        """
+        Return the container that a resource is in.
+
+        """
+
+        # Auto-saved copies refer to the resources that were not loaded in
+        # the container that they were loaded from.
+        location = entry.get('location')
+        if location is None:
+            container = self._container
+        else:
+            container = self._containers.get(location)
+            if container is None:
+                container = self._open_container(location)
+                self._containers[location] = container
+
+        return container
+
+
+    def _close_containers(self, location=None):
+        """
+        Stop reading from the containers at the specified location (e.g. as
+        it is about to be replaced), or from all of them if no location is
+        given.
+
+        The containers are opened again if they are read from again.
+
+        """
+
+        containers = [self._container] + self._containers.values()
+        for container in containers:
+            if container is not None and \
+                (location is None or container.is_at(location)):
+                container.close()
+
+        return
+
+
+    def _read_resource(self, entry):
+        """
+        Read a resource from our container.
+
+        """
+
+        if entry['kind'] == 'array':
+            if numpy is None:
+                raise ImportError('numpy is required to load resource [%s]' %
+                    entry['name'])
+
+            container = self._get_container(entry)
+            path = container.get_path(entry['file'])
+            if path is not None:
+                recover_file(path)
+                result = numpy.load(path, mmap_mode='c')
+            else:
+                result = numpy.load(BytesIO(container.read(entry['file'])))
+
+        else:
+            pickle_package = self.get_pickle_package()
+            result = pickle_package.loads(self._get_container(entry).read(
+                entry['file']))
+
+        return result
+
+
+    def _write_resource(self, writer, name, value):
+        """
+        Write a resource, returning its manifest entry.
+
+        """
+
+        if isinstance(name, unicode):
+            key = name.encode('utf-8')
+        else:
+            key = name
+        base = '%s/%s' % (RESOURCE_DIRECTORY, hashlib.sha1(key).hexdigest())
+
+        if numpy is not None and isinstance(value, numpy.ndarray) \
+            and not value.dtype.hasobject:
+            entry = dict(name=name, kind='array', file=base + '.npy')
+            writer.write_with(entry['file'],
+                lambda f: numpy.save(f, value))
+
+        else:
+            pickle_package = self.get_pickle_package()
+            entry = dict(name=name, kind='pickle', file=base + '.pickle')
+            writer.write_with(entry['file'],
+                lambda f: pickle_package.dump(value, f, 1))
+
+        return entry
+
+
+    def _write_container(self, location):
+        """
+        Write this project to a container, returning the manifest entries of
+        the resources that were saved.
+
+        Resources that have not been loaded are copied.
+
+        """
+
+        # Allow derived classes to customize behavior before saving.
+        self._save_hook(location)
+
+        container = self._open_container(location)
+        writer = container.create_writer()
+        try:
+            entries = []
+            for name in self._resource_names:
+                if name in self._resources:
+                    entry = self._write_resource(writer, name,
+                        self._resources[name])
+
+                else:
+                    entry = dict(self._entries[name])
+                    writer.copy(entry['file'], self._get_container(entry))
+                    entry.pop('location', None)
+
+                entries.append(entry)
+
+            pickle_package = self.get_pickle_package()
+            writer.write(PROJECT_NAME, pickle_package.dumps(self, 1))
+
+            # The manifest is written last, as it is what makes the other
+            # files part of the project.
+            manifest = dict(version=MANIFEST_VERSION, resources=entries)
+            writer.write(MANIFEST_NAME, json.dumps(manifest, indent=1))
+            self._close_containers(location)
+            writer.close()
+
+        except:
+            writer.abort()
+            raise
+
+        return entries
+
+
+    ##########################################################################
+    # 'Project' interface.
+    ##########################################################################
+
+    #### protected interface #################################################
+
+    def _autosave(self, location):
+        """
+        Save a copy of this project to the specified auto-save location.
+
+        Overridden to write only the resources that have changed (see
+        *_prepare_autosave*).
+
+        """
+
+        self._prepare_autosave(location)()
+
+        return
+
+
+    def _load(cls, location):
+        """
+        Load a project from the specified location.
+
+        Overridden to read the manifest and the pickled project, but none of
+        the resources.
+
+        """
+
+        logger.debug('Loading Project of class [%s] from [%s]', cls, location)
+
+        container = cls._open_container(location)
+        manifest = json.loads(container.read(MANIFEST_NAME))
+        if manifest.get('version', 0) > MANIFEST_VERSION:
+            raise ValueError('Project [%s] was saved by a newer version '
+                '(%s) of this application' % (location, manifest['version']))
+
+        pickle_package = cls.get_pickle_package()
+        project = pickle_package.loads(container.read(PROJECT_NAME))
+
+        entries = {}
+        for entry in manifest['resources']:
+            entries[entry['name']] = entry
+
+        project._container = container
+        project._entries = entries
+        project._resource_names = [entry['name'] for entry in
+            manifest['resources']]
+
+        # Allow derived classes to customize behavior after unpickling
+        # is complete.
+        project._load_hook(location)
+
+        logger.debug('Loaded Project [%s] from location [%s]', project,
+            location)
+
+        return project
+    _load = classmethod(_load)
+
+
+    def _prepare_autosave(self, location):
+        """
+        Prepare to save a copy of this project to the specified auto-save
+        location in the background.
+
+        Overridden to serialize the resources that have changed now, and to
+        return a callable that writes them, the project and the manifest.
+        Any other resource is referred to where it is: in the container that
+        this project was loaded from, or (if it has not changed since) in
+        the last auto-saved copy.
+
+        """
+
+        logger.debug('Auto-saving Project [%s] to [%s]', self, location)
+
+        # Allow derived classes to customize behavior before saving.
+        self._save_hook(location)
+
+        if self._autosaved is not None and self._autosaved[0] == location \
+            and os.path.exists(location):
+            autosaved = self._autosaved[1]
+        else:
+            autosaved = {}
+
+        writer = _MemoryWriter()
+        entries = []
+        written = {}
+        for name in self._resource_names:
+            change = self._changed.get(name)
+            if change is not None:
+                if name in autosaved and autosaved[name][0] == change:
+                    entry = autosaved[name][1]
+
+                else:
+                    entry = self._write_resource(writer, name,
+                        self._resources[name])
+
+                written[name] = (change, entry)
+
+            else:
+                entry = dict(self._entries[name])
+                if not self._container.is_at(location):
+                    entry.setdefault('location',
+                        os.path.abspath(self._container.location))
+
+            entries.append(entry)
+
+        pickle_package = self.get_pickle_package()
+        files = writer.files
+        project = pickle_package.dumps(self, 1)
+        manifest = json.dumps(dict(version=MANIFEST_VERSION,
+            resources=entries), indent=1)
+
+        def write():
+            container = self._open_container(location)
+            writer = container.create_writer()
+            try:
+                for entry in entries:
+                    data = files.get(entry['file'])
+                    if data is not None:
+                        writer.write(entry['file'], data)
+
+                    elif 'location' not in entry:
+                        writer.copy(entry['file'], container)
+
+                writer.write(PROJECT_NAME, project)
+                writer.write(MANIFEST_NAME, manifest)
+                container.close()
+                writer.close()
+
+            except:
+                writer.abort()
+                raise
+
+            # Only reuse the resources in the copy once it has been written.
+            self._autosaved = (location, written)
+
+            logger.debug('Auto-saved Project to [%s]', location)
+
+        return write
+
+
+    def _open_container(cls, location):
+        """
+        Return the container for a project at the specified location.
+
+        """
+
+        if cls.PROJECTS_ARE_FILES:
+            container = _ZipContainer(location)
+        else:
+            container = _DirectoryContainer(location)
+
+        return container
+    _open_container = classmethod(_open_container)
+
+
+    def _save(self, location):
+        """
+        Save this project to the specified location.
+
+        Overridden to write each resource to its own file.  Resources that
+        have not been loaded are copied (or, if we are saving over the
+        container that they are in, left alone).
+
+        """
+
+        logger.debug('Saving Project [%s] to [%s]', self, location)
+
+        entries = self._write_container(location)
+
+        # Every resource that has been set is now in the saved container.
+        self._changed = {}
+        self._autosaved = None
+
+        # Resources that we haven't loaded now live in the container that we
+        # just saved to.  If this was a 'save as' that happens once our
+        # location changes (i.e. once the save has succeeded).
+        saved_entries = dict((entry['name'], entry) for entry in entries)
+        if self._container is not None and self._container.is_at(location):
+            self._close_containers()
+            self._containers = {}
+            self._entries = saved_entries
+        else:
+            self._saved = (location, saved_entries)
+
+        logger.debug('Saved Project [%s] to [%s]', self, location)
+
+        return
+
+
+    #### trait handlers ######################################################
+
+    def _location_changed(self, old, new):
+        """
+        Called whenever the project's location changes.
+
+        """
+
+        super(ChunkedProject, self)._location_changed(old, new)
+
+        if self._saved is not None and self._saved[0] == new:
+            self._close_containers()
+            self._containers = {}
+            self._container = self._open_container(new)
+            self._entries = self._saved[1]
+            self._saved = None
+
+        return
+
+
+class _DirectoryContainer(object):
+    """
+    A project that is saved as a directory.
+
+    """
+
+    def __init__(self, location):
+        self.location = location
+
+
+    def close(self):
+        pass
+
+
+    def create_writer(self):
+        return _DirectoryWriter(self)
+
+
+    def get_path(self, name):
+        return os.path.join(self.location, *name.split('/'))
+
+
+    def is_at(self, location):
+        return os.path.abspath(location) == os.path.abspath(self.location)
+
+
+    def read(self, name):
+        filename = self.get_path(name)
+        recover_file(filename)
+        with open(filename, 'rb') as f:
+            return f.read()
+
+
+class _ZipContainer(_DirectoryContainer):
+    """
+    A project that is saved as a zip file.
+
+    The zip file is kept open once it has been read from, so that its
+    directory is only read once.
+
+    """
+
+    def __init__(self, location):
+        super(_ZipContainer, self).__init__(location)
+        self.zip_file = None
+
+
+    def close(self):
+        if self.zip_file is not None:
+            self.zip_file.close()
+            self.zip_file = None
+
+
+    def create_writer(self):
+        return _ZipWriter(self)
+
+
+    def get_path(self, name):
+        return None
+
+
+    def read(self, name):
+        if self.zip_file is None:
+            recover_file(self.location)
+            self.zip_file = zipfile.ZipFile(self.location)
+
+        return self.zip_file.read(name)
+
+
+class _MemoryWriter(object):
+    """
+    Keeps the files that are written, by name.
+
+    """
+
+    def __init__(self):
+        self.files = {}
+
+
+    def write_with(self, name, function):
+        f = BytesIO()
+        function(f)
+        self.files[name] = f.getvalue()
+
+
+class _DirectoryWriter(object):
+    """
+    Writes the files in a directory, each of which is replaced atomically.
+
+    Closing the writer removes any resources that were not written.
+
+    """
+
+    def __init__(self, container):
+        self.container = container
+        self.written = set()
+
+
+    def abort(self):
+        pass
+
+
+    def close(self):
+        path = self.container.get_path(RESOURCE_DIRECTORY)
+        if os.path.isdir(path):
+            for filename in os.listdir(path):
+                name = '%s/%s' % (RESOURCE_DIRECTORY, filename)
+                if name not in self.written:
+                    os.remove(os.path.join(path, filename))
+
+
+    def copy(self, name, container):
+        if not container.is_at(self.container.location):
+            self.write(name, container.read(name))
+
+        self.written.add(name)
+
+
+    def write(self, name, data):
+        self.write_with(name, lambda f: f.write(data))
+
+
+    def write_with(self, name, function):
+        filename = self.container.get_path(name)
+        path = os.path.dirname(filename)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        write_atomically_with(filename, function)
+        self.written.add(name)
+
+
+class _ZipWriter(object):
+    """
+    Writes a new zip file that replaces the old one when it is closed.
+
+    """
+
+    def __init__(self, container):
+        self.container = container
+        self.temp_filename = container.location + '.tmp'
+        self.zip_file = zipfile.ZipFile(self.temp_filename, 'w',
+            zipfile.ZIP_DEFLATED)
+
+
+    def abort(self):
+        self.zip_file.close()
+        if os.path.exists(self.temp_filename):
+            os.remove(self.temp_filename)
+
+
+    def close(self):
+        self.zip_file.close()
+
+        try:
+            replace_file(self.temp_filename, self.container.location)
+
+        finally:
+            if os.path.exists(self.temp_filename):
+                os.remove(self.temp_filename)
+
+
+    def copy(self, name, container):
+        self.write(name, container.read(name))
+
+
+    def write(self, name, data):
+        self.zip_file.writestr(name, data)
+
+
+    def write_with(self, name, function):
+        f = BytesIO()
+        function(f)
+        self.write(name, f.getvalue())
+
+
+#### EOF #####################################################################
@@ -104,7 +104,7 @@ class ModelService(HasTraits):
         logger.debug('Trying to clean location [%s]', location)
 
         if os.path.isfile(location):
-            os.path.remove(location)
+            os.remove(location)
         else:
             shutil.rmtree(location)
 
@@ -469,6 +469,42 @@ class Project(HasTraits):
 
     #### protected interface #################################################
 
+    def _autosave(self, location):
+        """
+        Save a copy of this project to the specified auto-save location.
+
+        Unlike *save*, this leaves the project's location and dirty flag
+        alone.  By default the copy is saved like any other, so derived
+        classes that override *_save* may want to override this to save the
+        copy more cheaply.
+
+        """
+
+        if not self.PROJECTS_ARE_FILES and not os.path.isdir(location):
+            os.makedirs(location)
+
+        self._save(location)
+
+        return
+
+
+    def _prepare_autosave(self, location):
+        """
+        Prepare to save a copy of this project to the specified auto-save
+        location in the background.
+
+        Returns a callable that finishes saving the copy without using this
+        project (so that it can be called on another thread), or None if the
+        copy has already been saved.  By default the copy is saved by
+        *_autosave* and None is returned.
+
+        """
+
+        self._autosave(location)
+
+        return None
+
+
     def _close_all_editors(self):
         """
         Called to close all editors associated with this project.
@@ -0,0 +1,240 @@
+""" Tests for saving snapshots of projects in the background. """
+
+
+# Standard library imports.
+import cPickle
+import os
+import shutil
+import tempfile
+import threading
+
+# Enthought library imports.
+from envisage.ui.single_project.autosave import AutoSaver
+from traits.api import HasTraits, List, Str
+from traits.testing.unittest_tools import unittest
+
+
+class Counted(object):
+    """ An object that counts how many times it is pickled on the main
+    thread. """
+
+    pickled = 0
+
+    def __getstate__(self):
+        if threading.current_thread().name == 'MainThread':
+            Counted.pickled += 1
+
+        return self.__dict__
+
+
+class DummyProject(HasTraits):
+    """ A project with just enough of the 'Project' interface to autosave. """
+
+    name = Str
+
+    items = List
+
+    def get_pickle_filename(self, location):
+        return os.path.join(location, 'project')
+
+    def get_pickle_package(self):
+        return cPickle
+
+    def _save_hook(self, location):
+        pass
+
+
+class AutoSaverTestCase(unittest.TestCase):
+    """ Tests for saving snapshots of projects in the background. """
+
+    ###########################################################################
+    # 'TestCase' interface.
+    ###########################################################################
+
+    def setUp(self):
+        """ Prepares the test fixture before each test method is called. """
+
+        self.location = tempfile.mkdtemp()
+        self.filename = os.path.join(self.location, 'project')
+
+        return
+
+    def tearDown(self):
+        """ Called immediately after each test method has been called. """
+
+        shutil.rmtree(self.location)
+
+        return
+
+    ###########################################################################
+    # Tests.
+    ###########################################################################
+
+    def test_full_snapshot(self):
+        """ full snapshot """
+
+        autosaver = AutoSaver()
+        project = DummyProject(name='a', items=[1, 2])
+        autosaver.save(project, self.location)
+
+        # Changes made after the snapshot was taken are not included in it.
+        project.items.append(3)
+        autosaver.wait()
+
+        restored = self._load()
+        self.assertIsInstance(restored, DummyProject)
+        self.assertEqual('a', restored.name)
+        self.assertEqual([1, 2], restored.items)
+
+        return
+
+    def test_only_changed_traits_are_pickled(self):
+        """ only changed traits are pickled """
+
+        autosaver = AutoSaver()
+        project = DummyProject(name='a', items=[Counted()])
+        Counted.pickled = 0
+        self._save(autosaver, project)
+        self.assertEqual(1, Counted.pickled)
+
+        # The pickled items are reused if they haven't changed...
+        project.name = 'b'
+        self._save(autosaver, project)
+        self.assertEqual(1, Counted.pickled)
+        self.assertEqual('b', self._load().name)
+
+        # ... and pickled again if they have.
+        project.items.append(1)
+        self._save(autosaver, project)
+        self.assertEqual(2, Counted.pickled)
+        self.assertEqual(2, len(self._load().items))
+
+        # Changes that the project doesn't know about have to be marked.
+        project.items[0].x = 1
+        autosaver.mark_changed(project, 'items')
+        self._save(autosaver, project)
+        self.assertEqual(3, Counted.pickled)
+        self.assertEqual(1, self._load().items[0].x)
+
+        # A different project is pickled in full.
+        other = DummyProject(name='c', items=[Counted()])
+        self._save(autosaver, other)
+        self.assertEqual(4, Counted.pickled)
+        self.assertEqual('c', self._load().name)
+
+        return
+
+    def test_journal_segments(self):
+        """ journal segments """
+
+        autosaver = AutoSaver(journal=True)
+        project = DummyProject(name='a', items=[1, 2])
+        self._save(autosaver, project)
+        self.assertEqual([], self._get_segments())
+
+        # Only the changed parts are written.
+        project.name = 'b'
+        self._save(autosaver, project)
+        self.assertEqual(['project.journal.000001'], self._get_segments())
+        with open(self.filename + '.journal.000001', 'rb') as f:
+            self.assertEqual(['name'], cPickle.load(f).keys())
+
+        # Nothing is written if nothing has changed.
+        self._save(autosaver, project)
+        self.assertEqual(['project.journal.000001'], self._get_segments())
+
+        # Compacting applies the journal to the snapshot.
+        project.items.append(3)
+        self._save(autosaver, project)
+        autosaver.compact(self.filename, cPickle)
+        self.assertEqual([], self._get_segments())
+
+        restored = self._load()
+        self.assertEqual('b', restored.name)
+        self.assertEqual([1, 2, 3], restored.items)
+
+        return
+
+    def test_max_segments(self):
+        """ max segments """
+
+        autosaver = AutoSaver(journal=True, max_segments=2)
+        project = DummyProject(name='0')
+        self._save(autosaver, project)
+
+        for i in range(1, 3):
+            project.name = str(i)
+            self._save(autosaver, project)
+            self.assertEqual(i, len(self._get_segments()))
+
+        # Once there are 'max_segments' segments a full snapshot is written
+        # instead.
+        project.name = '3'
+        self._save(autosaver, project)
+        self.assertEqual([], self._get_segments())
+        self.assertEqual('3', self._load().name)
+
+        return
+
+    def test_clean(self):
+        """ clean """
+
+        autosaver = AutoSaver(journal=True)
+        project = DummyProject(name='a')
+        self._save(autosaver, project)
+        project.name = 'b'
+        self._save(autosaver, project)
+
+        autosaver.clean(self.filename)
+        self.assertEqual([], os.listdir(self.location))
+
+        # The next snapshot is a full one.
+        self._save(autosaver, project)
+        self.assertEqual(['project'], os.listdir(self.location))
+
+        return
+
+    def test_submit(self):
+        """ submit """
+
+        autosaver = AutoSaver()
+        threads = []
+        def write():
+            threads.append(threading.current_thread().name)
+            raise ValueError('failed')
+
+        # Errors are logged, and the worker carries on with the next copy.
+        autosaver.submit(self.location, write)
+        autosaver.wait()
+        autosaver.submit(self.location, write)
+        autosaver.wait()
+
+        self.assertEqual(['AutoSaver', 'AutoSaver'], threads)
+
+        return
+
+    ###########################################################################
+    # Private interface.
+    ###########################################################################
+
+    def _get_segments(self):
+        """ Return the names of the journal segments. """
+
+        return sorted(name for name in os.listdir(self.location)
+                      if '.journal.' in name)
+
+    def _load(self):
+        """ Load the snapshot. """
+
+        with open(self.filename, 'rb') as f:
+            return cPickle.load(f)
+
+    def _save(self, autosaver, project):
+        """ Save a snapshot and wait for it to be written. """
+
+        autosaver.save(project, self.location)
+        autosaver.wait()
+
+        return
+
+#### EOF ######################################################################
@@ -0,0 +1,305 @@
+""" Tests for projects that save each resource separately. """
+
+
+# Standard library imports.
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+
+# Enthought library imports.
+from envisage.ui.single_project.chunked_project import ChunkedProject, \
+     MANIFEST_NAME, RESOURCE_DIRECTORY, numpy
+from traits.testing.unittest_tools import unittest
+
+
+class ZipChunkedProject(ChunkedProject):
+    """ A chunked project that is saved as a zip file. """
+
+    PROJECTS_ARE_FILES = True
+
+
+class ChunkedProjectTestCase(unittest.TestCase):
+    """ Tests for projects that save each resource separately. """
+
+    ###########################################################################
+    # 'TestCase' interface.
+    ###########################################################################
+
+    def setUp(self):
+        """ Prepares the test fixture before each test method is called. """
+
+        self.tmpdir = tempfile.mkdtemp()
+
+        return
+
+    def tearDown(self):
+        """ Called immediately after each test method has been called. """
+
+        shutil.rmtree(self.tmpdir)
+
+        return
+
+    ###########################################################################
+    # Tests.
+    ###########################################################################
+
+    def test_directory(self):
+        """ directory """
+
+        location = os.path.join(self.tmpdir, 'project')
+        self._create_project(ChunkedProject).save(location)
+
+        self.assertEqual(2, len(self._get_resource_files(location)))
+
+        project = ChunkedProject.load(location, None)
+        self.assertEqual(['a', 'b'], project.resource_names)
+        self.assertFalse(project.is_resource_loaded('a'))
+        self.assertEqual({'x' : 1}, project.get_resource('a'))
+        self.assertTrue(project.is_resource_loaded('a'))
+        self.assertFalse(project.is_resource_loaded('b'))
+        self.assertEqual([1, 2, 3], project.get_resource('b'))
+
+        return
+
+    def test_zip(self):
+        """ zip """
+
+        location = os.path.join(self.tmpdir, 'project.zip')
+        self._create_project(ZipChunkedProject).save(location)
+
+        self.assertTrue(zipfile.is_zipfile(location))
+
+        project = ZipChunkedProject.load(location, None)
+        self.assertEqual(['a', 'b'], project.resource_names)
+        self.assertEqual({'x' : 1}, project.get_resource('a'))
+        self.assertEqual([1, 2, 3], project.get_resource('b'))
+
+        # Saving again keeps the resources that were not loaded.
+        project.set_resource('c', 'new')
+        project.save()
+
+        project = ZipChunkedProject.load(location, None)
+        self.assertEqual(['a', 'b', 'c'], project.resource_names)
+        self.assertEqual([1, 2, 3], project.get_resource('b'))
+        self.assertEqual('new', project.get_resource('c'))
+
+        return
+
+    def test_zip_is_opened_once(self):
+        """ zip is opened once """
+
+        location = os.path.join(self.tmpdir, 'project.zip')
+        project = ZipChunkedProject()
+        for i in range(20):
+            project.set_resource(str(i), i)
+        project.save(location)
+
+        # Count how many times a zip file is opened for reading.
+        opened = []
+        zip_file = zipfile.ZipFile
+        def ZipFile(filename, mode='r', *args, **kw):
+            if mode == 'r':
+                opened.append(filename)
+            return zip_file(filename, mode, *args, **kw)
+
+        zipfile.ZipFile = ZipFile
+        try:
+            project = ZipChunkedProject.load(location, None)
+            for i in range(10):
+                self.assertEqual(i, project.get_resource(str(i)))
+
+            # Copying the resources that were not loaded doesn't open the
+            # zip file again...
+            new_location = os.path.join(self.tmpdir, 'copy.zip')
+            project.save(new_location)
+            self.assertEqual([location], opened)
+
+            # ... and they are then read from the copy, which is opened once.
+            for i in range(10, 20):
+                self.assertEqual(i, project.get_resource(str(i)))
+            self.assertEqual([location, new_location], opened)
+
+        finally:
+            zipfile.ZipFile = zip_file
+
+        return
+
+    def test_save_as(self):
+        """ save as """
+
+        location = os.path.join(self.tmpdir, 'project')
+        self._create_project(ChunkedProject).save(location)
+
+        project = ChunkedProject.load(location, None)
+        new_location = os.path.join(self.tmpdir, 'copy')
+        project.save(new_location)
+
+        # The resources that were not loaded are now read from the copy.
+        shutil.rmtree(location)
+        self.assertEqual(new_location, project.location)
+        self.assertEqual({'x' : 1}, project.get_resource('a'))
+        self.assertEqual([1, 2, 3], project.get_resource('b'))
+
+        return
+
+    def test_remove_resources(self):
+        """ remove resources """
+
+        location = os.path.join(self.tmpdir, 'project')
+        self._create_project(ChunkedProject).save(location)
+
+        project = ChunkedProject.load(location, None)
+        with self.assertRaises(KeyError):
+            project.remove_resources(['a', 'missing'])
+        self.assertEqual(['a', 'b'], project.resource_names)
+
+        project.remove_resources(['a'])
+        project.save()
+        self.assertEqual(1, len(self._get_resource_files(location)))
+
+        project = ChunkedProject.load(location, None)
+        self.assertEqual(['b'], project.resource_names)
+
+        return
+
+    def test_autosave(self):
+        """ autosave """
+
+        location = os.path.join(self.tmpdir, 'project')
+        self._create_project(ChunkedProject).save(location)
+
+        project = ChunkedProject.load(location, None)
+        project.get_resource('a')
+        project.set_resource('c', 'new')
+
+        # Only the resources that have been set are written.
+        autosave_location = os.path.join(self.tmpdir, 'project.autosave')
+        project._autosave(autosave_location)
+        self.assertEqual(location, project.location)
+        self.assertTrue(project.dirty)
+        self.assertEqual(1, len(self._get_resource_files(autosave_location)))
+        self.assertEqual(
+            [True, True, False], self._get_references(autosave_location)
+        )
+
+        # Restoring the auto-saved copy reads the others from the original.
+        restored = ChunkedProject.load(autosave_location, None)
+        self.assertEqual([1, 2, 3], restored.get_resource('b'))
+
+        restored = ChunkedProject.load(autosave_location, None)
+        restored.save(location, overwrite=True)
+        shutil.rmtree(autosave_location)
+
+        project = ChunkedProject.load(location, None)
+        self.assertEqual(['a', 'b', 'c'], project.resource_names)
+        self.assertEqual({'x' : 1}, project.get_resource('a'))
+        self.assertEqual([1, 2, 3], project.get_resource('b'))
+        self.assertEqual('new', project.get_resource('c'))
+
+        return
+
+    def test_autosave_in_background(self):
+        """ autosave in background """
+
+        location = os.path.join(self.tmpdir, 'project')
+        self._create_project(ChunkedProject).save(location)
+
+        project = ChunkedProject.load(location, None)
+        project.set_resource('a', 'new')
+
+        # The changed resources are serialized when the copy is prepared, so
+        # changes made before it is written are not in it.
+        autosave_location = os.path.join(self.tmpdir, 'project.autosave')
+        write = project._prepare_autosave(autosave_location)
+        project.set_resource('b', 'newer')
+        self.assertFalse(os.path.exists(autosave_location))
+
+        write()
+        self.assertEqual(
+            [False, True], self._get_references(autosave_location)
+        )
+
+        restored = ChunkedProject.load(autosave_location, None)
+        self.assertEqual('new', restored.get_resource('a'))
+        self.assertEqual([1, 2, 3], restored.get_resource('b'))
+
+        # Resources that have not changed since the last copy are kept in it
+        # rather than serialized again.
+        filename = os.path.join(
+            autosave_location, self._get_entries(autosave_location)[0]['file']
+        )
+        os.utime(filename, (0, 0))
+
+        project._autosave(autosave_location)
+        self.assertEqual(0, os.path.getmtime(filename))
+        self.assertEqual(2, len(self._get_resource_files(autosave_location)))
+        self.assertEqual(
+            [False, False], self._get_references(autosave_location)
+        )
+
+        restored = ChunkedProject.load(autosave_location, None)
+        self.assertEqual('new', restored.get_resource('a'))
+        self.assertEqual('newer', restored.get_resource('b'))
+
+        # Once the project is saved its resources are referred to there.
+        project.save()
+        project._autosave(autosave_location)
+        self.assertEqual(
+            [True, True], self._get_references(autosave_location)
+        )
+
+        return
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_memmap(self):
+        """ memmap """
+
+        location = os.path.join(self.tmpdir, 'project')
+        project = ChunkedProject()
+        project.set_resource('array', numpy.arange(10))
+        project.save(location)
+
+        project = ChunkedProject.load(location, None)
+        array = project.get_resource('array')
+        self.assertIsInstance(array, numpy.memmap)
+        self.assertEqual(range(10), list(array))
+
+        return
+
+    ###########################################################################
+    # Private interface.
+    ###########################################################################
+
+    def _create_project(self, klass):
+        """ Create a project with some resources. """
+
+        project = klass()
+        project.set_resource('a', {'x' : 1})
+        project.set_resource('b', [1, 2, 3])
+
+        return project
+
+    def _get_entries(self, location):
+        """ Return the manifest entries of a directory project. """
+
+        with open(os.path.join(location, MANIFEST_NAME)) as f:
+            return json.load(f)['resources']
+
+    def _get_references(self, location):
+        """ Return whether each resource of a directory project is in
+        another container.
+
+        """
+
+        return [
+            'location' in entry for entry in self._get_entries(location)
+        ]
+
+    def _get_resource_files(self, location):
+        """ Return the names of the resource files in a directory project. """
+
+        return os.listdir(os.path.join(location, RESOURCE_DIRECTORY))
+
+#### EOF ######################################################################
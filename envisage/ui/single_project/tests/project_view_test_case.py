@@ -0,0 +1,101 @@
+""" Tests for the tree nodes of chunked projects in the project view. """
+
+
+# Standard library imports.
+import gc
+import weakref
+
+# Enthought library imports.
+from envisage.ui.single_project.chunked_project import ChunkedProject
+from envisage.ui.single_project.view import project_view
+from envisage.ui.single_project.view.project_view import \
+     ChunkedProjectAdapter, PAGE_SIZE, ResourceNode, ResourcePage
+from traits.testing.unittest_tools import unittest
+
+
+class ProjectViewTestCase(unittest.TestCase):
+    """ Tests for the tree nodes of chunked projects in the project view. """
+
+    ###########################################################################
+    # Tests.
+    ###########################################################################
+
+    def test_small_project(self):
+        """ small project """
+
+        project = self._create_project(3)
+        children = ChunkedProjectAdapter(project).get_children()
+
+        self.assertEqual(
+            ['r0', 'r1', 'r2'], [child.name for child in children]
+        )
+        self.assertTrue(all(isinstance(child, ResourceNode)
+                            for child in children))
+
+        return
+
+    def test_paging(self):
+        """ paging """
+
+        project = self._create_project(PAGE_SIZE + 10)
+        adapter = ChunkedProjectAdapter(project)
+        children = adapter.get_children()
+
+        self.assertEqual(2, len(children))
+        self.assertTrue(all(isinstance(child, ResourcePage)
+                            for child in children))
+        self.assertEqual(
+            ['Resources 1-%d' % PAGE_SIZE,
+             'Resources %d-%d' % (PAGE_SIZE + 1, PAGE_SIZE + 10)],
+            [child.label for child in children]
+        )
+
+        # The nodes for a page are only created when it is expanded.
+        page = children[1]
+        self.assertEqual(None, page._nodes)
+        self.assertEqual(
+            ['r%d' % i for i in range(PAGE_SIZE, PAGE_SIZE + 10)],
+            [node.name for node in page.get_nodes()]
+        )
+
+        # The children are kept until the resources change.
+        self.assertIs(children, adapter.get_children())
+        project.remove_resources(['r0'])
+        children = adapter.get_children()
+        self.assertEqual(
+            'Resources 1-%d' % PAGE_SIZE, children[0].label
+        )
+        self.assertEqual('r1', children[0].get_nodes()[0].name)
+
+        return
+
+    def test_children_do_not_keep_project_alive(self):
+        """ children do not keep project alive """
+
+        project = self._create_project(PAGE_SIZE + 1)
+        ChunkedProjectAdapter(project).get_children()
+        self.assertIn(project, project_view._project_children)
+
+        reference = weakref.ref(project)
+        del project
+        gc.collect()
+
+        self.assertEqual(None, reference())
+        self.assertEqual(0, len(project_view._project_children))
+
+        return
+
+    ###########################################################################
+    # Private interface.
+    ###########################################################################
+
+    def _create_project(self, count):
+        """ Create a project with the specified number of resources. """
+
+        project = ChunkedProject()
+        for i in range(count):
+            project.set_resource('r%d' % i, i)
+
+        return project
+
+#### EOF ######################################################################
@@ -0,0 +1,92 @@
+""" Tests for deleting the selection in the single project UI service. """
+
+
+# Enthought library imports.
+from apptools.naming.api import Context
+from envisage.ui.single_project.chunked_project import ChunkedProject
+from envisage.ui.single_project.model_service import ModelService
+from envisage.ui.single_project.ui_service import UiService
+from envisage.ui.single_project.view.project_view import ResourceNode
+from traits.testing.unittest_tools import unittest
+
+
+class ConfirmingUiService(UiService):
+    """ A UI service that doesn't ask before deleting anything. """
+
+    def _confirm_delete(self, deletables):
+        return len(deletables) > 0
+
+
+class UiServiceTestCase(unittest.TestCase):
+    """ Tests for deleting the selection in the single project UI service. """
+
+    ###########################################################################
+    # 'TestCase' interface.
+    ###########################################################################
+
+    def setUp(self):
+        """ Prepares the test fixture before each test method is called. """
+
+        self.model_service = ModelService(None, None)
+        self.ui_service = ConfirmingUiService(
+            self.model_service, None, autosave_interval=0
+        )
+
+        return
+
+    ###########################################################################
+    # Tests.
+    ###########################################################################
+
+    def test_delete_resources(self):
+        """ delete resources """
+
+        project = ChunkedProject()
+        for name in ['a', 'b', 'c']:
+            project.set_resource(name, name)
+
+        self.model_service.project = project
+        self.model_service.selection = [
+            ResourceNode(name='a'), ResourceNode(name='c')
+        ]
+
+        # Every selected resource is removed at once.
+        changes = []
+        project.on_trait_change(
+            lambda new: changes.append(new), 'resource_names'
+        )
+        self.ui_service.delete_selection()
+
+        self.assertEqual(['b'], project.resource_names)
+        self.assertEqual([['b']], changes)
+
+        return
+
+    def test_unbind_nodes(self):
+        """ unbind nodes """
+
+        context = Context()
+        context.bind('a', 1)
+        context.bind('b', 2)
+        sub_context = context.create_subcontext('sub')
+        sub_context.bind('x', 3)
+        sub_context.bind('y', 4)
+
+        # Nodes that know their context are unbound from it directly...
+        nodes = [
+            context.lookup_binding('a'), sub_context.lookup_binding('x')
+        ]
+
+        # ... and the others are searched for.
+        node = context.lookup_binding('b')
+        node.context = None
+        nodes.append(node)
+
+        self.ui_service._unbind_nodes(context, nodes)
+
+        self.assertEqual(['sub'], context.list_names())
+        self.assertEqual(['y'], sub_context.list_names())
+
+        return
+
+#### EOF ######################################################################
@@ -18,7 +18,7 @@ import shutil
 # Enthought library imports
 from apptools.preferences.api import bind_preference
 from apptools.io.api import File
-from apptools.naming.api import Context
+from apptools.naming.api import Context, NameNotFoundError
 from pyface.api import CANCEL, confirm, ConfirmationDialog, \
     DirectoryDialog, error, FileDialog, information, NO, OK, YES
 from pyface.action.api import MenuManager
@@ -26,7 +26,11 @@ from pyface.timer.api import do_later, Timer
 from traits.api import Any, Event, HasTraits, Instance, Int
 
 # Local imports.
+from autosave import AutoSaver
+from chunked_project import ChunkedProject
 from model_service import ModelService
+from project import Project
+from view.project_view import ResourceNode
 
 
 # Setup a logger for this module.
@@ -65,6 +69,9 @@ class UiService(HasTraits):
     # The interval (minutes)at which automatic saving should occur.
     autosave_interval = Int(5)
 
+    # Writes the automatically saved projects in the background.
+    autosaver = Instance(AutoSaver, ())
+
     ##########################################################################
     # 'object' interface.
     ##########################################################################
@@ -197,38 +204,39 @@ class UiService(HasTraits):
         if current is not None and len(selection) > 0:
             logger.debug('Deleting selection from Project [%s]', current)
 
-            # Determine the context for the current project.  Raise an error
-            # if we can't treat it as a context as then we don't know how
-            # to delete anything.
-            context = self._get_context_for_object(current)
-            if context is None:
-                raise Exception('Could not treat Project ' + \
-                    '[%s] as a context' % current)
-
-            # Filter out any objects in the selection that can NOT be deleted.
-            deletables = []
-            for item in selection:
-                rt = self._get_resource_type_for_object(item.obj)
-                nt = rt.node_type
-                if nt.can_delete(item):
-                    deletables.append(item)
-                else:
-                    logger.debug('Node type reports selection item [%s] is '
-                        'not deletable.', nt)
-
-            if deletables != []:
-                # Confirm the delete operation with the user
-                names = '\n\t'.join([b.name for b in deletables])
-                message = ('You are about to delete the following selected '
-                    'items:\n\t%s\n\n'
-                    'Are you sure?') % names
-                title = 'Delete Selected Items?'
-                action = confirm(None, message, title)
-                if action == YES:
+            # The resources of a chunked project are simply removed from it,
+            # all at once.
+            if isinstance(current, ChunkedProject):
+                deletables = [item for item in selection
+                    if isinstance(item, ResourceNode)]
+                if self._confirm_delete(deletables):
+                    current.remove_resources([node.name for node in
+                        deletables])
 
-                    # Unbind all the deletable nodes
-                    if len(deletables) > 0:
-                        self._unbind_nodes(context, deletables)
+            else:
+                # Determine the context for the current project.  Raise an
+                # error if we can't treat it as a context as then we don't
+                # know how to delete anything.
+                context = self._get_context_for_object(current)
+                if context is None:
+                    raise Exception('Could not treat Project ' + \
+                        '[%s] as a context' % current)
+
+                # Filter out any objects in the selection that can NOT be
+                # deleted.
+                deletables = []
+                for item in selection:
+                    rt = self._get_resource_type_for_object(item.obj)
+                    nt = rt.node_type
+                    if nt.can_delete(item):
+                        deletables.append(item)
+                    else:
+                        logger.debug('Node type reports selection item [%s] '
+                            'is not deletable.', nt)
+
+                # Unbind all the deletable nodes
+                if self._confirm_delete(deletables):
+                    self._unbind_nodes(context, deletables)
 
         return
 
@@ -354,9 +362,17 @@ class UiService(HasTraits):
                 autosave_loc = self._get_autosave_location(location)
                 try:
                     # We do not want the project's location and name to be
-                    # updated.
-                    project.save(autosave_loc, overwrite=True,
-                                 autosave=True)
+                    # updated, so we don't use the project's 'save' method.
+                    # Projects that pickle themselves in the standard way are
+                    # written in the background, but any that customize how
+                    # they are saved have to prepare their own copy.
+                    if type(project)._save.im_func is Project._save.im_func:
+                        self.autosaver.save(project, autosave_loc)
+                    else:
+                        write = project._prepare_autosave(autosave_loc)
+                        if write is not None:
+                            self.autosaver.submit(autosave_loc, write)
+
                     msg = '[%s] auto-saved to [%s]' % (project,
                                                        autosave_loc)
                     logger.debug(msg)
@@ -375,11 +391,90 @@ class UiService(HasTraits):
 
         """
         autosave_loc = self._get_autosave_location(location)
+
+        # Make sure that an auto-save in progress doesn't recreate the files
+        # that we are about to remove.
+        project_class = self.model_service.factory.PROJECT_CLASS
+        self.autosaver.clean(project_class.get_pickle_filename(autosave_loc))
+
         if os.path.exists(autosave_loc):
             self.model_service.clean_location(autosave_loc)
         return
 
 
+    def _confirm_delete(self, deletables):
+        """
+        Confirm the deletion of the specified nodes with the user.
+
+        Returns True if there is anything to delete and the user confirmed
+        it.
+
+        """
+
+        result = False
+        if len(deletables) > 0:
+            names = '\n\t'.join([b.name for b in deletables])
+            message = ('You are about to delete the following selected '
+                'items:\n\t%s\n\n'
+                'Are you sure?') % names
+            title = 'Delete Selected Items?'
+            result = confirm(None, message, title) == YES
+
+        return result
+
+
+    def _find_and_unbind_nodes(self, context, nodes):
+        """
+        Unbinds all of the specified nodes that can be found within this
+        context or any of its sub-contexts.
+
+        This uses a breadth first algorithm on the assumption that the
+        user will have likely selected peer nodes within a sub-context
+        that isn't the deepest context.
+
+        """
+
+        # Iterate through all of the selected nodes looking for ones who's
+        # name is within our context.
+        context_names = context.list_names()
+        for node in nodes[:]:
+            if node.name in context_names:
+
+                # Ensure we've found a matching node by matching the objects
+                # as well.
+                binding = context.lookup_binding(node.name)
+                if id(node.obj) == id(binding.obj):
+
+                    # Remove the node from the context -AND- from the list of
+                    # nodes that are still being searched for.
+                    context.unbind(node.name)
+                    nodes.remove(node)
+
+                    # Stop if we've unbound the last node
+                    if len(nodes) < 1:
+                        break
+
+        # If we haven't unbound the last node, then search any sub-contexts
+        # for more nodes to unbind.
+        else:
+
+            # Build a list of all current sub-contexts of this context.
+            subs = []
+            for name in context.list_names():
+                if context.is_context(name):
+                    obj = context.lookup_binding(name).obj
+                    sub_context = self._get_context_for_object(obj)
+                    if sub_context is not None:
+                        subs.append(sub_context)
+
+            # Iterate through each sub-context, stopping as soon as possible
+            # if we've run out of nodes.
+            for sub in subs:
+                self._find_and_unbind_nodes(sub, nodes)
+                if len(nodes) < 1:
+                    break
+
+
     def _get_autosave_location(self, location):
         """
         Returns the path for auto-saving the project in location.
@@ -522,6 +617,12 @@ class UiService(HasTraits):
                          default=YES)
         if action == YES:
             try:
+                # Apply any changes that were only auto-saved as journal
+                # segments.
+                self.autosaver.compact(
+                    project.get_pickle_filename(autosave_loc),
+                    project.get_pickle_package())
+
                 saved_project = self.model_service.factory.open(autosave_loc)
                 if saved_project is not None:
                     # Copy over the autosaved version to the current project's
@@ -651,54 +752,32 @@ class UiService(HasTraits):
         Unbinds all of the specified nodes that can be found within this
         context or any of its sub-contexts.
 
-        This uses a breadth first algorithm on the assumption that the
-        user will have likely selected peer nodes within a sub-context
-        that isn't the deepest context.
+        Nodes that know the context that they are bound in are unbound from
+        it directly.  Only the rest are searched for.
 
         """
 
         logger.debug('Unbinding nodes [%s] from context [%s] within '
             'UiService [%s]', nodes, context, self)
 
-        # Iterate through all of the selected nodes looking for ones who's
-        # name is within our context.
-        context_names = context.list_names()
-        for node in nodes[:]:
-            if node.name in context_names:
-
-                # Ensure we've found a matching node by matching the objects
-                # as well.
-                binding = context.lookup_binding(node.name)
-                if id(node.obj) == id(binding.obj):
-
-                    # Remove the node from the context -AND- from the list of
-                    # nodes that are still being searched for.
-                    context.unbind(node.name)
-                    nodes.remove(node)
+        remaining = []
+        for node in nodes:
+            parent = getattr(node, 'context', None)
+            try:
+                found = isinstance(parent, Context) and \
+                    id(parent.lookup(node.name)) == id(node.obj)
+            except NameNotFoundError:
+                found = False
 
-                    # Stop if we've unbound the last node
-                    if len(nodes) < 1:
-                        break
+            if found:
+                parent.unbind(node.name)
+            else:
+                remaining.append(node)
 
-        # If we haven't unbound the last node, then search any sub-contexts
-        # for more nodes to unbind.
-        else:
+        if len(remaining) > 0:
+            self._find_and_unbind_nodes(context, remaining)
 
-            # Build a list of all current sub-contexts of this context.
-            subs = []
-            for name in context.list_names():
-                if context.is_context(name):
-                    obj = context.lookup_binding(name).obj
-                    sub_context = self._get_context_for_object(obj)
-                    if sub_context is not None:
-                        subs.append(sub_context)
-
-            # Iterate through each sub-context, stopping as soon as possible
-            # if we've run out of nodes.
-            for sub in subs:
-                self._unbind_nodes(sub, nodes)
-                if len(nodes) < 1:
-                    break
+        return
 
 
     def _workbench_exiting(self, event):
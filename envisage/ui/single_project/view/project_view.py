@@ -13,15 +13,17 @@ The single project plugin's project view
 # Standard library imports.
 import logging
 from string import rfind
+from weakref import WeakKeyDictionary
 
 # Enthought library imports
 from apptools.naming.api import Binding
-from traits.api import adapts, Any, HasTraits, Instance, Str
+from traits.api import adapts, Any, HasTraits, Instance, List, Str
 from traitsui.api import Item, Group, TreeEditor, ITreeNode, \
     ITreeNodeAdapter, View
 
 # Application specific imports.
 from envisage.api import IApplication
+from envisage.ui.single_project.chunked_project import ChunkedProject
 from envisage.ui.single_project.project import Project
 from envisage.ui.single_project.services import IPROJECT_MODEL, \
     IPROJECT_UI
@@ -92,6 +94,176 @@ class ProjectAdapter(ITreeNodeAdapter):
         """
         return True
 
+# The maximum number of resources that are shown as the children of a single
+# node.  The resources of larger projects are split into pages of this size.
+PAGE_SIZE = 500
+
+# The pages (or, for smaller projects, the resource nodes) that are the
+# children of each chunked project in the tree.  They are created the first
+# time that a project is expanded, and are discarded whenever its resources
+# change.  Note that the children must not refer to the project, or it would
+# never be discarded.
+_project_children = WeakKeyDictionary()
+
+
+class ResourceNode(HasTraits):
+    """ A node for a resource of a chunked project.
+
+    Showing the node doesn't load the resource.
+
+    """
+
+    # The name of the resource.
+    name = Str
+
+    # The label and icon of the node.
+    label = Str
+    icon = Str('<item>')
+
+
+class ResourcePage(HasTraits):
+    """ A node for a page of the resources of a chunked project. """
+
+    # The names of the resources that are on the page.
+    names = List(Str)
+
+    # The label of the node.
+    label = Str
+
+    # The resource nodes (created when the page is first expanded).
+    _nodes = Any
+
+    def get_nodes(self):
+        """ Returns the resource nodes on the page. """
+
+        if self._nodes is None:
+            self._nodes = _create_resource_nodes(self.names)
+
+        return self._nodes
+
+
+class ChunkedProjectAdapter(ProjectAdapter):
+    """ Adapter for the root of the tree when it is a chunked project.
+
+    The children of the project are its resources or, if there are more than
+    PAGE_SIZE resources, pages of them.  Only the pages that are expanded have
+    nodes created for their resources.
+
+    """
+
+    adapts(ChunkedProject, ITreeNode)
+
+    #-- ITreeNodeAdapter Method Overrides --------------------------------------
+
+    def allows_children(self):
+        """ Returns whether this object can have children.
+        """
+        return True
+
+    def has_children(self):
+        """ Returns whether the object has children.
+        """
+        return len(self.get_children()) > 0
+
+    def get_children(self):
+        """ Gets the object's children.
+        """
+        project = self.adaptee
+
+        children = _project_children.get(project)
+        if children is None:
+            names = project.resource_names
+            if len(names) <= PAGE_SIZE:
+                children = _create_resource_nodes(names)
+            else:
+                children = []
+                for start in range(0, len(names), PAGE_SIZE):
+                    page = names[start:start + PAGE_SIZE]
+                    children.append(ResourcePage(names=page,
+                        label='Resources %d-%d' % (start + 1,
+                            start + len(page))))
+
+            # Make sure that the children are discarded before the tree asks
+            # for the new ones.
+            project.on_trait_change(_on_resource_names_changed,
+                'resource_names', priority=True)
+            _project_children[project] = children
+
+        return children
+
+    def when_children_replaced(self, listener, remove):
+        """ Sets up or removes a listener for children being replaced on a
+            specified object.
+        """
+        self.adaptee.on_trait_change(listener, 'resource_names',
+            remove=remove)
+
+
+class ResourcePageAdapter(ITreeNodeAdapter):
+    """ Adapter for a page of resources. """
+
+    adapts(ResourcePage, ITreeNode)
+
+    #-- ITreeNodeAdapter Method Overrides --------------------------------------
+
+    def allows_children(self):
+        """ Returns whether this object can have children.
+        """
+        return True
+
+    def has_children(self):
+        """ Returns whether the object has children.
+        """
+        return len(self.adaptee.names) > 0
+
+    def get_children(self):
+        """ Gets the object's children.
+        """
+        return self.adaptee.get_nodes()
+
+    def get_label(self):
+        """ Gets the label to display for a specified object.
+        """
+        return self.adaptee.label
+
+    def get_icon(self, is_expanded):
+        """ Returns the icon for a specified object.
+        """
+        return (is_expanded and '<open>') or '<closed>'
+
+
+class ResourceNodeAdapter(ITreeNodeAdapter):
+    """ Adapter for a resource. """
+
+    adapts(ResourceNode, ITreeNode)
+
+    #-- ITreeNodeAdapter Method Overrides --------------------------------------
+
+    def get_label(self):
+        """ Gets the label to display for a specified object.
+        """
+        return self.adaptee.label
+
+    def get_icon(self, is_expanded):
+        """ Returns the icon for a specified object.
+        """
+        return self.adaptee.icon
+
+
+def _create_resource_nodes(names):
+    """ Returns the nodes for the resources with the specified names. """
+
+    return [ResourceNode(name=name, label=name) for name in names]
+
+
+def _on_resource_names_changed(project, trait_name, old, new):
+    """ Discards the children of a project when its resources change. """
+
+    _project_children.pop(project, None)
+
+    return
+
+
 class ProjectView(HasTraits):
     """
     The single project plugin's project view
@@ -1,15 +1,21 @@
 # Standard library imports.
 import cPickle
+import heapq
+import json
 import logging
-import os.path
+import os
 
 # Enthought library imports.
 from envisage.api import Application, ExtensionPoint
+from envisage.file_utils import recover_file, write_atomically
 from pyface.api import GUI, SplashScreen
 from pyface.image_resource import ImageResource
-from pyface.tasks.api import TaskLayout, TaskWindowLayout
-from traits.api import Bool, Callable, Directory, Event, HasStrictTraits, \
-     Instance, Int, List, Property, Str, Unicode, Vetoable
+from pyface.tasks.api import HSplitter, PaneItem, Splitter, Tabbed, \
+     TaskLayout, TaskWindowLayout, VSplitter
+from pyface.tasks.task_layout import LayoutItem
+from traits.api import Any, Bool, Callable, Directory, Event, \
+     HasStrictTraits, Instance, Int, List, Property, Str, Tuple, Unicode, \
+     Vetoable
 from traits.etsconfig.api import ETSConfig
 
 # Local imports
@@ -113,6 +119,24 @@ class TasksApplication(Application):
     _state = Instance('envisage.ui.tasks.tasks_application.'
                       'TasksApplicationState')
 
+    # The contributed task factories indexed by task ID. Built when first
+    # needed and discarded whenever the extension point changes.
+    _task_factory_map = Any
+
+    # The contributed task extensions as a tuple of a dictionary mapping task
+    # IDs to the extensions for that task and a list of the extensions for all
+    # tasks. Each extension is paired with its position in the extension
+    # point, so that they are always applied in the order contributed. Built
+    # when first needed and discarded whenever the extension point changes.
+    _task_extension_map = Any
+
+    # Are we listening for changes to the task extension points?
+    _listening = Bool(False)
+
+    # The application state as it was last loaded or saved (so that it is
+    # only written when it has changed).
+    _saved_state = Any
+
     ###########################################################################
     # 'IApplication' interface.
     ###########################################################################
@@ -156,8 +180,9 @@ class TasksApplication(Application):
             return None
 
         # Create the task using suitable task extensions.
-        extensions = [ ext for ext in self.task_extensions
-                       if ext.task_id == id or not ext.task_id ]
+        task_extensions, common = self._get_task_extension_map()
+        extensions = [ ext for index, ext in heapq.merge(
+            task_extensions.get(id, []), common) ]
         task = factory.create_with_extensions(extensions)
         task.id = factory.id
         return task
@@ -290,10 +315,42 @@ class TasksApplication(Application):
     def _get_task_factory(self, id):
         """ Returns the TaskFactory with the specified ID, or None.
         """
-        for factory in self.task_factories:
-            if factory.id == id:
-                return factory
-        return None
+        if self._task_factory_map is None:
+            self._listen_for_task_changes()
+            factory_map = {}
+            for factory in self.task_factories:
+                factory_map.setdefault(factory.id, factory)
+            self._task_factory_map = factory_map
+
+        return self._task_factory_map.get(id)
+
+    def _get_task_extension_map(self):
+        """ Returns the task extensions indexed by task ID (see
+            '_task_extension_map').
+        """
+        if self._task_extension_map is None:
+            self._listen_for_task_changes()
+            task_extensions, common = {}, []
+            for index, ext in enumerate(self.task_extensions):
+                if ext.task_id:
+                    task_extensions.setdefault(ext.task_id, []).append(
+                        (index, ext))
+                else:
+                    common.append((index, ext))
+            self._task_extension_map = (task_extensions, common)
+
+        return self._task_extension_map
+
+    def _listen_for_task_changes(self):
+        """ Discards the task factory and extension indexes whenever the
+            corresponding extension points change.
+        """
+        if not self._listening:
+            self.add_extension_point_listener(
+                self._on_task_factories_changed, self.TASK_FACTORIES)
+            self.add_extension_point_listener(
+                self._on_task_extensions_changed, self.TASK_EXTENSIONS)
+            self._listening = True
 
     def _prepare_exit(self):
         """ Called immediately before the extant windows are destroyed and the
@@ -306,20 +363,38 @@ class TasksApplication(Application):
         """ Loads saved application state, if possible.
         """
         state = TasksApplicationState()
-        filename = os.path.join(self.state_location, 'application_memento')
-        if os.path.exists(filename):
-            # Attempt to unpickle the saved application state.
+        filename = os.path.join(self.state_location, 'application_memento.json')
+        legacy_filename = os.path.join(self.state_location,
+                                       'application_memento')
+        if recover_file(filename):
+            # Attempt to decode the saved application state.
             try:
-                with open(filename, 'r') as f:
-                    restored_state = cPickle.load(f)
+                with open(filename, 'rb') as f:
+                    data = f.read()
+                restored_state = TasksApplicationState.loads(data)
                 if state.version == restored_state.version:
                     state = restored_state
+                    self._saved_state = data
                 else:
                     logger.warn('Discarding outdated application layout')
             except:
                 # If anything goes wrong, log the error and continue.
                 logger.exception('Restoring application layout from %s',
                                  filename)
+        elif os.path.exists(legacy_filename):
+            # Attempt to unpickle application state saved by an older version
+            # (it is saved in the new format on exit).
+            try:
+                with open(legacy_filename, 'r') as f:
+                    restored_state = cPickle.load(f)
+                if state.version == restored_state.version:
+                    state = restored_state
+                else:
+                    logger.warn('Discarding outdated application layout')
+            except:
+                # If anything goes wrong, log the error and continue.
+                logger.exception('Restoring application layout from %s',
+                                 legacy_filename)
         self._state = state
 
     def _restore_layout_from_state(self, layout):
@@ -351,11 +426,13 @@ class TasksApplication(Application):
         window_layouts = [ w.get_window_layout() for w in self.windows ]
         self._state.previous_window_layouts = window_layouts
 
-        # Attempt to pickle the application state.
-        filename = os.path.join(self.state_location, 'application_memento')
+        # Attempt to save the application state (unless it has not changed).
+        filename = os.path.join(self.state_location, 'application_memento.json')
         try:
-            with open(filename, 'w') as f:
-                cPickle.dump(self._state, f)
+            data = self._state.dumps()
+            if data != self._saved_state:
+                write_atomically(filename, data)
+                self._saved_state = data
         except:
             # If anything goes wrong, log the error and continue.
             logger.exception('Saving application layout')
@@ -383,6 +460,12 @@ class TasksApplication(Application):
 
     #### Trait change handlers ################################################
 
+    def _on_task_factories_changed(self, extension_registry, event):
+        self._task_factory_map = None
+
+    def _on_task_extensions_changed(self, extension_registry, event):
+        self._task_extension_map = None
+
     def _on_window_activated(self, window, trait_name, event):
         self.active_window = window
 
@@ -438,34 +521,154 @@ class TasksApplicationState(HasStrictTraits):
     previous_window_layouts = List(TaskWindowLayout)
 
     # A list of TaskWindowLayouts accumulated throughout the application's
-    # lifecycle.
-    window_layouts = List(TaskWindowLayout)
+    # lifecycle (most recent first).
+    window_layouts = Property(List(TaskWindowLayout))
 
     # The "version" for the state data. This should be incremented whenever a
     # backwards incompatible change is made to this class or any of the layout
     # classes. This ensures that loading application state is always safe.
     version = Int(1)
 
+    #### Private interface ####################################################
+
+    # The accumulated TaskWindowLayouts keyed by the set of tasks that they
+    # contain (so there is at most one of each equivalent layout).
+    _window_layouts = Instance(dict, ())
+
+    # The keys of the accumulated TaskWindowLayouts, least recent first.
+    _window_layout_keys = Instance(list, ())
+
+    # The most recent TaskLayout for each task ID.
+    _task_layouts = Instance(dict, ())
+
     def get_equivalent_window_layout(self, window_layout):
         """ Gets an equivalent TaskWindowLayout, if there is one.
         """
-        for layout in self.window_layouts:
-            if layout.is_equivalent_to(window_layout):
-                return layout
-        return None
+        return self._window_layouts.get(_layout_key(window_layout))
 
     def get_task_layout(self, task_id):
         """ Gets a TaskLayout with the specified ID, there is one.
         """
-        for window_layout in self.window_layouts:
-            for layout in window_layout.items:
-                if layout.id == task_id:
-                    return layout
-        return None
+        return self._task_layouts.get(task_id)
 
     def push_window_layout(self, window_layout):
         """ Merge a TaskWindowLayout into the accumulated list.
         """
-        self.window_layouts = [ layout for layout in self.window_layouts
-                                if not layout.is_equivalent_to(window_layout) ]
-        self.window_layouts.insert(0, window_layout)
+        key = _layout_key(window_layout)
+        removed = self._window_layouts.pop(key, None)
+        if removed is not None:
+            self._window_layout_keys.remove(key)
+        self._window_layouts[key] = window_layout
+        self._window_layout_keys.append(key)
+
+        for layout in _get_task_layouts(window_layout):
+            self._task_layouts[layout.id] = layout
+
+        # Any task layouts that came from the equivalent window layout that we
+        # just replaced now come from the next most recent window layout.
+        if removed is not None:
+            for layout in _get_task_layouts(removed):
+                if self._task_layouts.get(layout.id) is layout:
+                    del self._task_layouts[layout.id]
+                    for other_key in reversed(self._window_layout_keys):
+                        other = self._window_layouts[other_key]
+                        match = _find_task_layout(other, layout.id)
+                        if match is not None:
+                            self._task_layouts[layout.id] = match
+                            break
+
+    def dumps(self):
+        """ Returns the state encoded as a (compact) JSON string.
+        """
+        state = dict(
+            version = self.version,
+            previous_window_layouts = map(_encode_layout,
+                                          self.previous_window_layouts),
+            window_layouts = map(_encode_layout, self.window_layouts)
+        )
+        return json.dumps(state, separators=(',', ':'), sort_keys=True)
+
+    @classmethod
+    def loads(cls, data):
+        """ Creates a state from a string returned by 'dumps'.
+        """
+        state = json.loads(data)
+        return cls(
+            version = state['version'],
+            previous_window_layouts = map(_decode_layout,
+                                          state['previous_window_layouts']),
+            window_layouts = map(_decode_layout, state['window_layouts'])
+        )
+
+    #### Trait property getters/setters #######################################
+
+    def _get_window_layouts(self):
+        return [ self._window_layouts[key]
+                 for key in reversed(self._window_layout_keys) ]
+
+    def _set_window_layouts(self, window_layouts):
+        self._window_layouts.clear()
+        del self._window_layout_keys[:]
+        self._task_layouts.clear()
+        for window_layout in reversed(window_layouts):
+            self.push_window_layout(window_layout)
+
+
+# The layout classes that can appear in the saved application state.
+LAYOUT_CLASSES = dict((klass.__name__, klass) for klass in [
+    HSplitter, PaneItem, Splitter, Tabbed, TaskLayout, TaskWindowLayout,
+    VSplitter ])
+
+
+def _layout_key(window_layout):
+    """ Returns the key that is the same for equivalent TaskWindowLayouts.
+    """
+    return frozenset(window_layout.get_tasks())
+
+
+def _get_task_layouts(window_layout):
+    """ Returns the TaskLayouts in a TaskWindowLayout.
+    """
+    return [ item for item in window_layout.items
+             if isinstance(item, TaskLayout) ]
+
+
+def _find_task_layout(window_layout, task_id):
+    """ Returns the TaskLayout with the specified ID in a TaskWindowLayout, or
+        None.
+    """
+    for layout in _get_task_layouts(window_layout):
+        if layout.id == task_id:
+            return layout
+    return None
+
+
+def _encode_layout(value):
+    """ Encodes a layout (or any of its trait values) as JSON-compatible data.
+    """
+    if isinstance(value, LayoutItem):
+        data = { 'class' : type(value).__name__ }
+        for name in value.copyable_trait_names():
+            data[name] = _encode_layout(getattr(value, name))
+        return data
+    elif isinstance(value, (list, tuple)):
+        return map(_encode_layout, value)
+    return value
+
+
+def _decode_layout(data):
+    """ Decodes a layout encoded by '_encode_layout'.
+    """
+    if isinstance(data, dict):
+        data = data.copy()
+        layout = LAYOUT_CLASSES[data.pop('class')]()
+        for name, value in data.items():
+            value = _decode_layout(value)
+            if isinstance(layout.trait(name).trait_type, Tuple):
+                value = tuple(value)
+            setattr(layout, name, value)
+        return layout
+    elif isinstance(data, list):
+        return map(_decode_layout, data)
+    return data
+
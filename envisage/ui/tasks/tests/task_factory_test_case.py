@@ -0,0 +1,206 @@
+""" Tests for finding the task factories and extensions for a task. """
+
+
+# Enthought library imports.
+from envisage.api import ExtensionPoint, Plugin
+from envisage.ui.tasks.task_extension import TaskExtension
+from envisage.ui.tasks.task_factory import TaskFactory
+from envisage.ui.tasks.tasks_application import TasksApplication
+from pyface.tasks.api import Task
+from traits.api import List
+from traits.testing.unittest_tools import unittest
+
+
+class TasksPlugin(Plugin):
+    """ A plugin that offers the task extension points. """
+
+    #### 'IPlugin' interface ##################################################
+
+    id = 'test.tasks'
+
+    #### Extension points offered by this plugin ##############################
+
+    task_factories = ExtensionPoint(
+        List, id=TasksApplication.TASK_FACTORIES
+    )
+
+    task_extensions = ExtensionPoint(
+        List, id=TasksApplication.TASK_EXTENSIONS
+    )
+
+
+class ContributingPlugin(Plugin):
+    """ A plugin that contributes task factories and extensions. """
+
+    #### Contributions to extension points made by this plugin ################
+
+    my_task_factories = List(contributes_to=TasksApplication.TASK_FACTORIES)
+
+    my_task_extensions = List(contributes_to=TasksApplication.TASK_EXTENSIONS)
+
+
+class TaskFactoryTestCase(unittest.TestCase):
+    """ Tests for finding the task factories and extensions for a task. """
+
+    ###########################################################################
+    # 'TestCase' interface.
+    ###########################################################################
+
+    def setUp(self):
+        """ Prepares the test fixture before each test method is called. """
+
+        self.application = TasksApplication(plugins=[TasksPlugin()])
+
+        return
+
+    def tearDown(self):
+        """ Called immediately after each test method has been called. """
+
+        return
+
+    ###########################################################################
+    # Tests.
+    ###########################################################################
+
+    def test_extensions_are_applied_in_contribution_order(self):
+        """ extensions are applied in contribution order """
+
+        plugin = ContributingPlugin(
+            id                 = 'a',
+            my_task_factories  = [self._create_factory('a')],
+            my_task_extensions = [
+                self._create_extension('all.1'),
+                self._create_extension('a.1', task_id='a'),
+                self._create_extension('b.1', task_id='b'),
+                self._create_extension('all.2'),
+                self._create_extension('a.2', task_id='a')
+            ]
+        )
+        self.application.add_plugin(plugin)
+
+        task = self.application.create_task('a')
+        self.assertEqual('a', task.id)
+        self.assertEqual(
+            ['all.1', 'a.1', 'all.2', 'a.2'], self._get_pane_ids(task)
+        )
+
+        return
+
+    def test_first_factory_for_an_id_is_used(self):
+        """ first factory for an id is used """
+
+        first = self._create_factory('a')
+        plugin = ContributingPlugin(
+            id                = 'a',
+            my_task_factories = [first, self._create_factory('a')]
+        )
+        self.application.add_plugin(plugin)
+
+        self.assertIs(first, self.application._get_task_factory('a'))
+
+        return
+
+    def test_indexes_are_rebuilt_when_plugins_are_added(self):
+        """ indexes are rebuilt when plugins are added """
+
+        a = ContributingPlugin(
+            id                 = 'a',
+            my_task_factories  = [self._create_factory('a')],
+            my_task_extensions = [self._create_extension('all.1')]
+        )
+        self.application.add_plugin(a)
+
+        self.assertIsNone(self.application.create_task('b'))
+        task = self.application.create_task('a')
+        self.assertEqual(['all.1'], self._get_pane_ids(task))
+
+        b = ContributingPlugin(
+            id                 = 'b',
+            my_task_factories  = [self._create_factory('b')],
+            my_task_extensions = [
+                self._create_extension('a.1', task_id='a'),
+                self._create_extension('all.2')
+            ]
+        )
+        self.application.add_plugin(b)
+
+        self.assertIsNotNone(self.application.create_task('b'))
+        task = self.application.create_task('a')
+        self.assertEqual(['all.1', 'a.1', 'all.2'], self._get_pane_ids(task))
+
+        # ... and when they are removed.
+        self.application.remove_plugin(b)
+
+        self.assertIsNone(self.application.create_task('b'))
+        task = self.application.create_task('a')
+        self.assertEqual(['all.1'], self._get_pane_ids(task))
+
+        return
+
+    def test_indexes_are_rebuilt_when_contributions_change(self):
+        """ indexes are rebuilt when contributions change """
+
+        plugin = ContributingPlugin(
+            id                 = 'a',
+            my_task_factories  = [self._create_factory('a')],
+            my_task_extensions = [self._create_extension('all.1')]
+        )
+        self.application.add_plugin(plugin)
+
+        self.assertIsNone(self.application.create_task('b'))
+        task = self.application.create_task('a')
+        self.assertEqual(['all.1'], self._get_pane_ids(task))
+
+        plugin.my_task_factories.append(self._create_factory('b'))
+        plugin.my_task_extensions.insert(
+            0, self._create_extension('a.1', task_id='a')
+        )
+
+        self.assertIsNotNone(self.application.create_task('b'))
+        task = self.application.create_task('a')
+        self.assertEqual(['a.1', 'all.1'], self._get_pane_ids(task))
+
+        # Replacing the contributions altogether works too.
+        plugin.my_task_factories = []
+        plugin.my_task_extensions = [self._create_extension('all.2')]
+
+        self.assertIsNone(self.application.create_task('a'))
+        self.assertIsNone(self.application.create_task('b'))
+        self.assertEqual(
+            ['all.2'],
+            [ext.dock_pane_factories[0].pane_id
+             for index, ext in self.application._get_task_extension_map()[1]]
+        )
+
+        return
+
+    ###########################################################################
+    # Private interface.
+    ###########################################################################
+
+    def _create_extension(self, pane_id, task_id=''):
+        """ Create a task extension that adds a dock pane factory. """
+
+        def dock_pane_factory(**traits):
+            return None
+
+        # Tag the factory so that we can tell which extensions were applied.
+        dock_pane_factory.pane_id = pane_id
+
+        return TaskExtension(
+            task_id=task_id, dock_pane_factories=[dock_pane_factory]
+        )
+
+    def _create_factory(self, id):
+        """ Create a task factory. """
+
+        return TaskFactory(id=id, factory=Task)
+
+    def _get_pane_ids(self, task):
+        """ Return the Ids of the dock pane factories added to a task. """
+
+        return [
+            factory.pane_id for factory in task.extra_dock_pane_factories
+        ]
+
+#### EOF ######################################################################
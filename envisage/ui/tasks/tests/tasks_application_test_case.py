@@ -0,0 +1,171 @@
+""" Tests for saving and restoring the state of a tasks application. """
+
+
+# Standard library imports.
+import os
+import shutil
+import tempfile
+
+# Enthought library imports.
+from envisage.ui.tasks.tasks_application import TasksApplication, \
+     TasksApplicationState
+from pyface.tasks.api import PaneItem, TaskLayout, TaskWindowLayout
+from traits.testing.unittest_tools import unittest
+
+
+# The directory that contains the test data files.
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+class TasksApplicationStateTestCase(unittest.TestCase):
+    """ Tests for saving and restoring the state of a tasks application. """
+
+    ###########################################################################
+    # 'TestCase' interface.
+    ###########################################################################
+
+    def setUp(self):
+        """ Prepares the test fixture before each test method is called. """
+
+        self.tmpdir = tempfile.mkdtemp()
+
+        return
+
+    def tearDown(self):
+        """ Called immediately after each test method has been called. """
+
+        shutil.rmtree(self.tmpdir)
+
+        return
+
+    ###########################################################################
+    # Tests.
+    ###########################################################################
+
+    def test_dumps_and_loads(self):
+        """ dumps and loads """
+
+        state = TasksApplicationState()
+        state.previous_window_layouts = [self._create_window_layout()]
+        state.push_window_layout(self._create_window_layout())
+
+        restored = TasksApplicationState.loads(state.dumps())
+        self.assertEqual(state.dumps(), restored.dumps())
+
+        window_layout = restored.previous_window_layouts[0]
+        self.assertEqual(['my.task'], window_layout.get_tasks())
+        self.assertEqual('my.pane', window_layout.items[0].left.id)
+        self.assertEqual(1, len(restored.window_layouts))
+
+        return
+
+    def test_tuple_traits(self):
+        """ tuple traits """
+
+        state = TasksApplicationState()
+        state.previous_window_layouts = [self._create_window_layout()]
+
+        restored = TasksApplicationState.loads(state.dumps())
+        window_layout = restored.previous_window_layouts[0]
+        self.assertEqual((10, 20), window_layout.position)
+        self.assertEqual((800, 600), window_layout.size)
+
+        return
+
+    def test_legacy_pickle(self):
+        """ legacy pickle """
+
+        # Application state pickled by the version before the state was saved
+        # as JSON (when 'window_layouts' was a plain list).
+        shutil.copy(
+            os.path.join(DATA_DIR, 'application_memento'), self.tmpdir
+        )
+
+        application = TasksApplication(state_location=self.tmpdir)
+        application._load_state()
+        state = application._state
+
+        window_layout = state.previous_window_layouts[0]
+        self.assertEqual(['my.task'], window_layout.get_tasks())
+        self.assertEqual('my.task', window_layout.active_task)
+        self.assertEqual((10, 20), window_layout.position)
+        self.assertEqual((800, 600), window_layout.size)
+
+        self.assertEqual(
+            [['my.task'], ['other.task']],
+            [layout.get_tasks() for layout in state.window_layouts]
+        )
+        self.assertEqual('my.pane', state.get_task_layout('my.task').left.id)
+        bottom = state.get_task_layout('other.task').bottom
+        self.assertEqual(['a.pane', 'b.pane'], [i.id for i in bottom.items])
+        self.assertIs(window_layout, state.get_equivalent_window_layout(
+            TaskWindowLayout('my.task')
+        ))
+
+        # The state is saved in the new format (with no windows open).
+        application._save_state()
+        filename = os.path.join(self.tmpdir, 'application_memento.json')
+        with open(filename, 'rb') as f:
+            restored = TasksApplicationState.loads(f.read())
+        self.assertEqual([], restored.previous_window_layouts)
+        self.assertEqual(
+            [['my.task'], ['other.task']],
+            [layout.get_tasks() for layout in restored.window_layouts]
+        )
+
+        return
+
+    def test_interrupted_save(self):
+        """ interrupted save """
+
+        state = TasksApplicationState()
+        state.previous_window_layouts = [self._create_window_layout()]
+        filename = os.path.join(self.tmpdir, 'application_memento.json')
+        with open(filename + '.bak', 'wb') as f:
+            f.write(state.dumps())
+
+        application = TasksApplication(state_location=self.tmpdir)
+        application._load_state()
+        self.assertEqual(state.dumps(), application._state.dumps())
+
+        return
+
+    def test_push_window_layout(self):
+        """ push window layout """
+
+        state = TasksApplicationState()
+
+        first = TaskWindowLayout(TaskLayout(id='a'))
+        state.push_window_layout(first)
+        second = TaskWindowLayout(TaskLayout(id='a'), TaskLayout(id='b'))
+        state.push_window_layout(second)
+        self.assertIs(second.items[0], state.get_task_layout('a'))
+        self.assertIs(second.items[1], state.get_task_layout('b'))
+
+        # Replacing an equivalent window layout drops its task layouts, and
+        # those that other window layouts have come from the most recent one.
+        third = TaskWindowLayout('a', 'b')
+        state.push_window_layout(third)
+        self.assertEqual([third, first], state.window_layouts)
+        self.assertIs(first.items[0], state.get_task_layout('a'))
+        self.assertIsNone(state.get_task_layout('b'))
+
+        self.assertIs(third, state.get_equivalent_window_layout(
+            TaskWindowLayout('b', 'a')
+        ))
+
+        return
+
+    ###########################################################################
+    # Private interface.
+    ###########################################################################
+
+    def _create_window_layout(self):
+        """ Create a window layout containing a task layout. """
+
+        return TaskWindowLayout(
+            TaskLayout(id='my.task', left=PaneItem('my.pane')),
+            position = (10, 20),
+            size     = (800, 600)
+        )
+
+#### EOF ######################################################################
@@ -0,0 +1,166 @@
+""" Actions that are only imported and created when they are needed. """
+
+
+# Enthought library imports.
+from pyface.action.api import Action, ActionItem
+from traits.api import Any, Callable
+
+
+# The traits that a stand-in takes from its real action.
+MIRRORED_TRAITS = [
+    'accelerator', 'checked', 'description', 'enabled', 'image', 'name',
+    'style', 'tooltip', 'visible'
+]
+
+# The traits that are passed on to the real action when they are changed on
+# the stand-in (e.g. by its action set or by its menu item).
+FORWARDED_TRAITS = ['checked', 'enabled', 'visible']
+
+
+class LazyAction(Action):
+    """ A stand-in for an action that has not been imported yet.
+
+    The stand-in has the name (and hence the Id) given in the action's
+    definition, and it is the stand-in that appears in menus. The real
+    action is created (by calling the 'factory') the first time that the
+    stand-in is performed or resolved. From then on the stand-in mirrors the
+    real action's state, so that the menu item shows (for example) its
+    accelerator and whether it is enabled.
+
+    Until then the stand-in is shown enabled (unless its action set says
+    otherwise) and has the accelerator and style given in the action's
+    definition, so only actions that are enabled by default should be
+    deferred (see the 'lazy' trait of action definitions).
+
+    """
+
+    #### 'LazyAction' interface ###############################################
+
+    # A callable that imports and creates the real action.
+    factory = Callable
+
+    #### Private interface ####################################################
+
+    # The real action (None until it has been created).
+    _action = Any
+
+    ###########################################################################
+    # 'Action' interface.
+    ###########################################################################
+
+    def destroy(self):
+        """ Called when the action is no longer required. """
+
+        if self._action is not None:
+            self._action.destroy()
+
+        return
+
+    def perform(self, event):
+        """ Perform the action. """
+
+        action = self.resolve()
+
+        # The stand-in is enabled until the real action exists, but the real
+        # action might be disabled as soon as it is created.
+        if action.enabled:
+            action.perform(event)
+
+        return
+
+    ###########################################################################
+    # 'LazyAction' interface.
+    ###########################################################################
+
+    def resolve(self):
+        """ Return the real action (creating it if necessary). """
+
+        if self._action is None:
+            action = self.factory()
+
+            # Carry over any state that has been set on the stand-in.
+            if not self.enabled:
+                action.enabled = False
+
+            if not self.visible:
+                action.visible = False
+
+            self._action = action
+
+            for trait_name in MIRRORED_TRAITS:
+                setattr(self, trait_name, getattr(action, trait_name))
+
+            action.on_trait_change(self._on_action_changed, MIRRORED_TRAITS)
+            self.on_trait_change(self._on_stand_in_changed, FORWARDED_TRAITS)
+
+        return self._action
+
+    ###########################################################################
+    # Private interface.
+    ###########################################################################
+
+    def _on_action_changed(self, action, trait_name, old, new):
+        """ Dynamic trait change handler. """
+
+        setattr(self, trait_name, new)
+
+        return
+
+    def _on_stand_in_changed(self, stand_in, trait_name, old, new):
+        """ Dynamic trait change handler. """
+
+        setattr(self._action, trait_name, new)
+
+        return
+
+
+class LazyActionItem(ActionItem):
+    """ An action item that keeps its action's stand-in in menus.
+
+    Menu items show the 'LazyAction' stand-in itself, so the real action is
+    only created when the item is first performed. Tool bar and palette
+    items need the real action's image, so the stand-in is replaced by the
+    real action just before the item is added to a tool bar or palette.
+
+    """
+
+    ###########################################################################
+    # 'ActionItem' interface.
+    ###########################################################################
+
+    def add_to_toolbar(self, parent, tool_bar, image_cache, controller,
+                       show_labels=True):
+        """ Adds the item to a tool bar. """
+
+        self._resolve()
+
+        super(LazyActionItem, self).add_to_toolbar(
+            parent, tool_bar, image_cache, controller, show_labels
+        )
+
+        return
+
+    def add_to_palette(self, tool_palette, image_cache, show_labels=True):
+        """ Adds the item to a tool palette. """
+
+        self._resolve()
+
+        super(LazyActionItem, self).add_to_palette(
+            tool_palette, image_cache, show_labels
+        )
+
+        return
+
+    ###########################################################################
+    # Private interface.
+    ###########################################################################
+
+    def _resolve(self):
+        """ Replace the stand-in with the real action. """
+
+        if isinstance(self.action, LazyAction):
+            self.action = self.action.resolve()
+
+        return
+
+#### EOF ######################################################################
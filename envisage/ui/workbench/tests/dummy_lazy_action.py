@@ -0,0 +1,31 @@
+""" An action that the lazy action tests check is only imported on demand. """
+
+
+# Enthought library imports.
+from pyface.action.api import Action
+
+
+class DummyLazyAction(Action):
+    """ An action that records when it is performed. """
+
+    #### 'Action' interface ###################################################
+
+    accelerator = 'Ctrl+D'
+
+    #### 'DummyLazyAction' interface ##########################################
+
+    # The number of times the action has been performed.
+    performed = 0
+
+    ###########################################################################
+    # 'Action' interface.
+    ###########################################################################
+
+    def perform(self, event):
+        """ Perform the action. """
+
+        self.performed += 1
+
+        return
+
+#### EOF ######################################################################
@@ -0,0 +1,184 @@
+""" Tests for lazy actions. """
+
+
+# Standard library imports.
+import sys
+
+# Enthought library imports.
+from envisage.api import ImportManager
+from envisage.ui.action.api import Action
+from envisage.ui.workbench.lazy_action import LazyAction, LazyActionItem
+from envisage.ui.workbench.workbench_action_manager_builder import (
+    WorkbenchActionManagerBuilder
+)
+from traits.testing.unittest_tools import unittest
+
+
+# The module that contains the action that is created lazily.
+MODULE_NAME = 'dummy_lazy_action'
+
+
+class ActionManagerBuilder(WorkbenchActionManagerBuilder):
+    """ An action manager builder that does not need a workbench window. """
+
+    def _import_symbol(self, symbol_path):
+        """ Import a symbol. """
+
+        return ImportManager().import_symbol(symbol_path)
+
+
+class LazyActionTestCase(unittest.TestCase):
+    """ Tests for lazy actions. """
+
+    ###########################################################################
+    # 'TestCase' interface.
+    ###########################################################################
+
+    def setUp(self):
+        """ Prepares the test fixture before each test method is called. """
+
+        sys.modules.pop(MODULE_NAME, None)
+
+        return
+
+    def tearDown(self):
+        """ Called immediately after each test method has been called. """
+
+        sys.modules.pop(MODULE_NAME, None)
+
+        return
+
+    ###########################################################################
+    # Tests.
+    ###########################################################################
+
+    def test_menu_does_not_import_action(self):
+        """ menu does not import action """
+
+        item = self._create_item()
+        item.add_to_menu(None, None, None)
+
+        self.assertNotIn(MODULE_NAME, sys.modules)
+        self.assertIsInstance(item.action, LazyAction)
+        self.assertEqual('Dummy', item.action.name)
+
+        return
+
+    def test_perform_imports_action(self):
+        """ perform imports action """
+
+        item = self._create_item()
+        item.add_to_menu(None, None, None)
+
+        item.action.perform(None)
+
+        self.assertIn(MODULE_NAME, sys.modules)
+        action = item.action.resolve()
+        self.assertEqual(1, action.performed)
+
+        # The stand-in takes on the state of the real action...
+        self.assertEqual('Ctrl+D', item.action.accelerator)
+        action.enabled = False
+        self.assertEqual(False, item.action.enabled)
+
+        # ... and passes on changes made to it.
+        item.action.visible = False
+        self.assertEqual(False, action.visible)
+
+        return
+
+    def test_state_is_carried_over(self):
+        """ state is carried over """
+
+        item = self._create_item()
+        item.enabled = False
+
+        action = item.action.resolve()
+        self.assertEqual(False, action.enabled)
+        self.assertEqual(False, item.action.enabled)
+
+        return
+
+    def test_disabled_action_is_not_performed(self):
+        """ disabled action is not performed """
+
+        item = self._create_item(enabled=False)
+        item.add_to_menu(None, None, None)
+
+        # The stand-in is enabled until the real action has been created.
+        self.assertEqual(True, item.action.enabled)
+        item.action.perform(None)
+
+        action = item.action.resolve()
+        self.assertEqual(0, action.performed)
+        self.assertEqual(False, item.action.enabled)
+
+        return
+
+    def test_tool_bar_imports_action(self):
+        """ tool bar imports action """
+
+        item = self._create_item()
+        item.add_to_toolbar(None, None, None, None)
+
+        self.assertIn(MODULE_NAME, sys.modules)
+        self.assertNotIsInstance(item.action, LazyAction)
+
+        return
+
+    def test_only_lazy_definitions_are_deferred(self):
+        """ only lazy definitions are deferred """
+
+        builder = ActionManagerBuilder()
+
+        item = builder._create_action(self._create_definition(lazy=False))
+        self.assertIn(MODULE_NAME, sys.modules)
+        self.assertNotIsInstance(item, LazyActionItem)
+
+        return
+
+    def test_stand_in_uses_definition(self):
+        """ stand-in uses definition """
+
+        builder = ActionManagerBuilder()
+
+        definition = self._create_definition(
+            lazy=True, accelerator='Ctrl+D', style='toggle'
+        )
+        item = builder._create_action(definition)
+        self.assertNotIn(MODULE_NAME, sys.modules)
+        self.assertIsInstance(item, LazyActionItem)
+        self.assertEqual('Dummy', item.action.name)
+        self.assertEqual('Ctrl+D', item.action.accelerator)
+        self.assertEqual('toggle', item.action.style)
+
+        return
+
+    ###########################################################################
+    # Private interface.
+    ###########################################################################
+
+    def _create_definition(self, **traits):
+        """ Create a definition of the action that is imported lazily. """
+
+        definition = Action(
+            name       = 'Dummy',
+            class_name = MODULE_NAME + ':DummyLazyAction',
+            path       = 'MenuBar/File',
+            **traits
+        )
+        definition._action_set_ = None
+
+        return definition
+
+    def _create_item(self, **traits):
+        """ Create an item whose action is imported lazily. """
+
+        def factory():
+            module = __import__(MODULE_NAME)
+
+            return module.DummyLazyAction(name='Dummy', **traits)
+
+        return LazyActionItem(action=LazyAction(name='Dummy', factory=factory))
+
+#### EOF ######################################################################
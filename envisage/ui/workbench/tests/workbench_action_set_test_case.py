@@ -0,0 +1,108 @@
+""" Tests for workbench action sets. """
+
+
+# Enthought library imports.
+from envisage.api import ImportManager
+from envisage.ui.action.api import Group, Menu, ToolBar
+from envisage.ui.workbench.workbench_action_manager_builder import (
+    WorkbenchActionManagerBuilder
+)
+from envisage.ui.workbench.workbench_action_set import WorkbenchActionSet
+from pyface.action.api import ActionManager
+from traits.testing.unittest_tools import unittest
+
+
+class ToolBarManager(ActionManager):
+    """ A tool bar manager that does not need a GUI toolkit. """
+
+
+class ActionManagerBuilder(WorkbenchActionManagerBuilder):
+    """ An action manager builder that does not need a workbench window. """
+
+    def _import_symbol(self, symbol_path):
+        """ Import a symbol. """
+
+        return ImportManager().import_symbol(symbol_path)
+
+
+class WorkbenchActionSetTestCase(unittest.TestCase):
+    """ Tests for workbench action sets. """
+
+    ###########################################################################
+    # 'TestCase' interface.
+    ###########################################################################
+
+    def setUp(self):
+        """ Prepares the test fixture before each test method is called. """
+
+        self.action_set = WorkbenchActionSet(
+            menus     = [
+                Menu(name='&File', path='MenuBar', groups=['OpenGroup'])
+            ],
+            groups    = [Group(id='ToolGroup', path='ToolBar/Tools')],
+            tool_bars = [
+                ToolBar(
+                    name       = 'Tools',
+                    path       = 'ToolBar',
+                    class_name = __name__ + ':ToolBarManager'
+                )
+            ]
+        )
+
+        self.builder = ActionManagerBuilder(
+            action_sets=[self.action_set]
+        )
+
+        return
+
+    def tearDown(self):
+        """ Called immediately after each test method has been called. """
+
+        return
+
+    ###########################################################################
+    # Tests.
+    ###########################################################################
+
+    def test_items_are_recorded_by_root(self):
+        """ items are recorded by root """
+
+        menu_bar_manager = self.builder.create_menu_bar_manager('MenuBar')
+        tool_bar_managers = self.builder.create_tool_bar_managers('ToolBar')
+
+        file_menu = menu_bar_manager.find_item('File')
+        self.assertIn(file_menu, self.action_set._items['MenuBar'])
+
+        tool_group = tool_bar_managers[0].find_group('ToolGroup')
+        self.assertIn(tool_group, self.action_set._items['ToolBar'])
+
+        # Without a window we have to push the state to the items ourselves.
+        self.action_set._update_actions(None, 'enabled', False)
+        self.assertEqual(False, file_menu.enabled)
+        self.assertEqual(False, tool_group.enabled)
+
+        return
+
+    def test_rebuilding_forgets_old_items(self):
+        """ rebuilding forgets old items """
+
+        self.builder.create_tool_bar_managers('ToolBar')
+        self.builder.create_menu_bar_manager('MenuBar')
+        tool_bar_items = self.action_set._items['ToolBar'][:]
+        menu_bar_items = self.action_set._items['MenuBar'][:]
+
+        menu_bar_manager = self.builder.create_menu_bar_manager('MenuBar')
+
+        # Only the items in the new menu bar are recorded for it...
+        items = self.action_set._items['MenuBar']
+        self.assertEqual(len(menu_bar_items), len(items))
+        self.assertIn(menu_bar_manager.find_item('File'), items)
+        for item in menu_bar_items:
+            self.assertNotIn(item, items)
+
+        # ... and the tool bar items are left alone.
+        self.assertEqual(tool_bar_items, self.action_set._items['ToolBar'])
+
+        return
+
+#### EOF ######################################################################
@@ -9,7 +9,11 @@ from envisage.ui.action.api import AbstractActionManagerBuilder
 from pyface.action.api import Action, Group, MenuManager
 from pyface.workbench.action.api import MenuBarManager
 from pyface.workbench.action.api import ToolBarManager
-from traits.api import Any, Instance
+from traits.api import Any, Instance, Str
+
+# Local imports.
+from lazy_action import LazyAction, LazyActionItem
+from workbench_action_set import WorkbenchActionSet
 
 
 class WorkbenchActionManagerBuilder(AbstractActionManagerBuilder):
@@ -27,37 +31,61 @@ class WorkbenchActionManagerBuilder(AbstractActionManagerBuilder):
     # All action implementations.
     _actions = Any
 
+    # The root of the menu or tool bars being built.
+    _root = Str
+
     ###########################################################################
-    # Protected 'AbstractActionManagerBuilder' interface.
+    # 'IActionManagerBuilder' interface.
     ###########################################################################
 
-    def _create_action(self, definition):
-        """ Create an action implementation from an action definition. """
+    def create_tool_bar_managers(self, root):
+        """ Creates all tool bar managers from the builder's action sets. """
 
-        traits = {'window' : self.window}
+        self._start_build(root)
+        try:
+            tool_bar_managers = super(
+                WorkbenchActionManagerBuilder, self
+            ).create_tool_bar_managers(root)
 
-        # Override any traits that can be set in the definition.
-        if len(definition.name) > 0:
-            traits['name'] = definition.name
+        finally:
+            self._root = ''
 
-        if len(definition.class_name) > 0:
-            action = self._actions.get(definition.class_name)
-            if action is None:
-                klass  = self._import_symbol(definition.class_name)
-                action = klass(**traits)
-                self._actions[definition.class_name] = action
+        return tool_bar_managers
 
-        # fixme: Do we ever actually do this? It seems that in Envisage 3.x
-        # we always specify an action class!?!
-        else:
-            action = Action(**traits)
+    def initialize_action_manager(self, action_manager, root):
+        """ Initialize an action manager from the builder's action sets. """
 
-        # fixme: We need to associate the action set with the action to
-        # allow for dynamic enabling/disabling etc. This is a *very* hacky
-        # way to do it!
-        action._action_set_ = definition._action_set_
+        self._start_build(root)
+        try:
+            super(
+                WorkbenchActionManagerBuilder, self
+            ).initialize_action_manager(action_manager, root)
 
-        return action
+        finally:
+            self._root = ''
+
+        return
+
+    ###########################################################################
+    # Protected 'AbstractActionManagerBuilder' interface.
+    ###########################################################################
+
+    def _create_action(self, definition):
+        """ Create an action implementation from an action definition. """
+
+        if definition.lazy and len(definition.class_name) > 0 \
+           and len(definition.name) > 0:
+            action = LazyAction(
+                name        = definition.name,
+                accelerator = definition.accelerator,
+                style       = definition.style,
+                factory     = lambda: self._create_real_action(definition)
+            )
+            action._action_set_ = definition._action_set_
+
+            return LazyActionItem(action=action)
+
+        return self._create_real_action(definition)
 
     def _create_group(self, definition):
         """ Create a group implementation from a group definition. """
@@ -80,6 +108,7 @@ class WorkbenchActionManagerBuilder(AbstractActionManagerBuilder):
         # allow for dynamic enabling/disabling etc. This is a *very* hacky
         # way to do it!
         group._action_set_ = definition._action_set_
+        self._record_item(group, definition._action_set_)
 
         return group
 
@@ -116,6 +145,7 @@ class WorkbenchActionManagerBuilder(AbstractActionManagerBuilder):
         # allow for dynamic enabling/disabling etc. This is a *very* hacky
         # way to do it!
         menu_manager._action_set_ = definition._action_set_
+        self._record_item(menu_manager, definition._action_set_)
 
         return menu_manager
 
@@ -171,9 +201,74 @@ class WorkbenchActionManagerBuilder(AbstractActionManagerBuilder):
 
         return weakref.WeakValueDictionary()
 
+    def _create_real_action(self, definition):
+        """ Create an action implementation from an action definition. """
+
+        traits = {'window' : self.window}
+
+        # Override any traits that can be set in the definition.
+        if len(definition.name) > 0:
+            traits['name'] = definition.name
+
+        if len(definition.class_name) > 0:
+            action = self._actions.get(definition.class_name)
+            if action is None:
+                klass  = self._import_symbol(definition.class_name)
+                action = klass(**traits)
+                self._actions[definition.class_name] = action
+
+        # fixme: Do we ever actually do this? It seems that in Envisage 3.x
+        # we always specify an action class!?!
+        else:
+            action = Action(**traits)
+
+        # fixme: We need to associate the action set with the action to
+        # allow for dynamic enabling/disabling etc. This is a *very* hacky
+        # way to do it!
+        action._action_set_ = definition._action_set_
+
+        return action
+
     def _import_symbol(self, symbol_path):
         """ Import a symbol. """
 
         return self.window.application.import_symbol(symbol_path)
 
+    def _start_build(self, root):
+        """ Start building the menu or tool bars for a root.
+
+        The items recorded for each action set the last time that the root
+        was built are forgotten (they are no longer in the window).
+
+        """
+
+        self._root = root
+
+        for action_set in self.action_sets:
+            if isinstance(action_set, WorkbenchActionSet):
+                action_set._items.pop(root, None)
+
+        return
+
+    def _record_item(self, item, action_set):
+        """ Record an item created for an action set.
+
+        This allows the action set to enable/disable or show/hide the items
+        that it contributed without walking the window's menu and tool bars.
+
+        """
+
+        if isinstance(action_set, WorkbenchActionSet):
+            action_set._items.setdefault(self._root, []).append(item)
+
+            # The action set may have changed its state before its items were
+            # created (the window's menu and tool bars are created lazily).
+            if not action_set.enabled:
+                item.enabled = False
+
+            if not action_set.visible:
+                item.visible = False
+
+        return
+
 #### EOF ######################################################################
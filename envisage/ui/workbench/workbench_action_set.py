@@ -3,7 +3,7 @@
 
 # Enthought library imports.
 from envisage.ui.action.api import ActionSet
-from traits.api import Instance, List, Str
+from traits.api import Dict, Instance, List, Str
 
 
 class WorkbenchActionSet(ActionSet):
@@ -48,6 +48,18 @@ class WorkbenchActionSet(ActionSet):
     # window.
     window = Instance('envisage.ui.workbench.api.WorkbenchWindow')
 
+    #### Private interface ####################################################
+
+    # The groups and menu managers created for the action set in its window,
+    # keyed by the root (e.g. 'MenuBar') of the menu or tool bars that they
+    # are in.
+    #
+    # The window's action manager builder records them as it creates them, so
+    # that enabling/disabling or showing/hiding the action set only touches
+    # its own items. When the menu or tool bars for a root are built again,
+    # the items from the previous build are forgotten.
+    _items = Dict(Str, List)
+
     ###########################################################################
     # 'ActionSet' interface.
     ###########################################################################
@@ -118,55 +130,47 @@ class WorkbenchActionSet(ActionSet):
 
         window = self.window
 
+        # Work out the new state first so that the action set's items are
+        # updated (at most) once however many of the conditions apply.
+        enabled = self.enabled
+        visible = self.visible
+
         if len(self.enabled_for_perspectives) > 0:
-            self.enabled = window is not None \
-                           and window.active_perspective is not None \
-                           and window.active_perspective.id in \
-                           self.enabled_for_perspectives
+            enabled = window is not None \
+                      and window.active_perspective is not None \
+                      and window.active_perspective.id in \
+                      self.enabled_for_perspectives
 
         if len(self.visible_for_perspectives) > 0:
-            self.visible = window is not None \
-                           and window.active_perspective is not None \
-                           and window.active_perspective.id in \
-                           self.visible_for_perspectives
+            visible = window is not None \
+                      and window.active_perspective is not None \
+                      and window.active_perspective.id in \
+                      self.visible_for_perspectives
 
         if len(self.enabled_for_views) > 0:
-            self.enabled = window is not None \
-                           and window.active_part is not None \
-                           and window.active_part.id in \
-                           self.enabled_for_views
+            enabled = window is not None \
+                      and window.active_part is not None \
+                      and window.active_part.id in \
+                      self.enabled_for_views
 
         if len(self.visible_for_views) > 0:
-            self.visible = window is not None \
-                           and window.active_part is not None \
-                           and window.active_part.id in \
-                           self.visible_for_views
+            visible = window is not None \
+                      and window.active_part is not None \
+                      and window.active_part.id in \
+                      self.visible_for_views
+
+        # Trait change notifications only fire if the state actually changes.
+        self.enabled = enabled
+        self.visible = visible
 
         return
 
     def _update_actions(self, window, trait_name, value):
-        """ Update the state of the tool bars in the action set. """
+        """ Update the state of the groups and menus in the action set. """
 
-        def visitor(item):
-            """ Called when we visit each item in an action manager. """
-
-            # fixme: The 'additions' group gets created by default and hence
-            # has no '_action_set_' attribute. This smells because of the fact
-            # that we 'tag' the '_action_set_' attribute onto all items to be
-            # ble to find them later. This link should be maintained externally
-            # (maybe in the action set itself?).
-            if hasattr(item, '_action_set_'):
-                if item._action_set_ is self:
-                    setattr(item, trait_name, value)
-
-            return
-
-        # Update actions on the menu bar.
-        window.menu_bar_manager.walk(visitor)
-
-        # Update actions on the tool bars.
-        for tool_bar_manager in window.tool_bar_managers:
-            tool_bar_manager.walk(visitor)
+        for items in self._items.values():
+            for item in items:
+                setattr(item, trait_name, value)
 
         return
 
@@ -152,7 +152,7 @@ if __name__ == "__main__":
         ext_modules = [],
         install_requires = __requires__,
         license = "BSD",
-        packages = find_packages(),
+        packages = find_packages(exclude=['benchmarks', 'benchmarks.*']),
         package_data = {'': ['images/*', '*.ini',]},
         platforms = ["Windows", "Linux", "Mac OS-X", "Unix", "Solaris"],
         zip_safe = False,